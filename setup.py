@@ -60,6 +60,14 @@ setup(
     entry_points={
         'console_scripts': [
             'scikit-surgeryarucotracker=sksurgeryarucotracker.__main__:main',
+            'sksurgeryarucotracker-benchmark='
+            'sksurgeryarucotracker.benchmarks.tracking:main',
+            'sksurgeryarucotracker-accuracy='
+            'sksurgeryarucotracker.benchmarks.accuracy:main',
+            'sksurgeryarucotracker-regression='
+            'sksurgeryarucotracker.benchmarks.regression:main',
+            'sksurgeryarucotracker-soak='
+            'sksurgeryarucotracker.benchmarks.soak:main',
         ],
     },
 )
@@ -0,0 +1,2 @@
+# coding=utf-8
+"""Algorithms for scikit-surgeryarucotracker"""
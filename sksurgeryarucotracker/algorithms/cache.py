@@ -0,0 +1,97 @@
+#  -*- coding: utf-8 -*-
+
+"""A cache of marker poses, keyed on the detected marker corners.
+"""
+from numpy import asarray, empty, float64, int64, zeros, nan, full
+from numpy import abs as npabs
+
+from sksurgeryarucotracker.algorithms.handles import (find_handles,
+                                                      add_handles)
+
+
+class PoseCache:
+    """
+    Remembers the latest corners, pose and reprojection error of each
+    port handle, so a marker whose corners have not moved does not
+    need its pose solving again. The cache for every port handle is
+    kept in contiguous arrays.
+    """
+    def __init__(self, tolerance=0.05):
+        """
+        :param tolerance: the largest distance, in pixels along x or y,
+            that any corner can move and still reuse the cached pose.
+        :raise Exception: ValueError
+        """
+        if tolerance < 0.0:
+            raise ValueError('Pose cache tolerance must not be negative',
+                             tolerance)
+        self._tolerance = tolerance
+        self.hits = 0
+        self.misses = 0
+
+        self._port_handles = None
+        self._corners = None
+        self._tracking = None
+        self._errors = None
+        self.clear()
+
+    def clear(self):
+        """
+        Empties the cache, the hit and miss counts are kept.
+        """
+        self._port_handles = empty(0, dtype=int64)
+        self._corners = empty((0, 4, 2), dtype=float64)
+        self._tracking = empty((0, 4, 4), dtype=float64)
+        self._errors = empty(0, dtype=float64)
+
+    def reset_counts(self):
+        """
+        Sets the hit and miss counts to zero.
+        """
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, port_handles, marker_corners):
+        """
+        Looks up the cached poses of markers.
+
+        :param port_handles: N port handles
+        :param marker_corners: N x 4 x 2 detected corners
+        :return: a boolean array, True where the pose is cached, an
+            N x 4 x 4 array of cached tracking matrices and an array of N
+            cached reprojection errors, both NaN where not cached
+        """
+        corners = asarray(marker_corners, dtype=float64).reshape(-1, 4, 2)
+        slots, found = find_handles(self._port_handles, port_handles)
+
+        hit = zeros(found.shape, dtype=bool)
+        hit[found] = (npabs(self._corners[slots[found]] - corners[found])
+                      .max(axis=(1, 2)) <= self._tolerance)
+
+        tracking = full((hit.shape[0], 4, 4), nan)
+        errors = full(hit.shape, nan)
+        tracking[hit] = self._tracking[slots[hit]]
+        errors[hit] = self._errors[slots[hit]]
+
+        hit_count = int(hit.sum())
+        self.hits += hit_count
+        self.misses += hit.shape[0] - hit_count
+        return hit, tracking, errors
+
+    def store(self, port_handles, marker_corners, tracking, errors):
+        """
+        Stores the corners, poses and reprojection errors of markers.
+
+        :param port_handles: N port handles
+        :param marker_corners: N x 4 x 2 detected corners
+        :param tracking: N x 4 x 4 tracking matrices
+        :param errors: N reprojection errors
+        """
+        (self._port_handles, self._corners, self._tracking,
+         self._errors) = add_handles(self._port_handles, port_handles,
+                                     self._corners, self._tracking,
+                                     self._errors)
+        slots, _ = find_handles(self._port_handles, port_handles)
+        self._corners[slots] = asarray(marker_corners).reshape(-1, 4, 2)
+        self._tracking[slots] = tracking
+        self._errors[slots] = errors
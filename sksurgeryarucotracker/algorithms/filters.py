@@ -0,0 +1,113 @@
+#  -*- coding: utf-8 -*-
+
+"""Pose smoothing filters that update all tools at once.
+"""
+from math import pi
+from numpy import asarray, empty, float64, int64, maximum, einsum, isnan
+from numpy import abs as npabs
+from numpy.linalg import norm
+
+from sksurgeryarucotracker.algorithms.geometry import (
+    matrices_to_quaternions, quaternions_to_matrices)
+from sksurgeryarucotracker.algorithms.handles import (find_handles,
+                                                      add_handles)
+
+
+def _smoothing_factor(cutoff, time_step):
+    """
+    Returns the exponential smoothing factor for a cutoff frequency
+    and time step.
+    """
+    tau = 1.0 / (2.0 * pi * cutoff)
+    return 1.0 / (1.0 + tau / time_step)
+
+
+class OneEuroFilterBank:
+    """
+    Smooths the poses of many tools with One Euro filters
+    (Casiez et al. 2012). The filter state for every port handle is
+    kept in contiguous arrays, so all visible tools are updated with
+    a few NumPy operations per frame. Positions are filtered as
+    x, y, z and rotations as sign aligned quaternions.
+    """
+    def __init__(self, min_cutoff=1.0, beta=0.0, derivative_cutoff=1.0):
+        """
+        :param min_cutoff: the cutoff frequency, in Hz, when the tool
+            is still. Lower values remove more jitter.
+        :param beta: how quickly the cutoff frequency rises with
+            speed. Higher values reduce lag when the tool moves.
+        :param derivative_cutoff: the cutoff frequency, in Hz, used
+            when estimating speed.
+        :raise Exception: ValueError
+        """
+        if min_cutoff <= 0.0 or derivative_cutoff <= 0.0:
+            raise ValueError('Filter cutoff frequencies must be positive',
+                             min_cutoff, derivative_cutoff)
+        self._min_cutoff = min_cutoff
+        self._beta = beta
+        self._derivative_cutoff = derivative_cutoff
+
+        self._port_handles = None
+        self._values = None
+        self._derivatives = None
+        self._times = None
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the filter state of all tools.
+        """
+        self._port_handles = empty(0, dtype=int64)
+        self._values = empty((0, 7), dtype=float64)
+        self._derivatives = empty((0, 7), dtype=float64)
+        self._times = empty(0, dtype=float64)
+
+    def update(self, port_handles, tracking, timestamp):
+        """
+        Filters a frame of poses, and updates the filter state.
+
+        :param port_handles: N port handles
+        :param tracking: N x 4 x 4 tracking matrices
+        :param timestamp: the time of the frame, in seconds
+        :return: an N x 4 x 4 array of filtered tracking matrices
+        """
+        (self._port_handles, self._values, self._derivatives,
+         self._times) = add_handles(self._port_handles, port_handles,
+                                    self._values, self._derivatives,
+                                    self._times)
+        slots, _ = find_handles(self._port_handles, port_handles)
+
+        tracking = asarray(tracking, dtype=float64).reshape(-1, 4, 4)
+        values = empty((tracking.shape[0], 7), dtype=float64)
+        values[:, 0:3] = tracking[:, 0:3, 3]
+        values[:, 3:7] = matrices_to_quaternions(tracking[:, 0:3, 0:3])
+
+        previous = self._values[slots]
+        first = isnan(self._times[slots])
+
+        # q and -q are the same rotation, so align with the last value
+        flip = einsum('ni,ni->n', values[:, 3:7], previous[:, 3:7]) < 0.0
+        values[flip, 3:7] *= -1.0
+
+        time_step = maximum(timestamp - self._times[slots], 1e-6)[:, None]
+        derivatives = (values - previous) / time_step
+        alpha = _smoothing_factor(self._derivative_cutoff, time_step)
+        derivatives = alpha * derivatives + (1.0 - alpha) * \
+                self._derivatives[slots]
+
+        cutoff = self._min_cutoff + self._beta * npabs(derivatives)
+        alpha = _smoothing_factor(cutoff, time_step)
+        filtered = alpha * values + (1.0 - alpha) * previous
+
+        filtered[first] = values[first]
+        derivatives[first] = 0.0
+        filtered[:, 3:7] /= norm(filtered[:, 3:7], axis=1)[:, None]
+
+        self._values[slots] = filtered
+        self._derivatives[slots] = derivatives
+        self._times[slots] = timestamp
+
+        smoothed = tracking.copy()
+        smoothed[:, 0:3, 3] = filtered[:, 0:3]
+        smoothed[:, 0:3, 0:3] = quaternions_to_matrices(filtered[:, 3:7])
+        return smoothed
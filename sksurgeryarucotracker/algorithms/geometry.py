@@ -0,0 +1,433 @@
+#  -*- coding: utf-8 -*-
+
+"""Functions to operate on the poses of many markers at once.
+"""
+from numpy import (array, asarray, cos, sin, zeros, empty, float64, einsum,
+                   maximum, minimum, sqrt, where, arctan, cross, argmin,
+                   argmax, isfinite, arange, arctan2, full, arccos)
+from numpy import abs as npabs
+from numpy.linalg import norm, solve
+
+
+def rodrigues_to_matrices(rvecs):
+    """
+    Converts rotation vectors to rotation matrices,
+    equivalent to calling cv2.Rodrigues on each one.
+
+    :param rvecs: N rotation vectors, any shape that reshapes to N x 3
+    :return: an N x 3 x 3 array of rotation matrices
+    """
+    rvecs = asarray(rvecs, dtype=float64).reshape(-1, 3)
+    theta = norm(rvecs, axis=1)
+    axes = rvecs / maximum(theta, 1e-12)[:, None]
+
+    skew = zeros((rvecs.shape[0], 3, 3), dtype=float64)
+    skew[:, 0, 1] = -axes[:, 2]
+    skew[:, 0, 2] = axes[:, 1]
+    skew[:, 1, 0] = axes[:, 2]
+    skew[:, 1, 2] = -axes[:, 0]
+    skew[:, 2, 0] = -axes[:, 1]
+    skew[:, 2, 1] = axes[:, 0]
+
+    rotations = (sin(theta)[:, None, None] * skew +
+                 (1.0 - cos(theta))[:, None, None] * (skew @ skew))
+    rotations[:, [0, 1, 2], [0, 1, 2]] += 1.0
+    return rotations
+
+
+def project_points(object_points, rotations, translations,
+                   projection_matrix, distortion):
+    """
+    Projects the points of many markers to the image in one go,
+    equivalent to calling cv2.projectPoints for each marker.
+
+    :param object_points: M x 3 points, shared by all markers, or
+        N x M x 3 points, one set per marker
+    :param rotations: N x 3 x 3 rotation matrices
+    :param translations: N translation vectors, reshapes to N x 3
+    :param projection_matrix: the 3x3 camera projection matrix
+    :param distortion: up to 8 distortion coefficients, (k1, k2, p1, p2
+        [, k3 [, k4, k5, k6]]), any further coefficients are ignored
+    :return: an N x M x 2 array of image points
+    """
+    object_points = asarray(object_points, dtype=float64)
+    translations = asarray(translations, dtype=float64).reshape(-1, 3)
+    if object_points.ndim == 2:
+        camera_points = einsum('nij,mj->nmi', rotations, object_points)
+    else:
+        camera_points = einsum('nij,nmj->nmi', rotations, object_points)
+    camera_points += translations[:, None, :]
+
+    x_norm = camera_points[:, :, 0] / camera_points[:, :, 2]
+    y_norm = camera_points[:, :, 1] / camera_points[:, :, 2]
+
+    coeffs = zeros(8, dtype=float64)
+    distortion = asarray(distortion, dtype=float64).ravel()[:8]
+    coeffs[:distortion.shape[0]] = distortion
+    k_1, k_2, p_1, p_2, k_3, k_4, k_5, k_6 = coeffs
+
+    r_2 = x_norm * x_norm + y_norm * y_norm
+    radial = ((1.0 + r_2 * (k_1 + r_2 * (k_2 + r_2 * k_3))) /
+              (1.0 + r_2 * (k_4 + r_2 * (k_5 + r_2 * k_6))))
+    x_dist = (x_norm * radial + 2.0 * p_1 * x_norm * y_norm +
+              p_2 * (r_2 + 2.0 * x_norm * x_norm))
+    y_dist = (y_norm * radial + p_1 * (r_2 + 2.0 * y_norm * y_norm) +
+              2.0 * p_2 * x_norm * y_norm)
+
+    image_points = zeros(x_norm.shape + (2,), dtype=float64)
+    image_points[:, :, 0] = (projection_matrix[0, 0] * x_dist +
+                             projection_matrix[0, 1] * y_dist +
+                             projection_matrix[0, 2])
+    image_points[:, :, 1] = (projection_matrix[1, 1] * y_dist +
+                             projection_matrix[1, 2])
+    return image_points
+
+
+def marker_areas(marker_corners):
+    """
+    Returns the area in pixels of each marker, using the shoelace formula.
+
+    :param marker_corners: N x 4 x 2 image corners
+    :return: an array of N areas
+    """
+    corners = asarray(marker_corners, dtype=float64).reshape(-1, 4, 2)
+    x_coords = corners[:, :, 0]
+    y_coords = corners[:, :, 1]
+    return 0.5 * npabs((x_coords * y_coords[:, [1, 2, 3, 0]]).sum(axis=1) -
+                       (y_coords * x_coords[:, [1, 2, 3, 0]]).sum(axis=1))
+
+
+def reprojection_errors(marker_corners, projected_corners):
+    """
+    Returns the root mean square distance between the detected and
+    projected corners of each marker.
+
+    :param marker_corners: N x 4 x 2 detected corners
+    :param projected_corners: N x 4 x 2 projected corners
+    :return: an array of N errors, in pixels
+    """
+    corners = asarray(marker_corners, dtype=float64).reshape(-1, 4, 2)
+    residuals = corners - projected_corners
+    return sqrt((residuals * residuals).sum(axis=2).mean(axis=1))
+
+
+def reprojection_quality(errors, areas, error_scale=1.0, reference_area=400.0):
+    """
+    Turns reprojection errors and marker areas into a tracking quality
+    between 0 and 1. The quality is halved when the error equals
+    error_scale, and falls linearly with marker area below the
+    reference area.
+
+    :param errors: N reprojection errors, in pixels
+    :param areas: N marker areas, in pixels
+    :param error_scale: the reprojection error (pixels) at which the
+        quality is halved
+    :param reference_area: the marker area (pixels) at and above which
+        size no longer limits the quality
+    :return: an array of N qualities
+    """
+    errors = asarray(errors, dtype=float64)
+    areas = asarray(areas, dtype=float64)
+    return minimum(areas / reference_area, 1.0) / (1.0 + errors / error_scale)
+
+
+def ippe_square_poses(image_points, marker_size):
+    """
+    Returns both candidate poses of each square marker, using the
+    infinitesimal plane-based pose estimation (IPPE) method of
+    Collins and Bartoli, for all markers at once. This is equivalent
+    to calling cv2.solvePnPGeneric with SOLVEPNP_IPPE_SQUARE for each
+    marker.
+
+    :param image_points: N x 4 x 2 undistorted, normalised image
+        coordinates of the marker corners, in the order top left,
+        top right, bottom right, bottom left
+    :param marker_size: the length of the marker side
+    :return: an N x 2 x 3 x 3 array of rotation matrices and an
+        N x 2 x 3 array of translations, two candidates per marker
+    """
+    image_points = asarray(image_points, dtype=float64).reshape(-1, 4, 2)
+    marker_count = image_points.shape[0]
+    half_size = marker_size / 2.0
+    model = array([[-half_size, half_size], [half_size, half_size],
+                   [half_size, -half_size], [-half_size, -half_size]])
+
+    # homography from the model plane to the image, with h22 = 1
+    u_img = image_points[:, :, 0]
+    v_img = image_points[:, :, 1]
+    system = zeros((marker_count, 8, 8), dtype=float64)
+    system[:, 0::2, 0:2] = model
+    system[:, 0::2, 2] = 1.0
+    system[:, 1::2, 3:5] = model
+    system[:, 1::2, 5] = 1.0
+    system[:, 0::2, 6:8] = -u_img[:, :, None] * model
+    system[:, 1::2, 6:8] = -v_img[:, :, None] * model
+    rhs = image_points.reshape(marker_count, 8, 1)
+    homography = solve(system, rhs).reshape(marker_count, 8)
+
+    # the image of the marker centre and the jacobian of the homography
+    # there
+    p_img = homography[:, 2]
+    q_img = homography[:, 5]
+    jacobian = empty((marker_count, 2, 2), dtype=float64)
+    jacobian[:, 0, 0] = homography[:, 0] - homography[:, 6] * p_img
+    jacobian[:, 0, 1] = homography[:, 1] - homography[:, 7] * p_img
+    jacobian[:, 1, 0] = homography[:, 3] - homography[:, 6] * q_img
+    jacobian[:, 1, 1] = homography[:, 4] - homography[:, 7] * q_img
+
+    # rotation taking the z axis onto the line of sight of the centre
+    sight = sqrt(p_img * p_img + q_img * q_img)
+    scale = where(sight > 1e-12, arctan(sight) / maximum(sight, 1e-12), 1.0)
+    sight_rvecs = zeros((marker_count, 3), dtype=float64)
+    sight_rvecs[:, 0] = -q_img * scale
+    sight_rvecs[:, 1] = p_img * scale
+    sight_rotations = rodrigues_to_matrices(sight_rvecs)
+
+    b_mat = empty((marker_count, 2, 2), dtype=float64)
+    b_mat[:, 0, :] = (sight_rotations[:, 0, 0:2] -
+                      p_img[:, None] * sight_rotations[:, 2, 0:2])
+    b_mat[:, 1, :] = (sight_rotations[:, 1, 0:2] -
+                      q_img[:, None] * sight_rotations[:, 2, 0:2])
+    a_mat = solve(b_mat, jacobian)
+
+    ata = a_mat.transpose(0, 2, 1) @ a_mat
+    gamma = sqrt(0.5 * (ata[:, 0, 0] + ata[:, 1, 1] +
+                        sqrt((ata[:, 0, 0] - ata[:, 1, 1]) ** 2 +
+                             4.0 * ata[:, 0, 1] ** 2)))
+    r_tilde = a_mat / gamma[:, None, None]
+
+    b_0 = sqrt(maximum(1.0 - r_tilde[:, 0, 0] ** 2 - r_tilde[:, 1, 0] ** 2,
+                       0.0))
+    b_1 = sqrt(maximum(1.0 - r_tilde[:, 0, 1] ** 2 - r_tilde[:, 1, 1] ** 2,
+                       0.0))
+    b_1 = where((r_tilde[:, 0, 0] * r_tilde[:, 0, 1] +
+                 r_tilde[:, 1, 0] * r_tilde[:, 1, 1]) > 0.0, -b_1, b_1)
+
+    local = zeros((marker_count, 2, 3, 3), dtype=float64)
+    local[:, :, 0:2, 0:2] = r_tilde[:, None, :, :]
+    local[:, 0, 2, 0] = b_0
+    local[:, 0, 2, 1] = b_1
+    local[:, 1, 2, 0:2] = -local[:, 0, 2, 0:2]
+    local[:, :, :, 2] = cross(local[:, :, :, 0], local[:, :, :, 1])
+    rotations = sight_rotations[:, None, :, :] @ local
+
+    translations = _planar_translations(rotations, model, image_points)
+
+    return rotations, translations
+
+
+def _planar_translations(rotations, model, image_points):
+    """
+    Returns the least squares translation of each candidate rotation,
+    given the planar model points and the normalised image points.
+
+    :param rotations: N x K x 3 x 3 candidate rotations
+    :param model: M x 2 points on the model plane
+    :param image_points: N x M x 2 normalised image points
+    :return: an N x K x 3 array of translations
+    """
+    rotated = einsum('nkij,mj->nkmi', rotations[:, :, :, 0:2], model)
+    u_img = image_points[:, None, :, 0]
+    v_img = image_points[:, None, :, 1]
+
+    # normal equations of [1, 0, -u; 0, 1, -v] t = [u rz - rx; v rz - ry]
+    lhs = zeros(rotations.shape, dtype=float64)
+    lhs[:, :, 0, 0] = model.shape[0]
+    lhs[:, :, 1, 1] = model.shape[0]
+    lhs[:, :, 0, 2] = lhs[:, :, 2, 0] = -u_img.sum(axis=2)
+    lhs[:, :, 1, 2] = lhs[:, :, 2, 1] = -v_img.sum(axis=2)
+    lhs[:, :, 2, 2] = (u_img * u_img + v_img * v_img).sum(axis=2)
+
+    res_u = u_img * rotated[:, :, :, 2] - rotated[:, :, :, 0]
+    res_v = v_img * rotated[:, :, :, 2] - rotated[:, :, :, 1]
+    rhs = empty(rotations.shape[0:3] + (1,), dtype=float64)
+    rhs[:, :, 0, 0] = res_u.sum(axis=2)
+    rhs[:, :, 1, 0] = res_v.sum(axis=2)
+    rhs[:, :, 2, 0] = -(u_img * res_u + v_img * res_v).sum(axis=2)
+    return solve(lhs, rhs)[:, :, :, 0]
+
+
+def select_pose_candidates(errors, rotations, previous_rotations=None,
+                           ambiguity_ratio=2.0):
+    """
+    Chooses one of the two candidate poses of each marker. The
+    candidate with the lower reprojection error is chosen, unless the
+    errors are too close to tell apart and the marker had a pose in
+    the previous frame, in which case the candidate with the rotation
+    closest to the previous rotation is chosen.
+
+    :param errors: N x 2 reprojection errors
+    :param rotations: N x 2 x 3 x 3 candidate rotations
+    :param previous_rotations: N x 3 x 3 rotations of the same markers
+        in the previous frame, NaN where there was none, or None
+    :param ambiguity_ratio: the candidates are ambiguous when the larger
+        error is less than this times the smaller error
+    :return: an array of N candidate indices
+    """
+    errors = asarray(errors, dtype=float64)
+    best = argmin(errors, axis=1)
+    if previous_rotations is None:
+        return best
+
+    # trace(previous^T candidate) grows as the rotations get closer
+    similarity = einsum('nkij,nij->nk', rotations, previous_rotations)
+    known = isfinite(similarity).all(axis=1)
+    nearest = argmax(where(known[:, None], similarity, 0.0), axis=1)
+    ambiguous = errors.max(axis=1) < ambiguity_ratio * errors.min(axis=1)
+    return where(ambiguous & known, nearest, best)
+
+
+def matrices_to_quaternions(rotations):
+    """
+    Converts rotation matrices to unit quaternions, using Shepperd's
+    method for all matrices at once.
+
+    :param rotations: N x 3 x 3 rotation matrices
+    :return: an N x 4 array of quaternions, (w, x, y, z), with w >= 0
+    """
+    rot = asarray(rotations, dtype=float64).reshape(-1, 3, 3)
+    r00, r01, r02 = rot[:, 0, 0], rot[:, 0, 1], rot[:, 0, 2]
+    r10, r11, r12 = rot[:, 1, 0], rot[:, 1, 1], rot[:, 1, 2]
+    r20, r21, r22 = rot[:, 2, 0], rot[:, 2, 1], rot[:, 2, 2]
+
+    # each candidate is a multiple of the quaternion, we use the one
+    # with the largest leading term for numerical stability
+    candidates = array([
+        [1.0 + r00 + r11 + r22, r21 - r12, r02 - r20, r10 - r01],
+        [r21 - r12, 1.0 + r00 - r11 - r22, r01 + r10, r02 + r20],
+        [r02 - r20, r01 + r10, 1.0 - r00 + r11 - r22, r12 + r21],
+        [r10 - r01, r02 + r20, r12 + r21, 1.0 - r00 - r11 + r22]])
+    choice = argmax(einsum('iin->ni', candidates), axis=1)
+    quaternions = candidates[choice, :, arange(rot.shape[0])]
+    quaternions /= norm(quaternions, axis=1)[:, None]
+    quaternions[quaternions[:, 0] < 0.0] *= -1.0
+    return quaternions
+
+
+def quaternions_to_matrices(quaternions):
+    """
+    Converts quaternions to rotation matrices, normalising them first.
+
+    :param quaternions: N x 4 quaternions, (w, x, y, z)
+    :return: an N x 3 x 3 array of rotation matrices
+    """
+    quats = asarray(quaternions, dtype=float64).reshape(-1, 4)
+    quats = quats / norm(quats, axis=1)[:, None]
+    q_w, q_x, q_y, q_z = quats[:, 0], quats[:, 1], quats[:, 2], quats[:, 3]
+
+    rotations = empty((quats.shape[0], 3, 3), dtype=float64)
+    rotations[:, 0, 0] = 1.0 - 2.0 * (q_y * q_y + q_z * q_z)
+    rotations[:, 0, 1] = 2.0 * (q_x * q_y - q_z * q_w)
+    rotations[:, 0, 2] = 2.0 * (q_x * q_z + q_y * q_w)
+    rotations[:, 1, 0] = 2.0 * (q_x * q_y + q_z * q_w)
+    rotations[:, 1, 1] = 1.0 - 2.0 * (q_x * q_x + q_z * q_z)
+    rotations[:, 1, 2] = 2.0 * (q_y * q_z - q_x * q_w)
+    rotations[:, 2, 0] = 2.0 * (q_x * q_z - q_y * q_w)
+    rotations[:, 2, 1] = 2.0 * (q_y * q_z + q_x * q_w)
+    rotations[:, 2, 2] = 1.0 - 2.0 * (q_x * q_x + q_y * q_y)
+    return rotations
+
+
+def rodrigues_to_quaternions(rvecs):
+    """
+    Converts rotation vectors to unit quaternions.
+
+    :param rvecs: N rotation vectors, any shape that reshapes to N x 3
+    :return: an N x 4 array of quaternions, (w, x, y, z), with w >= 0
+    """
+    rvecs = asarray(rvecs, dtype=float64).reshape(-1, 3)
+    theta = norm(rvecs, axis=1)
+    quaternions = empty((rvecs.shape[0], 4), dtype=float64)
+    quaternions[:, 0] = cos(0.5 * theta)
+    quaternions[:, 1:4] = rvecs * (sin(0.5 * theta) /
+                                   maximum(theta, 1e-12))[:, None]
+    # a small angle has sin(theta / 2) / theta close to 1 / 2
+    small = theta < 1e-12
+    quaternions[small, 1:4] = 0.5 * rvecs[small]
+    quaternions[quaternions[:, 0] < 0.0] *= -1.0
+    return quaternions
+
+
+def quaternions_to_rodrigues(quaternions):
+    """
+    Converts unit quaternions to rotation vectors, taking the shortest
+    rotation.
+
+    :param quaternions: N x 4 quaternions, (w, x, y, z)
+    :return: an N x 3 array of rotation vectors
+    """
+    quats = array(quaternions, dtype=float64).reshape(-1, 4)
+    quats[quats[:, 0] < 0.0] *= -1.0
+    sin_half = norm(quats[:, 1:4], axis=1)
+    theta = 2.0 * arctan2(sin_half, quats[:, 0])
+    # a small angle has theta / sin(theta / 2) close to 2
+    scale = full(theta.shape, 2.0)
+    rotated = sin_half > 1e-12
+    scale[rotated] = theta[rotated] / sin_half[rotated]
+    return quats[:, 1:4] * scale[:, None]
+
+
+def multiply_quaternions(first, second):
+    """
+    Returns the Hamilton products of two sets of quaternions.
+
+    :param first: N x 4 quaternions, (w, x, y, z)
+    :param second: N x 4 quaternions, (w, x, y, z)
+    :return: an N x 4 array, first * second
+    """
+    first = asarray(first, dtype=float64).reshape(-1, 4)
+    second = asarray(second, dtype=float64).reshape(-1, 4)
+    product = empty(first.shape, dtype=float64)
+    product[:, 0] = (first[:, 0] * second[:, 0] -
+                     einsum('ni,ni->n', first[:, 1:4], second[:, 1:4]))
+    product[:, 1:4] = (first[:, 0:1] * second[:, 1:4] +
+                       second[:, 0:1] * first[:, 1:4] +
+                       cross(first[:, 1:4], second[:, 1:4]))
+    return product
+
+
+def slerp_quaternions(first, second, fractions):
+    """
+    Spherically interpolates between pairs of quaternions, along the
+    shorter arc.
+
+    :param first: N x 4 quaternions, (w, x, y, z), at fraction 0
+    :param second: N x 4 quaternions, (w, x, y, z), at fraction 1
+    :param fractions: N fractions, usually between 0 and 1
+    :return: an N x 4 array of unit quaternions
+    """
+    first = asarray(first, dtype=float64).reshape(-1, 4)
+    second = asarray(second, dtype=float64).reshape(-1, 4).copy()
+    fractions = asarray(fractions, dtype=float64).reshape(-1, 1)
+
+    dots = einsum('ni,ni->n', first, second)
+    second[dots < 0.0] *= -1.0
+    dots = minimum(npabs(dots), 1.0).reshape(-1, 1)
+
+    angles = arccos(dots)
+    sines = sin(angles)
+    # nearly equal quaternions fall back to linear interpolation
+    close = (sines < 1e-6).ravel()
+    sines[close] = 1.0
+    first_weights = sin((1.0 - fractions) * angles) / sines
+    second_weights = sin(fractions * angles) / sines
+    first_weights[close] = 1.0 - fractions[close]
+    second_weights[close] = fractions[close]
+
+    quaternions = first_weights * first + second_weights * second
+    return quaternions / norm(quaternions, axis=1).reshape(-1, 1)
+
+
+def matrices_to_quaternion_poses(tracking):
+    """
+    Converts tracking matrices to translation and quaternion poses.
+
+    :param tracking: N x 4 x 4 tracking matrices
+    :return: an N x 7 array, columns 0-2 are x, y, z and columns 3-6
+        are the rotation as a quaternion (qw, qx, qy, qz)
+    """
+    tracking = asarray(tracking, dtype=float64).reshape(-1, 4, 4)
+    poses = empty((tracking.shape[0], 7), dtype=float64)
+    poses[:, 0:3] = tracking[:, 0:3, 3]
+    poses[:, 3:7] = matrices_to_quaternions(tracking[:, 0:3, 0:3])
+    return poses
@@ -0,0 +1,148 @@
+#  -*- coding: utf-8 -*-
+
+"""Functions to keep per port handle state in sorted, contiguous arrays.
+"""
+from numpy import (asarray, int64, float64, searchsorted, union1d, full,
+                   zeros, unique, argsort, sort, nan)
+
+
+def find_handles(sorted_handles, port_handles):
+    """
+    Finds the slots of port handles in a sorted array of handles.
+
+    :param sorted_handles: a sorted array of known port handles
+    :param port_handles: the port handles to look up
+    :return: an array of slot indices, and a boolean array that is
+        True where the port handle is known. Slots of unknown handles
+        are 0.
+    """
+    port_handles = asarray(port_handles, dtype=int64).ravel()
+    slots = searchsorted(sorted_handles, port_handles)
+    slots[slots == sorted_handles.shape[0]] = 0
+    if sorted_handles.shape[0] == 0:
+        return slots, zeros(slots.shape, dtype=bool)
+    found = sorted_handles[slots] == port_handles
+    slots[~found] = 0
+    return slots, found
+
+
+def first_handles(port_handles):
+    """
+    Finds the first of each port handle, for frames where a marker id
+    was detected more than once.
+
+    :param port_handles: an array of port handles
+    :return: the indices of the first occurrence of each port handle,
+        in their original order, or None if there are no repeats
+    """
+    _, first = unique(port_handles, return_index=True)
+    if first.shape[0] == port_handles.shape[0]:
+        return None
+    return sort(first)
+
+
+def add_handles(sorted_handles, port_handles, *arrays):
+    """
+    Adds port handles to a sorted array of handles, inserting a slot
+    into each state array, in the same position, for each new handle.
+    New slots are filled with zeros, or NaN for floating point arrays.
+
+    :param sorted_handles: a sorted array of known port handles
+    :param port_handles: the port handles to add, known handles are
+        ignored
+    :param arrays: state arrays with one row per known handle
+    :return: the new sorted handles, followed by the new state arrays
+    :raise Exception: ValueError, if port_handles repeat, as each
+        handle can only be given one state per frame
+    """
+    port_handles = asarray(port_handles, dtype=int64).ravel()
+    if first_handles(port_handles) is not None:
+        raise ValueError('Port handles must not repeat within a frame',
+                         port_handles)
+    new_handles = union1d(sorted_handles, port_handles)
+    if new_handles.shape[0] == sorted_handles.shape[0]:
+        return (sorted_handles,) + arrays
+
+    old_slots = searchsorted(new_handles, sorted_handles)
+    new_arrays = []
+    for state in arrays:
+        fill = float('nan') if state.dtype.kind in 'fc' else 0
+        new_state = full((new_handles.shape[0],) + state.shape[1:], fill,
+                         dtype=state.dtype)
+        new_state[old_slots] = state
+        new_arrays.append(new_state)
+    return (new_handles,) + tuple(new_arrays)
+
+
+class SlotFrame:
+    """
+    Preallocated arrays holding a frame of tracking data for a fixed,
+    registered set of port handles, one slot per port handle, in the
+    order they were registered. The same arrays are overwritten by
+    each update, and tools that are not visible are marked rather
+    than omitted.
+
+    Attributes, each with one row per registered port handle:
+
+        port_handles: the registered port handles
+
+        visible: True where the tool was seen in the latest frame
+
+        time_stamps: the time (cpu clock) of the latest frame
+
+        frame_numbers: the frame number of the latest frame
+
+        tracking: 4x4 tracking matrices, or 7 element positions and
+        quaternions if use_quaternions is true, NaN where not visible
+
+        tracking_quality: the tracking quality, 0 where not visible
+    """
+    def __init__(self, port_handles, use_quaternions=False):
+        """
+        :param port_handles: the port handles to make slots for
+        :param use_quaternions: make the tracking slots 7 element
+            positions and quaternions rather than 4x4 matrices
+        :raise Exception: ValueError
+        """
+        self.port_handles = asarray(port_handles, dtype=int64).ravel()
+        if unique(self.port_handles).shape[0] != self.port_handles.shape[0]:
+            raise ValueError('Registered port handles must be unique',
+                             self.port_handles)
+        slot_count = self.port_handles.shape[0]
+
+        self.visible = zeros(slot_count, dtype=bool)
+        self.time_stamps = zeros(slot_count, dtype=float64)
+        self.frame_numbers = zeros(slot_count, dtype=int64)
+        if use_quaternions:
+            self.tracking = full((slot_count, 7), nan)
+        else:
+            self.tracking = full((slot_count, 4, 4), nan)
+        self.tracking_quality = zeros(slot_count, dtype=float64)
+
+        self._order = argsort(self.port_handles)
+        self._sorted_handles = self.port_handles[self._order]
+
+    def update(self, port_handles, timestamp, frame_number, tracking,
+               tracking_quality):
+        """
+        Writes a frame of tracking data into the slots. Port handles
+        that are not registered are ignored.
+
+        :param port_handles: N port handles
+        :param timestamp: the time of the frame
+        :param frame_number: the number of the frame
+        :param tracking: N tracking matrices, or positions and
+            quaternions, matching the slot shape
+        :param tracking_quality: N tracking qualities
+        """
+        slots, found = find_handles(self._sorted_handles, port_handles)
+        slots = self._order[slots[found]]
+
+        self.visible.fill(False)
+        self.visible[slots] = True
+        self.time_stamps.fill(timestamp)
+        self.frame_numbers.fill(frame_number)
+        self.tracking.fill(nan)
+        self.tracking[slots] = asarray(tracking)[found]
+        self.tracking_quality.fill(0.0)
+        self.tracking_quality[slots] = asarray(tracking_quality)[found]
@@ -0,0 +1,107 @@
+#  -*- coding: utf-8 -*-
+
+"""A constant memory histogram with logarithmic buckets, for
+percentiles of latencies.
+"""
+from math import log, ceil
+from numpy import (asarray, zeros, int64, float64, exp, cumsum, searchsorted,
+                   full, nan, maximum, arange, inf)
+from numpy import ceil as ceil_array
+
+
+class LogHistogram:
+    """
+    Counts values into buckets whose widths grow in proportion to their
+    values, so any percentile can be read back with a bounded relative
+    error. Holds several rows, for example one per stage of a frame,
+    that are updated together.
+    """
+    def __init__(self, rows=1, lowest=1e3, highest=1e11, precision=0.01):
+        """
+        :param rows: the number of independent histograms
+        :param lowest: the smallest value resolved, smaller values are
+            counted as zero
+        :param highest: the largest value resolved, larger values are
+            counted as highest
+        :param precision: the relative width of each bucket, which
+            bounds the relative error of the percentiles
+        :raise Exception: ValueError
+        """
+        if not 0.0 < lowest < highest:
+            raise ValueError('Histogram range must satisfy 0 < lowest < '
+                             'highest', lowest, highest)
+        if precision <= 0.0:
+            raise ValueError('Histogram precision must be positive',
+                             precision)
+        self._lowest = lowest
+        self._log_base = log(1.0 + precision)
+        self._buckets = int(ceil(log(highest / lowest) / self._log_base)) + 2
+        self.counts = zeros((rows, self._buckets), dtype=int64)
+        self.sums = zeros(rows, dtype=float64)
+
+    def record(self, values):
+        """
+        Counts one value into each row. This runs once per frame, so
+        works on a few Python numbers rather than NumPy arrays.
+
+        :param values: a sequence with a value for each row
+        """
+        counts = self.counts
+        sums = self.sums
+        last = self._buckets - 1
+        for row, value in enumerate(values):
+            sums[row] += value
+            if value < self._lowest:
+                counts[row, 0] += 1
+            else:
+                bucket = int(log(value / self._lowest) / self._log_base) + 1
+                counts[row, min(bucket, last)] += 1
+
+    def add(self, other):
+        """
+        Adds the counts of another histogram with the same layout.
+
+        :param other: a LogHistogram made with the same parameters
+        """
+        self.counts += other.counts
+        self.sums += other.sums
+
+    def reset(self):
+        """
+        Clears all counts.
+        """
+        self.counts[:] = 0
+        self.sums[:] = 0.0
+
+    def percentiles(self, quantiles):
+        """
+        Returns percentiles of each row.
+
+        :param quantiles: the percentiles to return, between 0 and 100
+        :return: a rows x len(quantiles) array of the upper edge of the
+            bucket holding each percentile, NaN for empty rows
+        """
+        quantiles = asarray(quantiles, dtype=float64).ravel()
+        result = full((self.counts.shape[0], quantiles.shape[0]), nan)
+        totals = cumsum(self.counts, axis=1)
+        for row, cumulative in enumerate(totals):
+            if cumulative[-1] == 0:
+                continue
+            targets = maximum(ceil_array(quantiles / 100.0 * cumulative[-1]),
+                              1)
+            buckets = searchsorted(cumulative, targets, side='left')
+            result[row] = self.upper_edges()[buckets]
+        return result
+
+    def upper_edges(self):
+        """
+        Returns the upper edge of each bucket.
+
+        :return: an array with the largest value counted into each
+            bucket, 0 for the bucket of values below lowest and
+            infinity for the last bucket
+        """
+        edges = self._lowest * exp(arange(self._buckets) * self._log_base)
+        edges[0] = 0.0
+        edges[-1] = inf
+        return edges
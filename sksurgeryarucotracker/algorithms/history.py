@@ -0,0 +1,139 @@
+#  -*- coding: utf-8 -*-
+
+"""A time indexed history of recent poses, to look up the poses of
+tools at times between frames.
+"""
+from numpy import (asarray, empty, float64, int64, arange, minimum, full,
+                   nan, searchsorted, clip, eye)
+
+from sksurgeryarucotracker.algorithms.geometry import (
+    matrices_to_quaternions, quaternions_to_matrices, slerp_quaternions)
+from sksurgeryarucotracker.algorithms.handles import (find_handles,
+                                                      add_handles)
+
+
+class PoseHistory:
+    """
+    Keeps a ring buffer of the most recent poses of each tool. The
+    buffers for every port handle are rows of contiguous arrays.
+    """
+    def __init__(self, length=256):
+        """
+        :param length: the number of poses kept for each tool
+        :raise Exception: ValueError
+        """
+        if length < 2:
+            raise ValueError('Pose history length must be at least 2',
+                             length)
+        self._length = length
+
+        self._port_handles = None
+        self._times = None
+        self._positions = None
+        self._quaternions = None
+        self._heads = None
+        self._counts = None
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the history of all tools.
+        """
+        self._port_handles = empty(0, dtype=int64)
+        self._times = empty((0, self._length), dtype=float64)
+        self._positions = empty((0, self._length, 3), dtype=float64)
+        self._quaternions = empty((0, self._length, 4), dtype=float64)
+        self._heads = empty(0, dtype=int64)
+        self._counts = empty(0, dtype=int64)
+
+    def update(self, port_handles, tracking, timestamp):
+        """
+        Adds a frame of poses to the history. Frames must be added in
+        time order.
+
+        :param port_handles: N port handles
+        :param tracking: N x 4 x 4 tracking matrices
+        :param timestamp: the time of the frame, in seconds
+        """
+        (self._port_handles, self._times, self._positions,
+         self._quaternions, self._heads,
+         self._counts) = add_handles(self._port_handles, port_handles,
+                                     self._times, self._positions,
+                                     self._quaternions, self._heads,
+                                     self._counts)
+        slots, _ = find_handles(self._port_handles, port_handles)
+
+        tracking = asarray(tracking, dtype=float64).reshape(-1, 4, 4)
+        heads = self._heads[slots]
+        self._times[slots, heads] = timestamp
+        self._positions[slots, heads] = tracking[:, 0:3, 3]
+        self._quaternions[slots, heads] = matrices_to_quaternions(
+            tracking[:, 0:3, 0:3])
+        self._heads[slots] = (heads + 1) % self._length
+        self._counts[slots] = minimum(self._counts[slots] + 1, self._length)
+
+    def get_times(self, port_handle):
+        """
+        Returns the times of the poses held for a tool.
+
+        :param port_handle: the port handle of the tool
+        :return: an array of times, oldest first, empty for tools that
+            have never been seen
+        """
+        slot, order = self._chronological(port_handle)
+        if slot is None:
+            return empty(0, dtype=float64)
+        return self._times[slot, order]
+
+    def interpolate(self, port_handle, timestamps):
+        """
+        Returns the poses of a tool at many times, interpolating
+        linearly between the held poses for position and spherically
+        for rotation. Each time is found by binary search.
+
+        :param port_handle: the port handle of the tool
+        :param timestamps: K times, in seconds
+        :return: a K x 4 x 4 array of tracking matrices, NaN for times
+            outside the span of the held poses
+        """
+        timestamps = asarray(timestamps, dtype=float64).ravel()
+        tracking = full((timestamps.shape[0], 4, 4), nan)
+        slot, order = self._chronological(port_handle)
+        if slot is None:
+            return tracking
+
+        times = self._times[slot, order]
+        valid = (timestamps >= times[0]) & (timestamps <= times[-1])
+        timestamps = timestamps[valid]
+
+        lower = clip(searchsorted(times, timestamps, side='right') - 1,
+                     0, max(order.shape[0] - 2, 0))
+        upper = minimum(lower + 1, order.shape[0] - 1)
+        intervals = times[upper] - times[lower]
+        intervals[intervals <= 0.0] = 1.0
+        fractions = ((timestamps - times[lower]) / intervals).reshape(-1, 1)
+
+        lower = order[lower]
+        upper = order[upper]
+        positions = self._positions[slot]
+        quaternions = slerp_quaternions(self._quaternions[slot, lower],
+                                        self._quaternions[slot, upper],
+                                        fractions)
+        tracking[valid] = eye(4)
+        tracking[valid, 0:3, 0:3] = quaternions_to_matrices(quaternions)
+        tracking[valid, 0:3, 3] = (positions[lower] + fractions *
+                                   (positions[upper] - positions[lower]))
+        return tracking
+
+    def _chronological(self, port_handle):
+        """
+        Returns the slot of a tool and the indices of its held poses,
+        oldest first, or None and an empty array if it is unknown
+        """
+        slots, found = find_handles(self._port_handles, [port_handle])
+        if not found[0] or self._counts[slots[0]] == 0:
+            return None, empty(0, dtype=int64)
+        slot = slots[0]
+        count = self._counts[slot]
+        order = (self._heads[slot] - count + arange(count)) % self._length
+        return slot, order
@@ -0,0 +1,141 @@
+#  -*- coding: utf-8 -*-
+
+"""Pose prediction, to compensate for the latency between capture and
+display.
+"""
+from numpy import (asarray, empty, float64, int64, clip, isnan, nan, full,
+                   eye)
+
+from sksurgeryarucotracker.algorithms.geometry import (
+    matrices_to_quaternions, quaternions_to_matrices,
+    rodrigues_to_quaternions, quaternions_to_rodrigues,
+    multiply_quaternions)
+from sksurgeryarucotracker.algorithms.handles import (find_handles,
+                                                      add_handles)
+
+
+class ConstantVelocityPredictor:
+    """
+    Estimates the linear and angular velocity of many tools from
+    consecutive frames, and extrapolates all of their poses to a
+    requested time at once. The state for every port handle is kept
+    in contiguous arrays.
+    """
+    def __init__(self, velocity_weight=0.5, maximum_interval=0.1):
+        """
+        :param velocity_weight: the weight, between 0 and 1, given to
+            the velocity measured in the newest frame, the rest comes
+            from the previous velocity estimate.
+        :param maximum_interval: the longest time, in seconds, that
+            poses are extrapolated for. Tools not seen for longer than
+            this have their velocity reset.
+        :raise Exception: ValueError
+        """
+        if not 0.0 < velocity_weight <= 1.0:
+            raise ValueError('Velocity weight must be in (0, 1]',
+                             velocity_weight)
+        if maximum_interval <= 0.0:
+            raise ValueError('Maximum interval must be positive',
+                             maximum_interval)
+        self._velocity_weight = velocity_weight
+        self._maximum_interval = maximum_interval
+
+        self._port_handles = None
+        self._positions = None
+        self._quaternions = None
+        self._linear_velocities = None
+        self._angular_velocities = None
+        self._times = None
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the state of all tools.
+        """
+        self._port_handles = empty(0, dtype=int64)
+        self._positions = empty((0, 3), dtype=float64)
+        self._quaternions = empty((0, 4), dtype=float64)
+        self._linear_velocities = empty((0, 3), dtype=float64)
+        self._angular_velocities = empty((0, 3), dtype=float64)
+        self._times = empty(0, dtype=float64)
+
+    def update(self, port_handles, tracking, timestamp):
+        """
+        Updates the velocity estimates from a frame of poses.
+
+        :param port_handles: N port handles
+        :param tracking: N x 4 x 4 tracking matrices
+        :param timestamp: the time of the frame, in seconds
+        """
+        (self._port_handles, self._positions, self._quaternions,
+         self._linear_velocities, self._angular_velocities,
+         self._times) = add_handles(self._port_handles, port_handles,
+                                    self._positions, self._quaternions,
+                                    self._linear_velocities,
+                                    self._angular_velocities, self._times)
+        slots, _ = find_handles(self._port_handles, port_handles)
+
+        tracking = asarray(tracking, dtype=float64).reshape(-1, 4, 4)
+        positions = tracking[:, 0:3, 3]
+        quaternions = matrices_to_quaternions(tracking[:, 0:3, 0:3])
+
+        interval = timestamp - self._times[slots]
+        fresh = ~(interval <= self._maximum_interval) | ~(interval > 0.0)
+        interval[fresh] = 1.0
+        interval = interval.reshape(-1, 1)
+
+        linear = (positions - self._positions[slots]) / interval
+        inverse = self._quaternions[slots] * [1.0, -1.0, -1.0, -1.0]
+        angular = quaternions_to_rodrigues(
+            multiply_quaternions(inverse, quaternions)) / interval
+
+        previous_linear = self._linear_velocities[slots]
+        previous_angular = self._angular_velocities[slots]
+        unknown = isnan(previous_linear[:, 0])
+        previous_linear[unknown] = 0.0
+        previous_angular[unknown] = 0.0
+        weight = full((slots.shape[0], 1), self._velocity_weight)
+        weight[unknown] = 1.0
+        linear = weight * linear + (1.0 - weight) * previous_linear
+        angular = weight * angular + (1.0 - weight) * previous_angular
+        linear[fresh] = nan
+        angular[fresh] = nan
+
+        self._positions[slots] = positions
+        self._quaternions[slots] = quaternions
+        self._linear_velocities[slots] = linear
+        self._angular_velocities[slots] = angular
+        self._times[slots] = timestamp
+
+    def predict(self, port_handles, timestamp):
+        """
+        Extrapolates the poses of tools to a time.
+
+        :param port_handles: N port handles
+        :param timestamp: the time to predict the poses at, in seconds.
+            Times before a tool's latest pose return that pose, and
+            times more than the maximum interval after it are treated
+            as the maximum interval.
+        :return: an N x 4 x 4 array of tracking matrices, NaN for
+            tools that have never been seen
+        """
+        slots, found = find_handles(self._port_handles, port_handles)
+        slots = slots[found]
+        interval = clip(timestamp - self._times[slots], 0.0,
+                        self._maximum_interval)[:, None]
+
+        linear = self._linear_velocities[slots]
+        angular = self._angular_velocities[slots]
+        still = isnan(linear[:, 0])
+        linear[still] = 0.0
+        angular[still] = 0.0
+
+        rotation = rodrigues_to_quaternions(angular * interval)
+        quaternions = multiply_quaternions(self._quaternions[slots],
+                                           rotation)
+
+        tracking = full((found.shape[0], 4, 4), nan)
+        tracking[found] = eye(4)
+        tracking[found, 0:3, 0:3] = quaternions_to_matrices(quaternions)
+        tracking[found, 0:3, 3] = self._positions[slots] + linear * interval
+        return tracking
@@ -0,0 +1,173 @@
+#  -*- coding: utf-8 -*-
+
+"""Tracing of the memory allocated by each tracking call, with
+tracemalloc, to find leaks and allocation heavy code.
+
+tracemalloc is global to the process, so it is started by the first
+tracer created and stopped when the last is stopped, unless it was
+already tracing. Measuring the peak of each call needs Python 3.9.
+"""
+import sys
+import tracemalloc
+from threading import Lock
+
+TRACING_SUPPORTED = hasattr(tracemalloc, "reset_peak")
+"""Whether allocation tracing is available, it needs Python 3.9"""
+
+_LOCK = Lock()
+_STATE = {"tracers": 0, "started": False}
+
+
+def _start_tracing(traceback_depth):
+    """
+    Starts tracemalloc for a new tracer, if it is not already tracing
+    """
+    with _LOCK:
+        if _STATE["tracers"] == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(traceback_depth)
+            _STATE["started"] = True
+        _STATE["tracers"] += 1
+
+
+def _stop_tracing():
+    """
+    Stops tracemalloc when the last tracer stops, if a tracer started it
+    """
+    with _LOCK:
+        _STATE["tracers"] -= 1
+        if _STATE["tracers"] == 0 and _STATE["started"]:
+            tracemalloc.stop()
+            _STATE["started"] = False
+
+
+class AllocationTracer:
+    """
+    Measures, for each call it runs, the peak bytes allocated during
+    the call and the net bytes and memory blocks it allocated, which
+    include its return value. Memory retained by the calls is measured
+    from the start of one call to the start of the next, so does not
+    count return values the caller has let go. Every interval calls it
+    compares tracemalloc snapshots, to find the lines where allocated
+    memory grows.
+
+    Only memory allocated through Python, which includes NumPy arrays,
+    is traced, not memory OpenCV allocates internally. If tracemalloc is
+    stopped by other code, calls are run without being measured.
+    """
+    def __init__(self, top=10, interval=100, traceback_depth=1):
+        """
+        :param top: the number of allocation sites to report
+        :param interval: the number of calls between snapshots, or None
+            to take no snapshots
+        :param traceback_depth: the number of frames tracemalloc keeps
+            for each allocation, if it is not already tracing
+        :raise Exception: ImportError, ValueError
+        """
+        if not TRACING_SUPPORTED:
+            raise ImportError('Allocation tracing needs Python 3.9 or later')
+        if top < 1:
+            raise ValueError('Allocation sites to report must be at least 1',
+                             top)
+        if interval is not None and interval < 1:
+            raise ValueError('Snapshot interval must be at least 1', interval)
+        self._top = top
+        self._interval = interval
+        self._tracing = True
+        _start_tracing(traceback_depth)
+
+        self.calls = 0
+        self.latest = {}
+        self._peak_bytes = 0
+        self._first = None
+        self._last = None
+        self._growth = {}
+        self._snapshot = None
+
+    def run(self, function, *args):
+        """
+        Calls a function, measuring its allocations.
+
+        :param function: the function to call
+        :param args: the arguments of the function
+        :return: the return value of the function
+        """
+        if not tracemalloc.is_tracing():
+            return function(*args)
+        if self._interval is not None and self.calls % self._interval == 0:
+            self._compare_snapshots()
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        blocks = sys.getallocatedblocks()
+        self._last = (before, blocks)
+        if self._first is None:
+            self._first = self._last
+        try:
+            return function(*args)
+        finally:
+            after, peak = tracemalloc.get_traced_memory()
+            self.latest = {"peak bytes": peak - before,
+                           "net bytes": after - before,
+                           "net blocks": sys.getallocatedblocks() - blocks}
+            self._peak_bytes += self.latest["peak bytes"]
+            self.calls += 1
+
+    def _compare_snapshots(self):
+        """
+        Adds the growth at each line since the previous snapshot
+        """
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),))
+        if self._snapshot is not None:
+            for statistic in snapshot.compare_to(self._snapshot, 'lineno'):
+                site = str(statistic.traceback[0])
+                size, count = self._growth.get(site, (0, 0))
+                self._growth[site] = (size + statistic.size_diff,
+                                      count + statistic.count_diff)
+        self._snapshot = snapshot
+
+    def report(self):
+        """
+        Summarises the calls measured so far.
+
+        :return: a dictionary with the number of "calls", the mean
+            "peak bytes per call", the mean "retained bytes per call"
+            and "retained blocks per call", from the start of the first
+            call to the start of the latest, "growth sites", a list of the
+            lines whose allocated memory grew most between snapshots,
+            and "largest sites", a list of the lines holding the most
+            memory now. Sites are dictionaries of "site", "bytes" and
+            "blocks".
+        """
+        calls = max(self.calls, 1)
+        retained_bytes, retained_blocks = 0.0, 0.0
+        if self.calls > 1:
+            retained_bytes = (self._last[0] - self._first[0]) / (calls - 1)
+            retained_blocks = (self._last[1] - self._first[1]) / (calls - 1)
+        growth = sorted(self._growth.items(), key=lambda item: item[1][0],
+                        reverse=True)[0:self._top]
+        largest = []
+        if tracemalloc.is_tracing():
+            largest = tracemalloc.take_snapshot().filter_traces(
+                (tracemalloc.Filter(False, tracemalloc.__file__),)
+            ).statistics('lineno')[0:self._top]
+        return {
+            "calls": self.calls,
+            "peak bytes per call": self._peak_bytes / calls,
+            "retained bytes per call": retained_bytes,
+            "retained blocks per call": retained_blocks,
+            "growth sites": [{"site": site, "bytes": size, "blocks": count}
+                             for site, (size, count) in growth if size > 0],
+            "largest sites": [{"site": str(statistic.traceback[0]),
+                               "bytes": statistic.size,
+                               "blocks": statistic.count}
+                              for statistic in largest]}
+
+    def stop(self):
+        """
+        Stops this tracer, and tracemalloc if this is the last tracer
+        and a tracer started it.
+        """
+        if self._tracing:
+            self._tracing = False
+            self._snapshot = None
+            _stop_tracing()
@@ -3,38 +3,75 @@
 """A class for straightforward tracking with an ARuCo
 """
 from time import time
-from numpy import nditer, array, mean, float32, loadtxt
-from numpy import min as npmin
-from numpy import max as npmax
+from asyncio import get_running_loop
+from concurrent.futures import ThreadPoolExecutor
+from numpy import (array, asarray, empty, eye, float32, loadtxt,
+                   arange, argsort, full, nan, int64, float64, dtype)
 from numpy.linalg import norm
 import cv2.aruco as aruco # pylint: disable=import-error
-from cv2 import VideoCapture, imshow
+from cv2 import VideoCapture, imshow, undistortPoints
 import cv2
 
-from sksurgerycore.transforms.matrix import (construct_rotm_from_euler,
-                                             construct_rigid_transformation,
-                                             )
-
 from sksurgerycore.baseclasses.tracker import SKSBaseTracker
 
-def _get_poses_without_calibration(marker_corners):
+from sksurgeryarucotracker.algorithms.geometry import (
+    project_points, marker_areas, reprojection_errors,
+    reprojection_quality, ippe_square_poses, select_pose_candidates,
+    matrices_to_quaternion_poses)
+from sksurgeryarucotracker.algorithms.handles import (
+    find_handles, first_handles, SlotFrame)
+from sksurgeryarucotracker.algorithms.filters import OneEuroFilterBank
+from sksurgeryarucotracker.algorithms.prediction import \
+        ConstantVelocityPredictor
+from sksurgeryarucotracker.algorithms.cache import PoseCache
+from sksurgeryarucotracker.algorithms.history import PoseHistory
+from sksurgeryarucotracker import streaming, timing
+from sksurgeryarucotracker.outputs import FrameOutputs
+from sksurgeryarucotracker.diagnostics import TrackerDiagnostics
+
+FRAME_DTYPE = dtype([('port_handle', int64),
+                     ('time_stamp', float64),
+                     ('frame_number', int64),
+                     ('tracking', float64, (4, 4)),
+                     ('tracking_quality', float64)])
+"""The structured array type returned by ArUcoTracker.get_frame_array"""
+
+QUATERNION_FRAME_DTYPE = dtype([('port_handle', int64),
+                                ('time_stamp', float64),
+                                ('frame_number', int64),
+                                ('tracking', float64, (7,)),
+                                ('tracking_quality', float64)])
+"""The structured array type returned by ArUcoTracker.get_frame_array
+when use_quaternions is true"""
+
+def _get_poses_without_calibration(marker_corners, out=None):
     """
     Returns a tracking data for and uncalibrated camera.
     x and y are the screen pixel coordinates.
     z is based on the size of the tag in pixels, there is no
     rotation
+
+    :param marker_corners: the marker corners as returned by
+        aruco.detectMarkers, or an N x 4 x 2 array
+    :param out: optional N x 4 x 4 float32 array to write the
+        tracking matrices into
+    :return: an N x 4 x 4 array of tracking matrices
+    :raise Exception: ValueError
     """
-    tracking = []
-    for marker in marker_corners:
-        means = mean(marker[0], axis=0)
-        maxs = npmax(marker[0], axis=0)
-        mins = npmin(marker[0], axis=0)
-        size = norm(maxs - mins)
-        tracking.append(array([[1.0, 0.0, 0.0, means[0]],
-                               [0.0, 1.0, 0.0, means[1]],
-                               [0.0, 0.0, 1.0, -size],
-                               [0.0, 0.0, 0.0, 1.0]], dtype=float32))
-    return tracking
+    corners = asarray(marker_corners, dtype=float32).reshape(-1, 4, 2)
+    marker_count = corners.shape[0]
+
+    if out is None:
+        out = empty((marker_count, 4, 4), dtype=float32)
+    elif out.shape != (marker_count, 4, 4) or out.dtype != float32:
+        raise ValueError(('Output buffer needs to be {} x 4 x 4 and '
+                          'float32').format(marker_count),
+                         out.shape, out.dtype)
+
+    out[:] = eye(4, dtype=float32)
+    out[:, 0:2, 3] = corners.mean(axis=1)
+    out[:, 2, 3] = -norm(corners.max(axis=1) - corners.min(axis=1), axis=1)
+    return out
 
 
 def _load_calibration(textfile):
@@ -46,7 +83,51 @@ def _load_calibration(textfile):
 
     return projection_matrix, distortion
 
+def _make_pose_cache(configuration):
+    """
+    Returns a pose cache, if one is configured
+    """
+    tolerance = configuration.get("pose cache tolerance", None)
+    if tolerance is None:
+        return None
+    return PoseCache(tolerance)
+
+
+def _make_filter_bank(configuration):
+    """
+    Returns a pose smoothing filter bank, if one is configured
+    """
+    smoothing = configuration.get("smoothing", None)
+    if smoothing is None:
+        return None
+    return OneEuroFilterBank(smoothing.get("min cutoff", 1.0),
+                             smoothing.get("beta", 0.0),
+                             smoothing.get("derivative cutoff", 1.0))
+
+
+def _make_predictor(configuration):
+    """
+    Returns a pose predictor, if one is configured
+    """
+    prediction = configuration.get("prediction", None)
+    if prediction is None:
+        return None
+    return ConstantVelocityPredictor(prediction.get("velocity weight", 0.5),
+                                     prediction.get("maximum interval", 0.1))
+
+
+def _make_pose_history(configuration):
+    """
+    Returns a pose history, if one is configured
+    """
+    history = configuration.get("pose history", None)
+    if history is None:
+        return None
+    return PoseHistory(history.get("length", 256))
+
+
 class ArUcoTracker(SKSBaseTracker):
+    # pylint: disable=too-many-instance-attributes
     """
     Base class for communication with trackers.
     Ideally all surgery tracker classes will implement
@@ -68,6 +149,94 @@ class ArUcoTracker(SKSBaseTracker):
 
             camera distortion: defaults to None
 
+            quality error scale: the reprojection error, in pixels, at
+            which the tracking quality is halved, defaults to 1.0
+
+            quality reference area: the marker area, in pixels, below
+            which the tracking quality is reduced, defaults to 400.0
+
+            ambiguity ratio: the two candidate poses of a marker are
+            considered ambiguous when the larger reprojection error is
+            less than this times the smaller, in which case the
+            candidate closest to the marker's pose in the previous frame
+            is used, defaults to 2.0
+
+            smoothing: a dictionary of One Euro filter parameters,
+            "min cutoff" (Hz, defaults to 1.0), "beta" (defaults to 0.0)
+            and "derivative cutoff" (Hz, defaults to 1.0). If set, the
+            poses of all tools are smoothed, defaults to None
+
+            prediction: a dictionary of velocity model parameters,
+            "velocity weight" (defaults to 0.5) and "maximum interval"
+            (seconds, defaults to 0.1). If set, get_predicted_frame can
+            be used, defaults to None
+
+            pose history: a dictionary with the "length" (the number of
+            poses kept per tool, defaults to 256) of a history of recent
+            poses. If set, get_interpolated_poses can be used, defaults
+            to None
+
+            stage timing: a dictionary with the "length" (the number of
+            frames to keep, defaults to 1024) of a record of the time
+            taken by each stage of each frame. If set,
+            diagnostics.get_stage_timings and diagnostics.get_frame_timing
+            can be used, defaults to None
+
+            latency statistics: a dictionary with the "window" (seconds,
+            defaults to 10.0), "precision" (the relative precision of
+            the percentiles, defaults to 0.01) and "expected frame rate"
+            (Hz, used to count dropped frames, defaults to None) of
+            rolling statistics of the stage timings. If set, stage
+            timing is enabled and diagnostics.get_latency_statistics can
+            be used, defaults to None
+
+            metrics: a dictionary with the "port" (defaults to 9464, 0
+            for any free port) and "host" (defaults to "127.0.0.1") of
+            an HTTP server that serves the tracker's counters and, if
+            configured, latency statistics at /metrics in the
+            Prometheus text format, defaults to None
+
+            profile: a dictionary with the number of "frames" (defaults
+            to 100) to profile from the start, and the "path" of the file
+            to write the profile to, see diagnostics.profile_frames,
+            defaults to None
+
+            allocation tracing: a dictionary with the number of "top"
+            allocation sites to report (defaults to 10) and the
+            "interval" in frames between tracemalloc snapshots (defaults
+            to 100). If set, the memory allocated by each frame is
+            measured and diagnostics.get_allocation_report can be used.
+            This slows tracking, so is for diagnosis, and needs Python
+            3.9, defaults to None
+
+            use quaternions: if true, tracking is returned as an N x 7
+            array of positions and quaternions rather than a list of
+            4x4 matrices, defaults to False
+
+            pose cache tolerance: if set, the pose of a marker is reused
+            from the previous solve while none of its corners have
+            moved more than this many pixels, defaults to None
+
+            shared memory: a dictionary with the "name" (defaults to
+            None, for a generated name) and "capacity" (the most tools
+            per frame, defaults to 64) of a shared memory block to
+            publish each frame into, for SharedMemoryReader in other
+            processes, defaults to None
+
+            pose stream: a dictionary with the "destinations", a list of
+            (host, port) addresses to send each frame to as a UDP
+            datagram, for PoseStreamClient on other machines, defaults
+            to None
+
+            recording: a dictionary with the "path" of a file to append
+            every frame to, for TrackingLogReader, and the "capacity"
+            (the number of records to preallocate, defaults to 65536),
+            defaults to None
+
+            port handles: a list of the port handles (marker ids) that
+            are expected, to register for get_frame_slots, defaults
+            to None
+
         :raise Exception: ImportError, ValueError
         """
 
@@ -83,6 +252,7 @@ class ArUcoTracker(SKSBaseTracker):
         self._frame_number = 0
 
         self._debug = configuration.get("debug", False)
+        self.use_quaternions = configuration.get("use quaternions", False)
 
         video_source = configuration.get("video source", 0)
 
@@ -104,6 +274,36 @@ class ArUcoTracker(SKSBaseTracker):
         self._ar_dict = aruco.getPredefinedDictionary(ar_dictionary_name)
 
         self._marker_size = configuration.get("marker size", 50)
+        half_size = self._marker_size / 2.0
+        self._marker_points = array([[-half_size, half_size, 0.0],
+                                     [half_size, half_size, 0.0],
+                                     [half_size, -half_size, 0.0],
+                                     [-half_size, -half_size, 0.0]])
+
+        self._quality_error_scale = configuration.get("quality error scale",
+                                                      1.0)
+        self._quality_reference_area = configuration.get(
+                        "quality reference area", 400.0)
+
+        self._ambiguity_ratio = configuration.get("ambiguity ratio", 2.0)
+        self._previous_ids = empty(0, dtype=int64)
+        self._previous_rotations = empty((0, 3, 3))
+
+        self._pose_cache = _make_pose_cache(configuration)
+
+        self._filter_bank = _make_filter_bank(configuration)
+        self._predictor = _make_predictor(configuration)
+        self._pose_history = _make_pose_history(configuration)
+        self.diagnostics = TrackerDiagnostics(configuration)
+        self._capture_failures = 0
+        self._last_frame = (empty(0, dtype=int64), 0, empty(0))
+
+        self._executor = None
+        self._outputs = FrameOutputs(self._format_frame)
+
+        self._slot_frame = None
+        if configuration.get("port handles", None) is not None:
+            self.register_port_handles(configuration.get("port handles"))
 
         if "calibration" in configuration:
             self._camera_projection_matrix, self._camera_distortion = \
@@ -128,6 +328,21 @@ class ArUcoTracker(SKSBaseTracker):
         else:
             self._state = "ready"
 
+        self._open_outputs(configuration)
+
+    def _open_outputs(self, configuration):
+        """
+        Creates the configured outputs and diagnostics. They are created
+        once the video source is open, and closed if any fail, so a
+        tracker that cannot be created leaves no shared memory, sockets,
+        recording or tracing behind.
+        """
+        try:
+            self.diagnostics.open(configuration, self.get_counters)
+            self._outputs.open(configuration)
+        except:
+            self.close()
+            raise
 
     def _check_pose_estimation_ok(self):
         """Checks that the camera projection matrix and camera distortion
@@ -151,9 +366,14 @@ class ArUcoTracker(SKSBaseTracker):
 
         :raise Exception: ValueError
         """
+        self._outputs.close()
+        self.diagnostics.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
         if self._capture is not None:
             self._capture.release()
-            del self._capture
+            self._capture = None
         self._state = None
 
     def get_frame(self, frame=None):
@@ -169,71 +389,521 @@ class ArUcoTracker(SKSBaseTracker):
             frame_numbers : list of framenumbers (tracker clock) one per tool
 
             tracking : list of 4x4 tracking matrices, rotation and position,
-            or if use_quaternions is true, a list of tracking quaternions,
-            column 0-2 is x,y,z column 3-6 is the rotation as a quaternion.
+            or if use_quaternions is true, an N x 7 array of tracking
+            quaternions, column 0-2 is x,y,z column 3-6 is the rotation
+            as a quaternion (qw, qx, qy, qz).
 
             tracking_quality : list the tracking quality, one per tool.
 
+        :raise Exception: ValueError
+        """
+        return self._format_frame(*self._track(frame))
+
+    def get_frame_array(self, frame=None):
+        """Gets a frame of tracking data from the Tracker device, as a
+        single structured array rather than lists.
+
+        :params frame: an image to process, if None, we use the OpenCV
+            video source.
+        :return: a structured array of FRAME_DTYPE, or
+            QUATERNION_FRAME_DTYPE if use_quaternions is true, with one
+            row per tool and fields port_handle, time_stamp,
+            frame_number, tracking and tracking_quality.
+
+        :raise Exception: ValueError
+        """
+        port_handles, timestamp, frame_number, tracking, tracking_quality = \
+                self._track(frame)
+
+        if self.use_quaternions:
+            result = empty(port_handles.shape[0],
+                           dtype=QUATERNION_FRAME_DTYPE)
+            result['tracking'] = matrices_to_quaternion_poses(tracking)
+        else:
+            result = empty(port_handles.shape[0], dtype=FRAME_DTYPE)
+            result['tracking'] = tracking
+        result['port_handle'] = port_handles
+        result['time_stamp'] = timestamp
+        result['frame_number'] = frame_number
+        result['tracking_quality'] = tracking_quality
+        return result
+
+    def register_port_handles(self, port_handles):
+        """
+        Registers the port handles (marker ids) that are expected, so
+        get_frame_slots can write each frame into fixed slots.
+
+        :param port_handles: a list of unique port handles
+        :raise Exception: ValueError
+        """
+        self._slot_frame = SlotFrame(port_handles, self.use_quaternions)
+
+    def get_frame_slots(self, frame=None):
+        """Gets a frame of tracking data from the Tracker device,
+        written into preallocated arrays with one fixed slot per
+        registered port handle.
+
+        :params frame: an image to process, if None, we use the OpenCV
+            video source.
+        :return: a SlotFrame. The same object, and the same arrays, are
+            returned and overwritten by every call. Tools that are not
+            visible have visible set to False. Markers that were not
+            registered are ignored.
+
+        :raise Exception: ValueError
+        """
+        if self._slot_frame is None:
+            raise ValueError('Attempted to get frame slots, when no port '
+                             'handles are registered')
+
+        port_handles, timestamp, frame_number, tracking, tracking_quality = \
+                self._track(frame)
+        if self.use_quaternions:
+            tracking = matrices_to_quaternion_poses(tracking)
+
+        self._slot_frame.update(port_handles, timestamp, frame_number,
+                                tracking, tracking_quality)
+        return self._slot_frame
+
+    def iter_frames(self, images=None, decimation=1, port_handles=None,
+                    limit=None):
+        """Iterates lazily over frames of tracking data. Images are
+        only read and processed as frames are consumed. The iteration
+        ends when the video source fails to read, which is counted as a
+        capture failure, as in get_frame, or when limit frames have been
+        yielded. Use the tracker as a context manager to
+        start and stop tracking, and close it, deterministically.
+
+        :params images: an iterable of images to process, if None, we
+            use the OpenCV video source.
+        :params decimation: process every decimation-th image only,
+            images in between are grabbed but not decoded.
+        :params port_handles: if set, only these port handles are
+            included in each frame.
+        :params limit: if set, the largest number of frames to yield.
+        :return: a generator of frames, as returned by get_frame
+
+        :raise Exception: ValueError
+        """
+        if images is None:
+            if self._capture is None:
+                raise ValueError('Attempted to iterate frames, with no '
+                                 'images and no video source')
+            images = streaming.capture_images(
+                self._capture, decimation, self.diagnostics.stage_timer,
+                self._count_capture_failure)
+        else:
+            images = streaming.decimate(images, decimation)
+
+        frames = (self._format_frame(*self.diagnostics.run(self._track_image,
+                                                           image))
+                  for image in images)
+        if port_handles is not None:
+            frames = streaming.select_port_handles(frames, port_handles)
+        if limit is not None:
+            frames = streaming.limit(frames, limit)
+        return frames
+
+    def subscribe(self, maximum_size=1, drop_policy="oldest",
+                  callback=None):
+        """
+        Subscribes to every frame the tracker processes, from any of
+        the get_frame methods or iterators. Frames are given to
+        subscribers as returned by get_frame, without blocking the
+        tracker, and should not be modified by them.
+
+        :param maximum_size: the largest number of frames to hold for
+            this subscriber
+        :param drop_policy: "oldest" to drop the oldest frame held when
+            the subscriber falls behind, or "newest" to drop new frames
+        :param callback: if set, a function called with each frame on
+            the subscription's own thread, otherwise use the returned
+            subscription's get method
+        :return: a Subscription
+        :raise Exception: ValueError
+        """
+        return self._outputs.publisher.subscribe(maximum_size, drop_policy,
+                                                 callback)
+
+    def get_shared_memory_name(self):
+        """
+        Returns the name of the shared memory block frames are
+        published into, to pass to SharedMemoryReader.
+
+        :raise Exception: ValueError
+        """
+        if self._outputs.shared_memory is None:
+            raise ValueError('Attempted to get the shared memory name, when '
+                             'shared memory is not configured')
+        return self._outputs.shared_memory.name
+
+    def unsubscribe(self, subscription):
+        """
+        Removes and closes a subscription.
+
+        :raise Exception: ValueError
+        """
+        self._outputs.publisher.unsubscribe(subscription)
+
+    async def get_frame_async(self, frame=None):
+        """Gets a frame of tracking data without blocking the asyncio
+        event loop. Capture and detection run on a worker thread owned
+        by the tracker, one call at a time.
+
+        :params frame: an image to process, if None, we use the OpenCV
+            video source.
+        :return: as get_frame
+
+        :raise Exception: ValueError
+        """
+        return await get_running_loop().run_in_executor(
+            self._get_executor(), self.get_frame, frame)
+
+    async def aiter_frames(self, images=None, decimation=1,
+                           port_handles=None, limit=None):
+        """Iterates asynchronously over frames of tracking data, as
+        iter_frames, reading and processing each frame on a worker
+        thread so the asyncio event loop is not blocked.
+
+        :params images: as iter_frames
+        :params decimation: as iter_frames
+        :params port_handles: as iter_frames
+        :params limit: as iter_frames
+        :return: an asynchronous generator of frames, as returned by
+            get_frame
+
+        :raise Exception: ValueError
+        """
+        loop = get_running_loop()
+        frames = self.iter_frames(images, decimation, port_handles, limit)
+        finished = object()
+        while True:
+            frame = await loop.run_in_executor(self._get_executor(), next,
+                                               frames, finished)
+            if frame is finished:
+                return
+            yield frame
+
+    def _get_executor(self):
+        """
+        Returns the single worker thread used by the async methods,
+        so calls to the tracker are never made concurrently.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        return self._executor
+
+    def __enter__(self):
+        """
+        Starts tracking, if ready, when used as a context manager.
+        """
+        if self._state == "ready":
+            self.start_tracking()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Stops tracking, if tracking, and closes the tracker.
+        """
+        if self._state == "tracking":
+            self.stop_tracking()
+        self.close()
+
+    def _track(self, frame):
+        """
+        Tracks a frame, with the configured diagnostics.
+
+        :return: as _track_image
+        :raise Exception: ValueError
+        """
+        return self.diagnostics.run(self._read_and_track, frame)
+
+    def _read_and_track(self, frame):
+        """
+        Reads a frame, if needed, detects the markers and estimates
+        their poses.
+
+        :return: as _track_image
         :raise Exception: ValueError
         """
         if self._state != "tracking":
             raise ValueError('Attempted to get frame, when not tracking')
 
         if self._capture is not None:
+            timer = self.diagnostics.stage_timer
+            if timer is not None:
+                timer.start()
             _, frame = self._capture.read()
+            if timer is not None:
+                timer.mark(timing.CAPTURE)
 
         if frame is None:
+            if self.diagnostics.stage_timer is not None:
+                self.diagnostics.stage_timer.cancel()
+            self._count_capture_failure()
             raise ValueError('Frame not set, and capture.read failed')
 
-        marker_corners, marker_ids, _ = \
-                aruco.detectMarkers(frame, self._ar_dict)
+        return self._track_image(frame)
 
-        port_handles = []
-        time_stamps = []
-        frame_numbers = []
-        tracking_quality = []
-        tracking = None
+    def _count_capture_failure(self):
+        """
+        Counts a failed read of the video source
+        """
+        self._capture_failures += 1
 
-        timestamp = time()
+    def _track_image(self, frame):
+        """
+        Detects the markers in an image and estimates their poses.
 
-        if marker_corners:
-            for marker in nditer(marker_ids):
-                port_handles.append(marker.item())
-                time_stamps.append(timestamp)
-                frame_numbers.append(self._frame_number)
-                tracking_quality.append(1.0)
+        :return: an array of port handles, the timestamp, the frame
+            number, an N x 4 x 4 array of tracking matrices and an
+            array of tracking qualities
+        :raise Exception: ValueError
+        """
+        if self._state != "tracking":
+            raise ValueError('Attempted to get frame, when not tracking')
 
-            if self._use_camera_projection:
-                tracking = self._get_poses_with_calibration(marker_corners)
-            else:
-                tracking = _get_poses_without_calibration(marker_corners)
+        timer = self.diagnostics.stage_timer
+        if timer is not None:
+            timer.begin()
 
-            if self._debug:
-                aruco.drawDetectedMarkers(frame, marker_corners)
+        marker_corners, marker_ids, _ = \
+                aruco.detectMarkers(frame, self._ar_dict)
+        if timer is not None:
+            timer.mark(timing.DETECTION)
+
+        frame_number = self._frame_number
+        timestamp = time()
 
+        port_handles, tracking, tracking_quality = self._estimate_poses(
+            marker_corners, marker_ids, timestamp)
+        if timer is not None:
+            timer.mark(timing.POSE_ESTIMATION)
+
+        self._last_frame = (port_handles, frame_number, tracking_quality)
+        self._outputs.publish(port_handles, timestamp, frame_number,
+                              tracking, tracking_quality)
         self._frame_number += 1
+        if timer is not None:
+            timer.mark(timing.PUBLICATION)
+
         if self._debug:
+            if marker_corners:
+                aruco.drawDetectedMarkers(frame, marker_corners)
             imshow('frame', frame)
+        if timer is not None:
+            self.diagnostics.record(frame_number, timestamp)
+
+        return port_handles, timestamp, frame_number, tracking, \
+                tracking_quality
+
+    def _estimate_poses(self, marker_corners, marker_ids, timestamp):
+        """
+        Estimates the poses of detected markers, and updates the
+        filters, predictor and history with them. Where a marker id is
+        detected more than once, only its first detection is used, as
+        a port handle can only have one pose per frame.
+
+        :return: an array of port handles, an N x 4 x 4 array of
+            tracking matrices and an array of tracking qualities
+        """
+        if not marker_corners:
+            return empty(0, dtype=int64), empty((0, 4, 4)), empty(0)
+
+        port_handles = marker_ids.ravel().astype(int64)
+        first = first_handles(port_handles)
+        if first is not None:
+            port_handles = port_handles[first]
+            marker_corners = [marker_corners[index] for index in first]
+
+        if self._use_camera_projection:
+            tracking, errors = self._get_poses_with_calibration(
+                marker_corners, port_handles)
+        else:
+            tracking = _get_poses_without_calibration(marker_corners)
+            errors = 0.0
+
+        if self._filter_bank is not None:
+            tracking = self._filter_bank.update(port_handles, tracking,
+                                                timestamp)
+        if self._predictor is not None:
+            self._predictor.update(port_handles, tracking, timestamp)
+        if self._pose_history is not None:
+            self._pose_history.update(port_handles, tracking, timestamp)
+
+        tracking_quality = reprojection_quality(
+            errors, marker_areas(marker_corners),
+            self._quality_error_scale,
+            self._quality_reference_area)
+        return port_handles, tracking, tracking_quality
+
+    def get_interpolated_poses(self, port_handle, timestamps):
+        """Gets the poses of a tool at many times, interpolated from the
+        pose history, for example to align tracking with the frames of
+        another imaging device.
+
+        :params port_handle: the port handle of the tool
+        :params timestamps: a list of times (cpu clock)
+        :return: the tracking at each time, as get_frame. Times outside
+            the span of the history give NaN.
+
+        :raise Exception: ValueError
+        """
+        if self._pose_history is None:
+            raise ValueError('Attempted to interpolate poses, when the pose '
+                             'history is not configured')
+        return self._format_tracking(
+            self._pose_history.interpolate(port_handle, timestamps))
+
+    def get_predicted_frame(self, timestamp):
+        """Gets the tools seen in the latest frame, with their poses
+        extrapolated to a later time using the velocity of each tool,
+        to hide the latency between capture and display.
+
+        :params timestamp: the time (cpu clock) to predict the poses at.
+        :return: as get_frame, with the predicted tracking and the
+            requested time in time_stamps. Frame numbers and tracking
+            quality are those of the latest frame.
+
+        :raise Exception: ValueError
+        """
+        if self._predictor is None:
+            raise ValueError('Attempted to predict a frame, when prediction '
+                             'is not configured')
+
+        port_handles, frame_number, tracking_quality = self._last_frame
+        tracking = self._predictor.predict(port_handles, timestamp)
+        return self._format_frame(port_handles, timestamp, frame_number,
+                                  tracking, tracking_quality)
+
+    def _format_frame(self, port_handles, timestamp, frame_number,
+                      tracking, tracking_quality):
+        """
+        Converts a frame of arrays to the lists returned by get_frame.
+        """
+        tool_count = port_handles.shape[0]
+        if tool_count == 0:
+            return ([], [], [], None, [])
 
-        return (port_handles, time_stamps, frame_numbers, tracking,
-                tracking_quality)
-
-    def _get_poses_with_calibration(self, marker_corners):
-        rvecs, tvecs, _ = \
-            aruco.estimatePoseSingleMarkers(marker_corners,
-                                            self._marker_size,
-                                            self._camera_projection_matrix,
-                                            self._camera_distortion)
-        tracking = []
-        t_index = 0
-        for rvec in rvecs:
-            rot_mat = construct_rotm_from_euler(rvec[0][0], rvec[0][1],
-                                                rvec[0][2], 'xyz',
-                                                is_in_radians=True)
-            tracking.append(construct_rigid_transformation(rot_mat,
-                                                           tvecs[t_index][0]))
-            t_index += 1
-        return tracking
+        return (port_handles.tolist(), [timestamp] * tool_count,
+                [frame_number] * tool_count, self._format_tracking(tracking),
+                tracking_quality.tolist())
+
+    def _format_tracking(self, tracking):
+        """
+        Converts an N x 4 x 4 array of tracking matrices to the output
+        format, a list of matrices, or an N x 7 array if use_quaternions
+        is true.
+        """
+        if self.use_quaternions:
+            return matrices_to_quaternion_poses(tracking)
+        return list(tracking)
+
+    def get_counters(self):
+        """
+        Returns counters of the tracker's health.
+
+        :return: a dictionary with "frames" (the number tracked),
+            "markers visible" (in the latest frame), "capture failures"
+            and, if the pose cache is configured, "pose cache hits" and
+            "pose cache misses" and, if the pose stream is configured,
+            "pose stream failures"
+        """
+        counters = {"frames": self._frame_number,
+                    "markers visible": len(self._last_frame[0]),
+                    "capture failures": self._capture_failures}
+        if self._pose_cache is not None:
+            counters["pose cache hits"] = self._pose_cache.hits
+            counters["pose cache misses"] = self._pose_cache.misses
+        pose_stream = self._outputs.pose_stream
+        if pose_stream is not None:
+            counters["pose stream failures"] = pose_stream.send_failures
+        return counters
+
+    def get_pose_cache_statistics(self):
+        """
+        Returns the number of marker poses reused from the pose cache,
+        and the number that had to be solved, since the tracker was
+        created.
+
+        :return: a dictionary with "hits" and "misses"
+        :raise Exception: ValueError
+        """
+        if self._pose_cache is None:
+            raise ValueError('Attempted to get pose cache statistics, when '
+                             'the pose cache is not configured')
+        return {"hits": self._pose_cache.hits,
+                "misses": self._pose_cache.misses}
+
+    def _get_poses_with_calibration(self, marker_corners, marker_ids):
+        """
+        Estimates the pose of each marker, and its reprojection error,
+        using the camera calibration. Poses are reused from the pose
+        cache, if configured, when the corners have not moved.
+
+        :return: an N x 4 x 4 array of tracking matrices and an array of
+            reprojection errors, one per marker
+        """
+        corners = asarray(marker_corners, dtype=float32).reshape(-1, 4, 2)
+        marker_ids = asarray(marker_ids, dtype=int64).ravel()
+
+        if self._pose_cache is None:
+            tracking, errors = self._solve_poses(corners, marker_ids)
+        else:
+            cached, tracking, errors = self._pose_cache.lookup(marker_ids,
+                                                               corners)
+            solve = ~cached
+            if solve.any():
+                tracking[solve], errors[solve] = self._solve_poses(
+                    corners[solve], marker_ids[solve])
+                self._pose_cache.store(marker_ids[solve], corners[solve],
+                                       tracking[solve], errors[solve])
+
+        order = argsort(marker_ids, kind='stable')
+        self._previous_ids = marker_ids[order]
+        self._previous_rotations = tracking[order, 0:3, 0:3]
+        return tracking, errors
+
+    def _solve_poses(self, corners, marker_ids):
+        """
+        Solves the pose of each marker. Both planar pose candidates are
+        found for every marker, and ambiguities are resolved using the
+        marker poses from the previous frame.
+
+        :param corners: N x 4 x 2 marker corners
+        :param marker_ids: N marker ids
+        :return: an N x 4 x 4 array of tracking matrices and an array of
+            reprojection errors, one per marker
+        """
+        marker_count = corners.shape[0]
+
+        normalised = undistortPoints(corners.reshape(-1, 1, 2),
+                                     self._camera_projection_matrix,
+                                     self._camera_distortion)
+        rotations, translations = ippe_square_poses(normalised,
+                                                    self._marker_size)
+
+        projected = project_points(self._marker_points,
+                                   rotations.reshape(-1, 3, 3),
+                                   translations.reshape(-1, 3),
+                                   self._camera_projection_matrix,
+                                   self._camera_distortion)
+        errors = reprojection_errors(corners.repeat(2, axis=0),
+                                     projected).reshape(marker_count, 2)
+
+        previous = full((marker_count, 3, 3), nan)
+        slots, seen = find_handles(self._previous_ids, marker_ids)
+        previous[seen] = self._previous_rotations[slots[seen]]
+
+        choice = select_pose_candidates(errors, rotations, previous,
+                                        self._ambiguity_ratio)
+        rows = arange(marker_count)
+
+        tracking = empty((marker_count, 4, 4))
+        tracking[:, 0:3, 0:3] = rotations[rows, choice]
+        tracking[:, 0:3, 3] = translations[rows, choice]
+        tracking[:, 3, :] = [0.0, 0.0, 0.0, 1.0]
+        return tracking, errors[rows, choice]
 
     def get_tool_descriptions(self):
         """ Returns tool descriptions """
@@ -245,6 +915,18 @@ class ArUcoTracker(SKSBaseTracker):
         :raise Exception: ValueError
         """
         if self._state == "ready":
+            self._previous_ids = empty(0, dtype=int64)
+            self._previous_rotations = empty((0, 3, 3))
+            if self._pose_cache is not None:
+                self._pose_cache.clear()
+            if self._filter_bank is not None:
+                self._filter_bank.reset()
+            if self._predictor is not None:
+                self._predictor.reset()
+            if self._pose_history is not None:
+                self._pose_history.reset()
+            self.diagnostics.reset()
+            self._last_frame = (empty(0, dtype=int64), 0, empty(0))
             self._state = "tracking"
         else:
             raise ValueError('Attempted to start tracking, when not ready')
@@ -0,0 +1,200 @@
+#  -*- coding: utf-8 -*-
+
+"""Accuracy against speed benchmark of ArUcoTracker configurations,
+over synthetic scenes with ground truth poses.
+"""
+import argparse
+import json
+from time import perf_counter
+from numpy import arccos, clip, concatenate, degrees, einsum, percentile
+from numpy.linalg import norm
+
+from sksurgeryarucotracker.arucotracker import ArUcoTracker
+from sksurgeryarucotracker.algorithms.handles import find_handles
+from sksurgeryarucotracker.synthetic import SyntheticScene
+
+CONFIGURATIONS = {
+    "default": {},
+    "pose cache": {"pose cache tolerance": 0.5},
+    "smoothing": {"smoothing": {"min cutoff": 1.0, "beta": 0.01}},
+    "strict ambiguity": {"ambiguity ratio": 1.0}}
+"""Tracker settings to compare, added to the settings each scene needs"""
+
+SCENES = {
+    "4 markers 640x480": {"marker count": 4, "motion": 0.2},
+    "30 markers 1280x720": {"marker count": 30, "resolution": (1280, 720),
+                            "motion": 0.2},
+    "100 markers 1920x1080": {"marker count": 100,
+                              "resolution": (1920, 1080), "motion": 0.2,
+                              "blur": 0.5, "noise": 2.0}}
+"""Synthetic scenes to track, see SyntheticScene"""
+
+
+def pose_errors(tracking, ground_truth):
+    """
+    Returns the errors of estimated poses.
+
+    :param tracking: N x 4 x 4 estimated poses
+    :param ground_truth: N x 4 x 4 true poses
+    :return: arrays of the N translation errors, in the units of the
+        poses, and rotation errors, in degrees
+    """
+    translations = norm(tracking[:, 0:3, 3] - ground_truth[:, 0:3, 3],
+                        axis=1)
+    traces = einsum('nij,nij->n', tracking[:, 0:3, 0:3],
+                    ground_truth[:, 0:3, 0:3])
+    rotations = degrees(arccos(clip((traces - 1.0) / 2.0, -1.0, 1.0)))
+    return translations, rotations
+
+
+def evaluate(configuration, scene, frame_count=50):
+    """
+    Tracks rendered frames of a scene, timing the tracking and
+    comparing the poses with the ground truth.
+
+    Frames are rendered before timing starts.
+
+    :param configuration: ArUcoTracker settings, the scene's
+        dictionary, calibration and marker size are added to them
+    :param scene: a SyntheticScene
+    :param frame_count: the number of frames to track
+    :return: a dictionary of the frames per second, the fraction of
+        markers detected, the number of detections of markers not in
+        the scene, and the mean, p95 and maximum translation
+        (mm) and rotation (degrees) errors
+    """
+    frames = list(scene.frames(frame_count))
+    configuration = dict(configuration)
+    configuration.update({"video source": "none",
+                          "aruco dictionary": scene.dictionary,
+                          "camera projection": scene.camera_projection,
+                          "camera distortion": scene.camera_distortion,
+                          "marker size": scene.marker_size})
+
+    results = []
+    with ArUcoTracker(configuration) as tracker:
+        start = perf_counter()
+        for image, _ in frames:
+            results.append(tracker.get_frame_array(image))
+        elapsed = perf_counter() - start
+
+    translations = []
+    rotations = []
+    detected = 0
+    false_detections = 0
+    for result, (_, ground_truth) in zip(results, frames):
+        slots, found = find_handles(scene.port_handles,
+                                    result['port_handle'])
+        errors = pose_errors(result['tracking'][found],
+                             ground_truth[slots[found]])
+        translations.append(errors[0])
+        rotations.append(errors[1])
+        detected += int(found.sum())
+        false_detections += int((~found).sum())
+    translations = concatenate(translations)
+    rotations = concatenate(rotations)
+
+    report = {"frames per second": frame_count / elapsed,
+              "detection rate": detected / (frame_count *
+                                            scene.port_handles.shape[0]),
+              "false detections": false_detections}
+    for name, errors in (("translation error mm", translations),
+                         ("rotation error deg", rotations)):
+        if errors.shape[0] == 0:
+            report[name] = None
+            continue
+        report[name] = {"mean": float(errors.mean()),
+                        "p95": float(percentile(errors, 95)),
+                        "max": float(errors.max())}
+    return report
+
+
+def pareto_front(results):
+    """
+    Finds the results that no other result beats on both speed and
+    accuracy.
+
+    :param results: a list of results from evaluate
+    :return: a list of booleans, True for results on the Pareto front
+        of frames per second against mean translation error
+    """
+    points = [(result["frames per second"],
+               result["translation error mm"]["mean"]
+               if result["translation error mm"] is not None
+               else float('inf')) for result in results]
+    front = []
+    for speed, error in points:
+        dominated = any(other_speed >= speed and other_error <= error and
+                        (other_speed > speed or other_error < error)
+                        for other_speed, other_error in points)
+        front.append(not dominated)
+    return front
+
+
+def run_accuracy_benchmarks(configurations=None, scenes=None,
+                            frame_count=50):
+    """
+    Evaluates each configuration on each scene.
+
+    :param configurations: a dictionary of named ArUcoTracker settings,
+        defaults to CONFIGURATIONS
+    :param scenes: a dictionary of named SyntheticScene settings,
+        defaults to SCENES
+    :param frame_count: the number of frames to track for each
+    :return: a list of results, see evaluate, with the scene and
+        configuration names, and whether each is on the Pareto front of
+        its scene
+    """
+    if configurations is None:
+        configurations = CONFIGURATIONS
+    if scenes is None:
+        scenes = SCENES
+
+    results = []
+    for scene_name, scene_configuration in scenes.items():
+        scene = SyntheticScene(scene_configuration)
+        scene_results = []
+        for name, configuration in configurations.items():
+            result = {"scene": scene_name, "configuration": name}
+            result.update(evaluate(configuration, scene, frame_count))
+            scene_results.append(result)
+        for result, on_front in zip(scene_results,
+                                    pareto_front(scene_results)):
+            result["pareto"] = on_front
+        results.extend(scene_results)
+    return results
+
+
+def main(args=None):
+    """
+    Entry point for the accuracy benchmark.
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark ArUcoTracker accuracy against speed on '
+                    'synthetic scenes')
+    parser.add_argument("-c", "--configurations", default=None,
+                        help="A JSON file of named tracker settings to "
+                             "compare, instead of the defaults")
+    parser.add_argument("-f", "--frames", type=int, default=50,
+                        help="The number of frames to track per scene")
+    parser.add_argument("-o", "--output", default=None,
+                        help="A file to write the results to, instead of "
+                             "the console")
+    parsed = parser.parse_args(args)
+
+    configurations = None
+    if parsed.configurations is not None:
+        with open(parsed.configurations, 'r', encoding='utf-8') as source:
+            configurations = json.load(source)
+
+    results = json.dumps(run_accuracy_benchmarks(
+        configurations, frame_count=parsed.frames), indent=2)
+    if parsed.output is None:
+        print(results)
+    else:
+        with open(parsed.output, 'w', encoding='utf-8') as output:
+            output.write(results + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#  -*- coding: utf-8 -*-
+
+"""Throughput and latency benchmark for the UDP pose stream, on
+localhost.
+"""
+import argparse
+import json
+from time import perf_counter
+from numpy import arange, tile, eye, ones, array, percentile
+
+from sksurgeryarucotracker.network import (PoseStreamServer, PoseStreamClient,
+                                           encode_frame)
+
+
+def run_stream_benchmark(tool_count=10, frame_count=1000):
+    """
+    Sends frames to a client on localhost one at a time, timing from
+    just before each frame is encoded until it has been received and
+    decoded.
+
+    :param tool_count: the number of tools in each frame
+    :param frame_count: the number of frames to send
+    :return: a dictionary of results, with the frames per second,
+        bytes per frame and latency percentiles in microseconds
+    """
+    client = PoseStreamClient(0, host="127.0.0.1", timeout=1.0)
+    server = PoseStreamServer([("127.0.0.1", client.port)])
+
+    port_handles = arange(tool_count)
+    tracking = tile(eye(4), (tool_count, 1, 1))
+    quality = ones(tool_count)
+
+    latencies = []
+    start = perf_counter()
+    for frame_number in range(frame_count):
+        sent = perf_counter()
+        server.send(port_handles, sent, frame_number, tracking, quality)
+        client.receive()
+        latencies.append(perf_counter() - sent)
+    elapsed = perf_counter() - start
+
+    server.close()
+    client.close()
+
+    latencies = array(latencies) * 1e6
+    return {"tool count": tool_count,
+            "frame count": frame_count,
+            "bytes per frame": len(encode_frame(port_handles, 0.0, 0,
+                                                tracking, quality)),
+            "frames per second": frame_count / elapsed,
+            "latency p50 us": float(percentile(latencies, 50)),
+            "latency p95 us": float(percentile(latencies, 95)),
+            "latency p99 us": float(percentile(latencies, 99))}
+
+
+def main(args=None):
+    """
+    Entry point for the pose stream benchmark.
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark the UDP pose stream on localhost')
+    parser.add_argument("-t", "--tools", type=int, default=10,
+                        help="The number of tools per frame")
+    parser.add_argument("-f", "--frames", type=int, default=1000,
+                        help="The number of frames to send")
+    parsed = parser.parse_args(args)
+    print(json.dumps(run_stream_benchmark(parsed.tools, parsed.frames),
+                     indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#  -*- coding: utf-8 -*-
+
+"""Comparison of ArUcoTracker throughput and memory allocation against a
+stored baseline, to catch performance regressions.
+
+The baseline is a JSON file holding the tolerances and, for each
+benchmark case, the frames per second, the peak bytes allocated while
+tracking a frame and the memory blocks a frame leaves allocated.
+Baselines depend on the machine, so record one on the machine that
+checks against it. Allocations are those traced by tracemalloc, which
+covers Python and NumPy but not memory OpenCV allocates internally.
+"""
+import argparse
+import json
+import os
+import sys
+from time import perf_counter
+from numpy import loadtxt, float32
+
+from sksurgeryarucotracker.arucotracker import ArUcoTracker
+from sksurgeryarucotracker.allocations import (AllocationTracer,
+                                               TRACING_SUPPORTED)
+from sksurgeryarucotracker.benchmarks.tracking import read_video
+from sksurgeryarucotracker.synthetic import SyntheticScene
+
+CASES = {
+    "output.avi": {"video": "output.avi",
+                   "aruco dictionary": "DICT_4X4_50"},
+    "output.avi calibrated": {"video": "output.avi",
+                              "aruco dictionary": "DICT_4X4_50",
+                              "calibrated": True},
+    "12markers.avi": {"video": "12markers.avi",
+                      "aruco dictionary": "DICT_6X6_250"},
+    "synthetic 50 markers calibrated": {"scene": {"marker count": 50,
+                                                  "resolution": (1280, 720),
+                                                  "motion": 0.2},
+                                        "calibrated": True}}
+"""The benchmark cases, each a bundled video or a synthetic scene,
+tracked with or without calibration"""
+
+TOLERANCES = {"frames per second": 0.25,
+              "peak bytes per frame": 0.25,
+              "retained blocks per frame": 0.25}
+"""The default relative change allowed in each measure"""
+
+_SLACK = {"peak bytes per frame": 16384.0,
+          "retained blocks per frame": 1.0}
+"""Absolute changes in allocation measures that are always allowed, as
+small values are noisy"""
+
+DEFAULT_BASELINE = os.path.join("tests", "benchmark_baseline.json")
+
+
+def _load_case(case, data_directory, frame_count):
+    """
+    Returns the images and tracker configuration of a benchmark case
+    """
+    configuration = {"video source": "none"}
+    if "scene" in case:
+        scene = SyntheticScene(case["scene"])
+        images = list(scene.images(min(frame_count, 100)))
+        configuration["aruco dictionary"] = scene.dictionary
+        if case.get("calibrated", False):
+            configuration["camera projection"] = scene.camera_projection
+            configuration["camera distortion"] = scene.camera_distortion
+            configuration["marker size"] = scene.marker_size
+        return images, configuration
+
+    images = read_video(os.path.join(data_directory, case["video"]))
+    configuration["aruco dictionary"] = case["aruco dictionary"]
+    if case.get("calibrated", False):
+        calibration = os.path.join(data_directory, "calibration.txt")
+        configuration["camera projection"] = loadtxt(
+            calibration, dtype=float32, max_rows=3)
+        configuration["camera distortion"] = loadtxt(
+            calibration, dtype=float32, skiprows=3, max_rows=1)
+    return images, configuration
+
+
+def measure_case(case, data_directory="data", frame_count=100, warm_up=10):
+    """
+    Measures the throughput and allocations of a benchmark case.
+
+    Throughput and allocations are measured in separate runs, as
+    tracing allocations slows tracking down.
+
+    :param case: a benchmark case, one of the values of CASES
+    :param data_directory: the directory holding the bundled videos
+    :param frame_count: the number of frames to measure over
+    :param warm_up: the number of frames to track before measuring
+    :return: a dictionary with the "frames per second", the mean "peak
+        bytes per frame" allocated while tracking a frame, and the mean
+        "retained blocks per frame" left allocated after each frame.
+        Allocations are only measured where allocation tracing is
+        supported, see sksurgeryarucotracker.allocations.
+    """
+    images, configuration = _load_case(case, data_directory, frame_count)
+
+    with ArUcoTracker(configuration) as tracker:
+        for index in range(warm_up):
+            tracker.get_frame(images[index % len(images)])
+        start = perf_counter()
+        for index in range(frame_count):
+            tracker.get_frame(images[index % len(images)])
+        elapsed = perf_counter() - start
+
+        if not TRACING_SUPPORTED:
+            return {"frames per second": frame_count / elapsed}
+        tracer = AllocationTracer(interval=None)
+        for index in range(frame_count):
+            tracer.run(tracker.get_frame, images[index % len(images)])
+        tracer.stop()
+
+    report = tracer.report()
+    return {"frames per second": frame_count / elapsed,
+            "peak bytes per frame": report["peak bytes per call"],
+            "retained blocks per frame": report["retained blocks per call"]}
+
+
+def compare(name, baseline, measured, tolerances=None):
+    """
+    Compares measurements with a baseline.
+
+    :param name: the name of the benchmark case, for the messages
+    :param baseline: the baseline measurements of the case
+    :param measured: the new measurements, from measure_case
+    :param tolerances: the relative change allowed in each measure,
+        defaults to TOLERANCES
+    :return: a list of messages describing each regression, empty if
+        there are none
+    """
+    if tolerances is None:
+        tolerances = TOLERANCES
+    failures = []
+    expected = baseline["frames per second"]
+    allowed = expected * (1.0 - tolerances["frames per second"])
+    if measured["frames per second"] < allowed:
+        failures.append("{}: {:.1f} frames per second is below the baseline "
+                        "{:.1f}".format(name, measured["frames per second"],
+                                        expected))
+    for measure, slack in _SLACK.items():
+        if measure not in measured:
+            continue
+        expected = baseline[measure]
+        allowed = expected * (1.0 + tolerances[measure]) + slack
+        if measured[measure] > allowed:
+            failures.append("{}: {:.1f} {} is above the baseline {:.1f}"
+                            .format(name, measured[measure], measure,
+                                    expected))
+    return failures
+
+
+def load_baseline(path=DEFAULT_BASELINE):
+    """
+    Reads a baseline file.
+
+    :param path: the baseline file
+    :return: a dictionary with the "tolerances" and the measurements
+        of each of the "cases". Missing files give an empty baseline.
+    """
+    if not os.path.exists(path):
+        return {"tolerances": dict(TOLERANCES), "cases": {}}
+    with open(path, 'r', encoding='utf-8') as source:
+        baseline = json.load(source)
+    tolerances = dict(TOLERANCES)
+    tolerances.update(baseline.get("tolerances", {}))
+    baseline["tolerances"] = tolerances
+    baseline.setdefault("cases", {})
+    return baseline
+
+
+def save_baseline(baseline, path=DEFAULT_BASELINE):
+    """
+    Writes a baseline file.
+
+    :param baseline: a dictionary as returned by load_baseline
+    :param path: the baseline file
+    """
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(baseline, output, indent=2, sort_keys=True)
+        output.write("\n")
+
+
+def main(args=None):
+    """
+    Entry point to check against, or update, the baseline.
+
+    :return: 1 if any case regressed, else 0
+    """
+    parser = argparse.ArgumentParser(
+        description='Check ArUcoTracker performance against a baseline')
+    parser.add_argument("-b", "--baseline", default=DEFAULT_BASELINE,
+                        help="The baseline file")
+    parser.add_argument("-d", "--data", default="data",
+                        help="The directory holding the bundled videos")
+    parser.add_argument("-f", "--frames", type=int, default=100,
+                        help="The number of frames to measure per case")
+    parser.add_argument("-u", "--update", action="store_true",
+                        help="Record new baselines instead of checking")
+    parsed = parser.parse_args(args)
+
+    baseline = load_baseline(parsed.baseline)
+    failures = []
+    for name, case in CASES.items():
+        measured = measure_case(case, parsed.data, parsed.frames)
+        if parsed.update:
+            baseline["cases"][name] = measured
+        elif name in baseline["cases"]:
+            failures.extend(compare(name, baseline["cases"][name], measured,
+                                    baseline["tolerances"]))
+        else:
+            print("{}: no baseline, run with --update".format(name))
+
+    if parsed.update:
+        save_baseline(baseline, parsed.baseline)
+        print("Updated {}".format(parsed.baseline))
+    for failure in failures:
+        print(failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
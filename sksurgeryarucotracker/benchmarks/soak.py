@@ -0,0 +1,190 @@
+#  -*- coding: utf-8 -*-
+
+"""Soak test of ArUcoTracker, tracking a looped video for a long time
+and checking that the memory used does not grow.
+
+The resident memory of the process is sampled at intervals, and the
+growth rate is fitted to the samples after the first quarter of the
+run, which allows for caches and allocators warming up. Allocation
+tracing, which slows tracking, can be turned on to report where
+Python memory grows.
+"""
+import argparse
+import json
+import os
+import sys
+from time import perf_counter
+import cv2
+from numpy import polyfit
+
+from sksurgeryarucotracker.arucotracker import ArUcoTracker
+
+_STATM = "/proc/self/statm"
+
+
+def resident_bytes():
+    """
+    Returns the resident memory of this process, in bytes, from /proc
+    or, if it is installed, psutil. Otherwise, on Unix, the peak
+    resident memory is returned, and elsewhere None.
+    """
+    # pylint: disable=import-outside-toplevel
+    if os.path.exists(_STATM):
+        with open(_STATM, 'r', encoding='utf-8') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak
+    return peak * 1024
+
+
+def _read_looped(capture):
+    """
+    Reads the next image, going back to the start at the end of the video
+
+    :raise Exception: OSError
+    """
+    success, image = capture.read()
+    if not success:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        success, image = capture.read()
+        if not success:
+            raise OSError('Failed to read an image from the video')
+    return image
+
+
+def growth_per_hour(samples):
+    """
+    Fits the growth of resident memory to samples, ignoring the first
+    quarter of the run.
+
+    :param samples: a list of dictionaries with the "seconds" since the
+        start and the "resident bytes" at that time
+    :return: the fitted growth, in bytes per hour, 0.0 if there are
+        too few samples to fit, or None if resident memory could not be
+        measured
+    """
+    samples = [sample for sample in samples
+               if sample["resident bytes"] is not None]
+    if not samples:
+        return None
+    settled = samples[0]["seconds"] + (
+        samples[-1]["seconds"] - samples[0]["seconds"]) / 4.0
+    samples = [sample for sample in samples if sample["seconds"] >= settled]
+    if len(samples) < 2:
+        return 0.0
+    slope, _ = polyfit([sample["seconds"] for sample in samples],
+                       [sample["resident bytes"] for sample in samples], 1)
+    return float(slope) * 3600.0
+
+
+def run_soak(video, dictionary, duration, interval=60.0,
+             allocation_tracing=False):
+    """
+    Tracks a looped video for a time, sampling memory use.
+
+    :param video: the video file to loop
+    :param dictionary: the ArUco dictionary of the markers in the video
+    :param duration: the time to run for, in seconds
+    :param interval: the time between samples, in seconds
+    :param allocation_tracing: if true, trace Python allocations too
+    :return: a dictionary with the "frames" tracked, the "seconds"
+        taken, the memory "samples", each with the "seconds", "frames"
+        and "resident bytes", the fitted "resident growth per hour" in
+        bytes, or None if it could not be measured, and, if tracing,
+        the tracker's "allocation report"
+    :raise Exception: OSError
+    """
+    capture = cv2.VideoCapture(video)
+    if not capture.isOpened():
+        raise OSError('Failed to open video', video)
+    configuration = {"video source": "none",
+                     "aruco dictionary": dictionary}
+    if allocation_tracing:
+        configuration["allocation tracing"] = {}
+
+    samples = []
+    frames = 0
+    with ArUcoTracker(configuration) as tracker:
+        start = perf_counter()
+        elapsed = 0.0
+        next_sample = 0.0
+        while elapsed < duration:
+            tracker.get_frame(_read_looped(capture))
+            frames += 1
+            elapsed = perf_counter() - start
+            if elapsed >= next_sample:
+                samples.append({"seconds": elapsed, "frames": frames,
+                                "resident bytes": resident_bytes()})
+                next_sample += interval
+        samples.append({"seconds": elapsed, "frames": frames,
+                        "resident bytes": resident_bytes()})
+        result = {"frames": frames, "seconds": elapsed, "samples": samples,
+                  "resident growth per hour": growth_per_hour(samples)}
+        if allocation_tracing:
+            result["allocation report"] = \
+                tracker.diagnostics.get_allocation_report()
+    capture.release()
+    return result
+
+
+def main(args=None):
+    """
+    Entry point for the soak test.
+
+    :return: 1 if memory grew faster than the limit, else 0
+    """
+    parser = argparse.ArgumentParser(
+        description='Track a looped video for a long time, checking that '
+                    'memory use does not grow')
+    parser.add_argument("-v", "--video",
+                        default=os.path.join("data", "output.avi"),
+                        help="The video to loop")
+    parser.add_argument("-a", "--dictionary", default="DICT_4X4_50",
+                        help="The ArUco dictionary of the markers")
+    parser.add_argument("-t", "--duration", type=float, default=3600.0,
+                        help="The time to run for, in seconds")
+    parser.add_argument("-i", "--interval", type=float, default=60.0,
+                        help="The time between memory samples, in seconds")
+    parser.add_argument("-l", "--limit", type=float, default=10.0,
+                        help="The allowed memory growth, in MB per hour")
+    parser.add_argument("-m", "--allocation-tracing", action="store_true",
+                        help="Trace Python allocations, which is slower")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Save the results as JSON to this file")
+    parsed = parser.parse_args(args)
+
+    result = run_soak(parsed.video, parsed.dictionary, parsed.duration,
+                      parsed.interval, parsed.allocation_tracing)
+    if parsed.output is not None:
+        with open(parsed.output, 'w', encoding='utf-8') as output:
+            json.dump(result, output, indent=2)
+
+    print("Tracked {} frames in {:.0f} s".format(result["frames"],
+                                                 result["seconds"]))
+    for site in result.get("allocation report", {}).get("growth sites", []):
+        print("{bytes:>12} bytes {blocks:>8} blocks {site}".format(**site))
+    if result["resident growth per hour"] is None:
+        print("Resident memory is not available on this platform, install "
+              "psutil to measure it")
+        return 0
+    growth = result["resident growth per hour"] / 1e6
+    print("Resident memory grew {:.2f} MB per hour".format(growth))
+    if growth > parsed.limit:
+        print("Memory growth is above the limit of {:.2f} MB per hour"
+              .format(parsed.limit))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
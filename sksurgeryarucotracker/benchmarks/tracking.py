@@ -0,0 +1,156 @@
+#  -*- coding: utf-8 -*-
+
+"""Throughput and per-stage latency benchmark of ArUcoTracker over the
+videos and calibration bundled in the data directory.
+"""
+import argparse
+import json
+import os
+import platform
+from time import perf_counter
+from numpy import percentile, __version__ as numpy_version
+from cv2 import VideoCapture, __version__ as opencv_version
+
+from sksurgeryarucotracker.arucotracker import ArUcoTracker
+from sksurgeryarucotracker.timing import STAGES
+
+VIDEOS = (("output.avi", "DICT_4X4_50"),
+          ("12markers.avi", "DICT_6X6_250"))
+"""The bundled videos, and the ArUco dictionary of their markers"""
+
+
+def read_video(path):
+    """
+    Reads every frame of a video into memory.
+
+    :param path: the video file
+    :return: a list of images
+    :raise Exception: OSError
+    """
+    capture = VideoCapture(path)
+    images = []
+    while True:
+        success, image = capture.read()
+        if not success:
+            break
+        images.append(image)
+    capture.release()
+    if not images:
+        raise OSError('Failed to read any frames from {}'.format(path))
+    return images
+
+
+def benchmark_configuration(configuration, images, frame_count=200,
+                            warm_up=10):
+    """
+    Tracks a looped sequence of images, timing each stage.
+
+    Images are decoded before timing starts, so the capture stage is
+    not included and results do not depend on the video codec.
+
+    :param configuration: the ArUcoTracker configuration, without
+        the video source
+    :param images: the images to loop over
+    :param frame_count: the number of frames to time
+    :param warm_up: the number of frames to track before timing
+    :return: a dictionary of results, with the frames per second,
+        markers per frame and, for each stage, the mean, p50, p95 and
+        p99 durations in microseconds
+    """
+    configuration = dict(configuration)
+    configuration["video source"] = "none"
+    configuration["stage timing"] = {"length": frame_count}
+
+    markers = 0
+    with ArUcoTracker(configuration) as tracker:
+        for index in range(warm_up):
+            tracker.get_frame_array(images[index % len(images)])
+        start = perf_counter()
+        for index in range(frame_count):
+            markers += tracker.get_frame_array(
+                images[index % len(images)]).shape[0]
+        elapsed = perf_counter() - start
+        _, durations = tracker.diagnostics.get_stage_timings()
+
+    durations = durations / 1e3
+    stages = {}
+    for column, stage in enumerate(STAGES + ("total",)):
+        if column < len(STAGES):
+            values = durations[:, column]
+        else:
+            values = durations.sum(axis=1)
+        stages[stage] = {"mean us": float(values.mean()),
+                         "p50 us": float(percentile(values, 50)),
+                         "p95 us": float(percentile(values, 95)),
+                         "p99 us": float(percentile(values, 99))}
+
+    return {"frame count": frame_count,
+            "frames per second": frame_count / elapsed,
+            "markers per frame": markers / frame_count,
+            "stages": stages}
+
+
+def run_benchmarks(data_directory="data", frame_count=200, warm_up=10):
+    """
+    Benchmarks each bundled video, with and without the bundled
+    calibration.
+
+    :param data_directory: the directory holding the videos and
+        calibration.txt
+    :param frame_count: the number of frames to time for each
+    :param warm_up: the number of frames to track before timing
+    :return: a dictionary with the versions and platform the benchmark
+        ran on, and a list of results, see benchmark_configuration
+    """
+    results = []
+    for video, dictionary in VIDEOS:
+        images = read_video(os.path.join(data_directory, video))
+        for calibrated in (False, True):
+            configuration = {"aruco dictionary": dictionary}
+            if calibrated:
+                configuration["calibration"] = os.path.join(
+                    data_directory, "calibration.txt")
+            result = {"video": video, "calibrated": calibrated,
+                      "image size": list(images[0].shape[1::-1])}
+            result.update(benchmark_configuration(configuration, images,
+                                                  frame_count, warm_up))
+            results.append(result)
+
+    return {"python": platform.python_version(),
+            "numpy": numpy_version,
+            "opencv": opencv_version,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "results": results}
+
+
+def main(args=None):
+    """
+    Entry point for the tracking benchmark.
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark ArUcoTracker over the bundled videos')
+    parser.add_argument("-d", "--data", default="data",
+                        help="The directory holding the videos and "
+                             "calibration")
+    parser.add_argument("-f", "--frames", type=int, default=200,
+                        help="The number of frames to time per "
+                             "configuration")
+    parser.add_argument("-w", "--warm-up", type=int, default=10,
+                        help="The number of frames to track before timing")
+    parser.add_argument("-o", "--output", default=None,
+                        help="A file to write the results to, instead of "
+                             "the console")
+    parsed = parser.parse_args(args)
+
+    results = json.dumps(run_benchmarks(parsed.data, parsed.frames,
+                                        parsed.warm_up), indent=2)
+    if parsed.output is None:
+        print(results)
+    else:
+        with open(parsed.output, 'w', encoding='utf-8') as output:
+            output.write(results + "\n")
+
+
+if __name__ == "__main__":
+    main()
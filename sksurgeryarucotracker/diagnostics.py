@@ -0,0 +1,266 @@
+#  -*- coding: utf-8 -*-
+
+"""The optional diagnostics of a tracker: stage timing, latency
+statistics, a metrics server, profiling and allocation tracing.
+"""
+from functools import partial
+from sksurgeryarucotracker import timing
+from sksurgeryarucotracker.latency import LatencyStatistics
+from sksurgeryarucotracker.metrics import MetricsExporter, format_metrics
+from sksurgeryarucotracker.profiling import FrameProfiler
+from sksurgeryarucotracker.allocations import AllocationTracer
+
+
+def _make_stage_timer(configuration):
+    """
+    Returns a stage timer, if stage timing is configured
+    """
+    stage_timing = configuration.get("stage timing", None)
+    if stage_timing is None:
+        if configuration.get("latency statistics", None) is None:
+            return None
+        stage_timing = {}
+    return timing.StageTimer(stage_timing.get("length", 1024))
+
+
+def _make_latency_statistics(configuration):
+    """
+    Returns latency statistics, if they are configured
+    """
+    statistics = configuration.get("latency statistics", None)
+    if statistics is None:
+        return None
+    return LatencyStatistics(statistics.get("window", 10.0),
+                             statistics.get("precision", 0.01),
+                             statistics.get("expected frame rate", None))
+
+
+def _make_metrics_exporter(configuration, collect):
+    """
+    Returns a metrics exporter, if one is configured
+    """
+    metrics = configuration.get("metrics", None)
+    if metrics is None:
+        return None
+    return MetricsExporter(collect, metrics.get("port", 9464),
+                           metrics.get("host", "127.0.0.1"))
+
+
+def _make_profiler(configuration):
+    """
+    Returns a profiler, if profiling from the first frame is configured
+    """
+    profile = configuration.get("profile", None)
+    if profile is None:
+        return None
+    return FrameProfiler(profile.get("frames", 100),
+                         profile.get("path", None))
+
+
+def _make_allocation_tracer(configuration):
+    """
+    Returns an allocation tracer, if one is configured
+    """
+    tracing = configuration.get("allocation tracing", None)
+    if tracing is None:
+        return None
+    return AllocationTracer(tracing.get("top", 10),
+                            tracing.get("interval", 100))
+
+
+class TrackerDiagnostics:
+    """
+    Times, profiles and measures the frames of a tracker, as
+    configured, and serves its metrics. The diagnostics of an
+    ArUcoTracker are its diagnostics attribute.
+    """
+    def __init__(self, configuration):
+        """
+        :param configuration: the tracker configuration, see
+            ArUcoTracker
+        :raise Exception: ValueError
+        """
+        self.stage_timer = _make_stage_timer(configuration)
+        self.latency_statistics = _make_latency_statistics(configuration)
+        self._profiler = _make_profiler(configuration)
+        self._allocation_tracer = None
+        self._metrics_exporter = None
+        self._get_counters = None
+
+    def open(self, configuration, get_counters):
+        """
+        Starts the configured allocation tracing and metrics server.
+        Close the diagnostics if this fails.
+
+        :param configuration: the tracker configuration, see
+            ArUcoTracker
+        :param get_counters: a function returning the tracker's
+            counters, for the metrics
+        :raise Exception: ImportError, ValueError, OSError
+        """
+        self._get_counters = get_counters
+        self._allocation_tracer = _make_allocation_tracer(configuration)
+        self._metrics_exporter = _make_metrics_exporter(
+            configuration, self._collect_metrics)
+
+    def run(self, track, frame):
+        """
+        Tracks a frame, profiling it if the profiler is armed, and
+        measuring its allocations if allocation tracing is configured.
+
+        :param track: the function that tracks a frame
+        :param frame: the image to pass to track
+        :return: the return value of track
+        """
+        profiler = self._profiler
+        tracer = self._allocation_tracer
+        if profiler is None and tracer is None:
+            return track(frame)
+
+        if tracer is not None:
+            track = partial(tracer.run, track)
+        if profiler is None:
+            return track(frame)
+        if profiler.remaining == 1:
+            self._profiler = None
+        return profiler.run(track, frame)
+
+    def record(self, frame_number, timestamp):
+        """
+        Ends the stage timing of a frame, and adds it to the latency
+        statistics, if configured.
+        """
+        durations = self.stage_timer.stop(frame_number)
+        if self.latency_statistics is not None:
+            self.latency_statistics.record(durations, timestamp)
+
+    def reset(self):
+        """
+        Forgets the stage timings and latency statistics.
+        """
+        if self.stage_timer is not None:
+            self.stage_timer.reset()
+        if self.latency_statistics is not None:
+            self.latency_statistics.reset()
+
+    def close(self):
+        """
+        Writes the profile of the frames profiled so far, and stops
+        allocation tracing and the metrics server.
+        """
+        if self._profiler is not None:
+            self._profiler.save()
+            self._profiler = None
+        if self._allocation_tracer is not None:
+            self._allocation_tracer.stop()
+            self._allocation_tracer = None
+        if self._metrics_exporter is not None:
+            self._metrics_exporter.close()
+            self._metrics_exporter = None
+
+    def get_stage_timings(self):
+        """Gets the time taken by each stage of recent frames, to find
+        where slow frames spend their time.
+
+        :return: an array of frame numbers, oldest first, and a
+            matching N x 5 array of the durations, in nanoseconds, of
+            the stages in sksurgeryarucotracker.timing.STAGES: capture,
+            detection, pose estimation, publication and display.
+
+        :raise Exception: ValueError
+        """
+        if self.stage_timer is None:
+            raise ValueError('Attempted to get stage timings, when stage '
+                             'timing is not configured')
+        return self.stage_timer.get_timings()
+
+    def get_frame_timing(self):
+        """Gets the time taken by each stage of the latest frame.
+
+        :return: a dictionary of the duration of each stage, and of
+            "total", in nanoseconds, empty before the first frame.
+
+        :raise Exception: ValueError
+        """
+        if self.stage_timer is None:
+            raise ValueError('Attempted to get frame timing, when stage '
+                             'timing is not configured')
+        return self.stage_timer.latest()
+
+    def get_latency_statistics(self):
+        """Gets rolling statistics of the time taken by each stage of
+        tracking, and of the frame rate.
+
+        :return: a dictionary with, for each stage in
+            sksurgeryarucotracker.timing.STAGES and for "total", a
+            dictionary of the "p50", "p95" and "p99" durations in
+            nanoseconds, and "frames", "frame rate" (Hz) and "dropped
+            frames", over the last one to two windows.
+
+        :raise Exception: ValueError
+        """
+        if self.latency_statistics is None:
+            raise ValueError('Attempted to get latency statistics, when '
+                             'they are not configured')
+        return self.latency_statistics.report()
+
+    def reset_latency_statistics(self):
+        """Forgets the frames counted in the latency statistics.
+
+        :raise Exception: ValueError
+        """
+        if self.latency_statistics is None:
+            raise ValueError('Attempted to reset latency statistics, when '
+                             'they are not configured')
+        self.latency_statistics.reset()
+
+    def get_metrics_port(self):
+        """
+        Returns the port metrics are served on.
+
+        :raise Exception: ValueError
+        """
+        if self._metrics_exporter is None:
+            raise ValueError('Attempted to get the metrics port, when '
+                             'metrics are not configured')
+        return self._metrics_exporter.port
+
+    def get_allocation_report(self):
+        """Gets the memory allocated by get_frame calls, and where.
+
+        :return: a dictionary with the number of "calls", the mean
+            "peak bytes per call", "retained bytes per call" and
+            "retained blocks per call", "latest", the "peak bytes",
+            "net bytes" and "net blocks" of the latest call, and the top
+            "growth sites" and "largest sites", see
+            AllocationTracer.report.
+
+        :raise Exception: ValueError
+        """
+        if self._allocation_tracer is None:
+            raise ValueError('Attempted to get an allocation report, when '
+                             'allocation tracing is not configured')
+        report = self._allocation_tracer.report()
+        report["latest"] = dict(self._allocation_tracer.latest)
+        return report
+
+    def profile_frames(self, frame_count, path):
+        """Profiles the next calls to get_frame, get_frame_array or
+        get_frame_slots with cProfile, while the tracker keeps running,
+        and writes the profile to a file after the last one. The file
+        can be read with python -m pstats. Arming the profiler again
+        replaces one that has not finished, which is discarded. If the
+        tracker is closed first, the calls profiled so far are written.
+
+        :param frame_count: the number of calls to profile
+        :param path: the file to write the profile to
+
+        :raise Exception: ValueError
+        """
+        self._profiler = FrameProfiler(frame_count, path)
+
+    def _collect_metrics(self):
+        """
+        Formats the metrics, called on the exporter's threads
+        """
+        return format_metrics(self._get_counters(), self.latency_statistics)
@@ -0,0 +1,170 @@
+#  -*- coding: utf-8 -*-
+
+"""Rolling statistics of the latency of each stage of tracking, and of
+the frame rate.
+"""
+from threading import Lock
+
+from sksurgeryarucotracker.algorithms.histogram import LogHistogram
+from sksurgeryarucotracker.timing import STAGES
+
+PERCENTILES = (50.0, 95.0, 99.0)
+
+
+class _Window:
+    """
+    The histogram and frame counts of one period of time
+    """
+    def __init__(self, precision):
+        self.histogram = LogHistogram(len(STAGES) + 1, precision=precision)
+        self.start = None
+        self.frames = 0
+        self.dropped = 0
+
+    def reset(self, start=None):
+        """
+        Clears the window, to start again at a time
+        """
+        self.histogram.reset()
+        self.start = start
+        self.frames = 0
+        self.dropped = 0
+
+
+class LatencyStatistics:
+    """
+    Collects the stage durations of each frame into constant memory
+    histograms, covering between one and two windows of recent time,
+    and reports percentiles, the frame rate and the number of dropped
+    frames.
+    """
+    def __init__(self, window=10.0, precision=0.01, expected_frame_rate=None):
+        """
+        :param window: the length of a window, in seconds. Statistics
+            cover the current window and the one before it.
+        :param precision: the relative precision of the percentiles
+        :param expected_frame_rate: the rate, in Hz, frames are
+            captured at. If set, gaps between frames longer than the
+            frame period are counted as dropped frames.
+        :raise Exception: ValueError
+        """
+        if window <= 0.0:
+            raise ValueError('Statistics window must be positive', window)
+        if expected_frame_rate is not None and expected_frame_rate <= 0.0:
+            raise ValueError('Expected frame rate must be positive',
+                             expected_frame_rate)
+        self._window = window
+        self._period = None
+        if expected_frame_rate is not None:
+            self._period = 1.0 / expected_frame_rate
+        self._current = _Window(precision)
+        self._previous = _Window(precision)
+        self._lifetime = _Window(precision)
+        self._combined = LogHistogram(len(STAGES) + 1, precision=precision)
+        self._latest = None
+        # frames are recorded without the lock, it only guards moving
+        # counts between windows against readers on other threads
+        self._lock = Lock()
+
+    def record(self, durations, timestamp):
+        """
+        Adds the stage durations of a frame.
+
+        :param durations: an array of the duration of each stage in
+            sksurgeryarucotracker.timing.STAGES, in nanoseconds
+        :param timestamp: the time of the frame, in seconds
+        """
+        if self._current.start is None:
+            self._current.start = timestamp
+        elif timestamp - self._current.start >= 2.0 * self._window:
+            with self._lock:
+                self._retire(self._previous)
+                self._retire(self._current, timestamp)
+        elif timestamp - self._current.start >= self._window:
+            with self._lock:
+                self._retire(self._previous)
+                self._current, self._previous = self._previous, self._current
+                self._current.start = timestamp
+
+        values = durations.tolist()
+        values.append(sum(values))
+        self._current.histogram.record(values)
+        self._current.frames += 1
+        if self._period is not None and self._latest is not None:
+            missed = int((timestamp - self._latest) / self._period + 0.5) - 1
+            self._current.dropped += max(missed, 0)
+        self._latest = timestamp
+
+    def _retire(self, window, start=None):
+        """
+        Adds the counts of a window to the lifetime totals, and clears
+        it
+        """
+        self._lifetime.histogram.add(window.histogram)
+        self._lifetime.frames += window.frames
+        self._lifetime.dropped += window.dropped
+        window.reset(start)
+
+    def reset(self):
+        """
+        Forgets all frames.
+        """
+        with self._lock:
+            self._current.reset()
+            self._previous.reset()
+            self._lifetime.reset()
+            self._latest = None
+
+    def cumulative(self):
+        """
+        Returns the counts of all frames since the statistics were
+        created or reset, for example for monitoring systems that
+        expect counters that only increase.
+
+        :return: a dictionary with "edges", the upper edge of each
+            histogram bucket in nanoseconds, "counts", a histogram with
+            a row for each stage in STAGES and for "total", "sums", the
+            total duration of each row in nanoseconds, and "frames" and
+            "dropped frames"
+        """
+        with self._lock:
+            windows = (self._lifetime, self._previous, self._current)
+            return {
+                "edges": self._lifetime.histogram.upper_edges(),
+                "counts": sum(window.histogram.counts for window in windows),
+                "sums": sum(window.histogram.sums for window in windows),
+                "frames": sum(window.frames for window in windows),
+                "dropped frames": sum(window.dropped for window in windows)}
+
+    def report(self):
+        """
+        Returns the statistics of the current and previous windows.
+
+        :return: a dictionary with, for each stage in STAGES and for
+            "total", a dictionary of the "p50", "p95" and "p99"
+            durations in nanoseconds (NaN if there are no frames), and
+            "frames", "frame rate" (Hz) and "dropped frames"
+        """
+        with self._lock:
+            self._combined.reset()
+            self._combined.add(self._current.histogram)
+            self._combined.add(self._previous.histogram)
+            percentiles = self._combined.percentiles(PERCENTILES)
+
+        report = {}
+        for name, row in zip(STAGES + ("total",), percentiles):
+            report[name] = {"p{:.0f}".format(quantile): float(value)
+                            for quantile, value in zip(PERCENTILES, row)}
+
+        frames = self._current.frames + self._previous.frames
+        start = self._current.start
+        if self._previous.start is not None:
+            start = self._previous.start
+        frame_rate = 0.0
+        if frames > 1 and self._latest > start:
+            frame_rate = (frames - 1) / (self._latest - start)
+        report["frames"] = frames
+        report["frame rate"] = frame_rate
+        report["dropped frames"] = (self._current.dropped +
+                                    self._previous.dropped)
+        return report
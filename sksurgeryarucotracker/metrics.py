@@ -0,0 +1,147 @@
+#  -*- coding: utf-8 -*-
+
+"""Export of tracker health metrics over HTTP, in the Prometheus text
+format, using only the standard library.
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread
+from numpy import cumsum, searchsorted
+
+from sksurgeryarucotracker.timing import STAGES
+
+PREFIX = "sksurgeryarucotracker_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5,
+           1.0)
+"""The upper edges, in seconds, of the exported latency histogram
+buckets"""
+
+_COUNTERS = (("frames", "frames_total", "counter",
+              "Frames tracked."),
+             ("markers visible", "markers_visible", "gauge",
+              "Markers seen in the latest frame."),
+             ("capture failures", "capture_failures_total", "counter",
+              "Frames that could not be read from the video source."),
+             ("pose cache hits", "pose_cache_hits_total", "counter",
+              "Marker poses reused from the pose cache."),
+             ("pose cache misses", "pose_cache_misses_total", "counter",
+              "Marker poses solved."),
+             ("pose stream failures", "pose_stream_failures_total",
+              "counter", "Datagrams the pose stream failed to send."))
+
+
+def _metric(lines, name, metric_type, description):
+    """
+    Adds the help and type lines of a metric
+    """
+    lines.append("# HELP {}{} {}".format(PREFIX, name, description))
+    lines.append("# TYPE {}{} {}".format(PREFIX, name, metric_type))
+
+
+def _latency_lines(lines, statistics):
+    """
+    Adds the frame rate, dropped frames and stage latency histograms
+    """
+    report = statistics.report()
+    cumulative = statistics.cumulative()
+
+    _metric(lines, "frame_rate_hz", "gauge",
+            "Frames tracked per second, over the recent window.")
+    lines.append("{}frame_rate_hz {!r}".format(PREFIX, report["frame rate"]))
+    _metric(lines, "dropped_frames_total", "counter",
+            "Frames the video source produced that were not tracked.")
+    lines.append("{}dropped_frames_total {}".format(
+        PREFIX, cumulative["dropped frames"]))
+
+    name = PREFIX + "stage_duration_seconds"
+    _metric(lines, "stage_duration_seconds", "histogram",
+            "Time taken by each stage of tracking a frame.")
+    totals = cumsum(cumulative["counts"], axis=1)
+    slots = searchsorted(cumulative["edges"],
+                         [edge * 1e9 for edge in BUCKETS], side='right') - 1
+    for row, stage in enumerate(STAGES + ("total",)):
+        label = 'stage="{}"'.format(stage)
+        for edge, slot in zip(BUCKETS, slots):
+            lines.append('{}_bucket{{{},le="{!r}"}} {}'.format(
+                name, label, edge, totals[row, slot]))
+        lines.append('{}_bucket{{{},le="+Inf"}} {}'.format(
+            name, label, totals[row, -1]))
+        lines.append('{}_sum{{{}}} {!r}'.format(
+            name, label, cumulative["sums"][row] / 1e9))
+        lines.append('{}_count{{{}}} {}'.format(name, label, totals[row, -1]))
+
+
+def format_metrics(counters, statistics=None):
+    """
+    Formats tracker metrics in the Prometheus text format.
+
+    :param counters: a dictionary of counters, as returned by
+        ArUcoTracker.get_counters
+    :param statistics: a LatencyStatistics to export the frame rate,
+        dropped frames and stage latencies of, or None
+    :return: the metrics, as a string
+    """
+    lines = []
+    for key, name, metric_type, description in _COUNTERS:
+        if key in counters:
+            _metric(lines, name, metric_type, description)
+            lines.append("{}{} {}".format(PREFIX, name, counters[key]))
+    if statistics is not None:
+        _latency_lines(lines, statistics)
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Serves the metrics at /metrics
+    """
+    def do_GET(self): # pylint: disable=invalid-name
+        """
+        Responds to a scrape
+        """
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.collect().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        """
+        Keeps scrapes out of the console
+        """
+
+
+class MetricsExporter:
+    """
+    Serves metrics over HTTP from a background thread. Metrics are
+    collected when they are scraped, on the server's threads, so
+    scraping never waits for, or delays, tracking.
+    """
+    def __init__(self, collect, port=9464, host="127.0.0.1"):
+        """
+        :param collect: a function with no arguments that returns the
+            metrics as a string, for example from format_metrics
+        :param port: the port to serve on, 0 for any free port, see the
+            port attribute
+        :param host: the address to serve on
+        :raise Exception: OSError
+        """
+        self._server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self._server.daemon_threads = True
+        self._server.collect = collect
+        self.port = self._server.server_address[1]
+        self._thread = Thread(target=self._server.serve_forever,
+                              name="metrics exporter", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """
+        Stops serving, and closes the socket.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
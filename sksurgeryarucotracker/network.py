@@ -0,0 +1,175 @@
+#  -*- coding: utf-8 -*-
+
+"""Streaming of tracking frames over UDP, as compact binary datagrams.
+
+Each datagram holds one frame. It starts with a 32 byte header:
+magic (4 bytes, b"SKAT"), version (uint16, 1), reserved (uint16),
+frame number (int64), timestamp (float64) and tool count (uint32),
+then 4 bytes of padding. It is followed by one 56 byte record per
+tool: port handle (int32), tracking quality (float32) and the top
+three rows of the 4x4 tracking matrix (12 float32, row major). All
+values are little endian.
+"""
+import socket
+from numpy import dtype, frombuffer, empty, zeros, int64, float64
+
+MAGIC = b"SKAT"
+VERSION = 1
+HEADER_DTYPE = dtype([('magic', 'S4'),
+                      ('version', '<u2'),
+                      ('reserved', '<u2'),
+                      ('frame_number', '<i8'),
+                      ('time_stamp', '<f8'),
+                      ('count', '<u4'),
+                      ('padding', '<u4')])
+RECORD_DTYPE = dtype([('port_handle', '<i4'),
+                      ('tracking_quality', '<f4'),
+                      ('tracking', '<f4', (3, 4))])
+MAXIMUM_DATAGRAM = 65507
+MAXIMUM_TOOLS = ((MAXIMUM_DATAGRAM - HEADER_DTYPE.itemsize) //
+                 RECORD_DTYPE.itemsize)
+
+
+def encode_frame(port_handles, timestamp, frame_number, tracking,
+                 tracking_quality):
+    """
+    Packs a frame into a datagram.
+
+    :param port_handles: N port handles
+    :param timestamp: the time of the frame
+    :param frame_number: the number of the frame
+    :param tracking: N x 4 x 4 tracking matrices
+    :param tracking_quality: N tracking qualities
+    :return: the datagram, as bytes
+    :raise Exception: ValueError
+    """
+    count = len(port_handles)
+    if count > MAXIMUM_TOOLS:
+        raise ValueError('Too many tools to fit in one datagram', count)
+
+    header = zeros(1, dtype=HEADER_DTYPE)
+    header['magic'] = MAGIC
+    header['version'] = VERSION
+    header['frame_number'] = frame_number
+    header['time_stamp'] = timestamp
+    header['count'] = count
+
+    records = empty(count, dtype=RECORD_DTYPE)
+    records['port_handle'] = port_handles
+    records['tracking_quality'] = tracking_quality
+    if count > 0:
+        records['tracking'] = tracking[:, 0:3, :]
+    return header.tobytes() + records.tobytes()
+
+
+def decode_frame(datagram):
+    """
+    Unpacks a datagram made by encode_frame.
+
+    :param datagram: the datagram, as bytes
+    :return: an array of port handles, the timestamp, the frame
+        number, an N x 4 x 4 array of tracking matrices and an array of
+        tracking qualities
+    :raise Exception: ValueError
+    """
+    if len(datagram) < HEADER_DTYPE.itemsize:
+        raise ValueError('Datagram is too short for a frame header',
+                         len(datagram))
+    header = frombuffer(datagram, dtype=HEADER_DTYPE, count=1)[0]
+    if header['magic'] != MAGIC or header['version'] != VERSION:
+        raise ValueError('Datagram is not a version {} tracking frame'
+                         .format(VERSION))
+    count = int(header['count'])
+    if len(datagram) != HEADER_DTYPE.itemsize + count * RECORD_DTYPE.itemsize:
+        raise ValueError('Datagram length does not match its tool count',
+                         len(datagram), count)
+
+    records = frombuffer(datagram, dtype=RECORD_DTYPE, count=count,
+                         offset=HEADER_DTYPE.itemsize)
+    tracking = zeros((count, 4, 4), dtype=float64)
+    tracking[:, 0:3, :] = records['tracking']
+    tracking[:, 3, 3] = 1.0
+    return (records['port_handle'].astype(int64), float(header['time_stamp']),
+            int(header['frame_number']), tracking,
+            records['tracking_quality'].astype(float64))
+
+
+class PoseStreamServer:
+    """
+    Sends tracking frames as UDP datagrams to a list of destinations.
+    Host names are resolved once, when the server is created. Frames
+    that fail to send are counted in send_failures rather than raised,
+    so a network fault does not stop tracking.
+    """
+    def __init__(self, destinations):
+        """
+        :param destinations: a list of (host, port) addresses to send
+            each frame to
+        :raise Exception: ValueError, OSError
+        """
+        if not destinations:
+            raise ValueError('Pose stream needs at least one destination')
+        self._destinations = [
+            socket.getaddrinfo(host, int(port), socket.AF_INET,
+                               socket.SOCK_DGRAM)[0][4]
+            for host, port in destinations]
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.frames_sent = 0
+        self.send_failures = 0
+
+    def send(self, port_handles, timestamp, frame_number, tracking,
+             tracking_quality):
+        """
+        Sends a frame to every destination, see encode_frame for the
+        parameters.
+
+        :raise Exception: ValueError
+        """
+        datagram = encode_frame(port_handles, timestamp, frame_number,
+                                tracking, tracking_quality)
+        for destination in self._destinations:
+            try:
+                self._socket.sendto(datagram, destination)
+            except OSError:
+                self.send_failures += 1
+        self.frames_sent += 1
+
+    def close(self):
+        """
+        Closes the socket.
+        """
+        self._socket.close()
+
+
+class PoseStreamClient:
+    """
+    Receives tracking frames sent by a PoseStreamServer.
+    """
+    def __init__(self, port, host="0.0.0.0", timeout=None):
+        """
+        :param port: the UDP port to listen on, 0 for any free port,
+            see the port attribute
+        :param host: the address to listen on
+        :param timeout: the longest time, in seconds, that receive
+            waits, or None to wait forever
+        :raise Exception: OSError
+        """
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((host, port))
+        self._socket.settimeout(timeout)
+        self.port = self._socket.getsockname()[1]
+
+    def receive(self):
+        """
+        Waits for and returns the next frame, see decode_frame.
+
+        :raise Exception: socket.timeout, ValueError
+        """
+        datagram = self._socket.recv(MAXIMUM_DATAGRAM)
+        return decode_frame(datagram)
+
+    def close(self):
+        """
+        Closes the socket.
+        """
+        self._socket.close()
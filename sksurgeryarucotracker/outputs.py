@@ -0,0 +1,109 @@
+#  -*- coding: utf-8 -*-
+
+"""Fan out of each tracking frame to the outputs of a tracker:
+subscribers, shared memory, a UDP pose stream and a recording.
+"""
+from sksurgeryarucotracker.publish import FramePublisher
+from sksurgeryarucotracker.network import PoseStreamServer
+from sksurgeryarucotracker.recording import TrackingRecorder
+
+
+def _make_shared_memory(configuration):
+    """
+    Returns a shared memory publisher, if one is configured
+    """
+    shared = configuration.get("shared memory", None)
+    if shared is None:
+        return None
+    # shared_memory needs Python 3.8, so only import it when asked to
+    # pylint: disable=import-outside-toplevel
+    from sksurgeryarucotracker.sharedmemory import SharedMemoryPublisher
+    return SharedMemoryPublisher(shared.get("name", None),
+                                 shared.get("capacity", 64))
+
+
+def _make_pose_stream(configuration):
+    """
+    Returns a UDP pose stream server, if one is configured
+    """
+    stream = configuration.get("pose stream", None)
+    if stream is None:
+        return None
+    return PoseStreamServer(stream.get("destinations", None))
+
+
+def _make_recorder(configuration):
+    """
+    Returns a tracking log recorder, if one is configured
+    """
+    recording = configuration.get("recording", None)
+    if recording is None:
+        return None
+    return TrackingRecorder(recording.get("path", None),
+                            recording.get("capacity", 65536))
+
+
+class FrameOutputs:
+    """
+    Passes each frame a tracker produces to its subscribers, and to
+    the shared memory, pose stream and recording, if configured.
+    """
+    def __init__(self, format_frame):
+        """
+        :param format_frame: a function converting a frame of arrays to
+            the frame given to subscribers
+        """
+        self.publisher = FramePublisher()
+        self.shared_memory = None
+        self.pose_stream = None
+        self.recorder = None
+        self._format_frame = format_frame
+
+    def open(self, configuration):
+        """
+        Creates the configured outputs. The recorder is created last, so
+        an existing recording is not overwritten if another output
+        fails. Close the outputs if this fails.
+
+        :param configuration: the tracker configuration, see
+            ArUcoTracker
+        :raise Exception: ImportError, ValueError, OSError
+        """
+        self.shared_memory = _make_shared_memory(configuration)
+        self.pose_stream = _make_pose_stream(configuration)
+        self.recorder = _make_recorder(configuration)
+
+    def publish(self, port_handles, timestamp, frame_number, tracking,
+                tracking_quality):
+        """
+        Passes a frame to each of the outputs.
+        """
+        if self.shared_memory is not None:
+            self.shared_memory.publish(port_handles, timestamp,
+                                       frame_number, tracking,
+                                       tracking_quality)
+        if self.recorder is not None:
+            self.recorder.append(port_handles, timestamp, frame_number,
+                                 tracking, tracking_quality)
+        if self.pose_stream is not None:
+            self.pose_stream.send(port_handles, timestamp, frame_number,
+                                  tracking, tracking_quality)
+        if self.publisher.has_subscribers():
+            self.publisher.publish(self._format_frame(
+                port_handles, timestamp, frame_number, tracking,
+                tracking_quality))
+
+    def close(self):
+        """
+        Closes the subscriptions and the outputs.
+        """
+        self.publisher.close()
+        if self.shared_memory is not None:
+            self.shared_memory.close()
+            self.shared_memory = None
+        if self.pose_stream is not None:
+            self.pose_stream.close()
+            self.pose_stream = None
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
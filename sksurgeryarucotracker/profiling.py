@@ -0,0 +1,56 @@
+#  -*- coding: utf-8 -*-
+
+"""Profiling of a number of tracking calls, in a running tracker.
+"""
+import cProfile
+
+
+class FrameProfiler:
+    """
+    Profiles a number of calls with cProfile, accumulating them into a
+    single profile, and writes it to a file after the last one. The
+    file can be read with pstats, for example
+    python -m pstats profile.prof, or tools such as snakeviz.
+    """
+    def __init__(self, frame_count, path):
+        """
+        :param frame_count: the number of calls to profile
+        :param path: the file to write the profile to
+        :raise Exception: ValueError
+        """
+        if frame_count < 1:
+            raise ValueError('Profile frame count must be at least 1',
+                             frame_count)
+        if not path:
+            raise ValueError('Profiling needs a path to write to')
+        self.path = path
+        self.remaining = frame_count
+        self._profile = cProfile.Profile()
+
+    def run(self, function, *args):
+        """
+        Calls a function with the profiler enabled, writing the profile
+        if this is the last call.
+
+        :param function: the function to profile
+        :param args: the arguments of the function
+        :return: the return value of the function
+        :raise Exception: ValueError, if all calls have been profiled,
+            or any exception of the function
+        """
+        if self.remaining < 1:
+            raise ValueError('All calls have already been profiled')
+        self._profile.enable()
+        try:
+            return function(*args)
+        finally:
+            self._profile.disable()
+            self.remaining -= 1
+            if self.remaining == 0:
+                self.save()
+
+    def save(self):
+        """
+        Writes the calls profiled so far to the file.
+        """
+        self._profile.dump_stats(self.path)
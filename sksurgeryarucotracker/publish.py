@@ -0,0 +1,189 @@
+#  -*- coding: utf-8 -*-
+
+"""Fan out of tracking frames to many consumers, without letting a
+slow consumer slow down the tracker.
+"""
+from collections import deque
+from queue import Empty
+from threading import Condition, Thread, Lock
+
+
+class Subscription:
+    """
+    A bounded queue of frames for one consumer. Putting a frame never
+    blocks, when the queue is full a frame is dropped according to the
+    drop policy. If a callback is given it is called with each frame
+    on the subscription's own thread, otherwise frames are taken with
+    get.
+    """
+    def __init__(self, maximum_size=1, drop_policy="oldest",
+                 callback=None):
+        """
+        :param maximum_size: the largest number of frames to hold
+        :param drop_policy: "oldest" to drop the oldest frame held when
+            the queue is full, or "newest" to drop the incoming frame
+        :param callback: if set, a function called with each frame on
+            a separate thread
+        :raise Exception: ValueError
+        """
+        if maximum_size < 1:
+            raise ValueError('Subscription size must be at least 1',
+                             maximum_size)
+        if drop_policy not in ("oldest", "newest"):
+            raise ValueError('Drop policy must be "oldest" or "newest"',
+                             drop_policy)
+        self._frames = deque()
+        self._maximum_size = maximum_size
+        self._drop_oldest = drop_policy == "oldest"
+        self._condition = Condition()
+        self._closed = False
+
+        self.delivered = 0
+        self.dropped = 0
+        self.callback_errors = 0
+
+        self._thread = None
+        if callback is not None:
+            self._thread = Thread(target=self._deliver, args=(callback,),
+                                  daemon=True)
+            self._thread.start()
+
+    def put(self, frame):
+        """
+        Adds a frame to the queue, without blocking.
+
+        :param frame: the frame to add
+        """
+        with self._condition:
+            if self._closed:
+                return
+            if len(self._frames) >= self._maximum_size:
+                self.dropped += 1
+                if not self._drop_oldest:
+                    return
+                self._frames.popleft()
+            self._frames.append(frame)
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """
+        Takes the oldest frame from the queue, waiting for one if needed.
+
+        :param timeout: the longest time to wait, in seconds, or None
+            to wait until a frame arrives or the subscription is closed
+        :return: the frame
+        :raise Exception: queue.Empty, if no frame arrived in time or
+            the subscription was closed
+        """
+        with self._condition:
+            if not self._condition.wait_for(
+                    lambda: self._frames or self._closed, timeout):
+                raise Empty
+            if not self._frames:
+                raise Empty
+            self.delivered += 1
+            return self._frames.popleft()
+
+    def get_nowait(self):
+        """
+        Takes the oldest frame from the queue, without waiting.
+
+        :return: the frame
+        :raise Exception: queue.Empty
+        """
+        return self.get(timeout=0.0)
+
+    def qsize(self):
+        """
+        Returns the number of frames waiting in the queue.
+        """
+        with self._condition:
+            return len(self._frames)
+
+    def close(self):
+        """
+        Stops accepting frames, and stops the callback thread, if any,
+        once it has delivered the frames already queued.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _deliver(self, callback):
+        """
+        Calls the callback with each frame, until closed.
+        """
+        while True:
+            try:
+                frame = self.get()
+            except Empty:
+                return
+            try:
+                callback(frame)
+            except Exception: # pylint: disable=broad-except
+                self.callback_errors += 1
+
+
+class FramePublisher:
+    """
+    Keeps a registry of subscriptions, and gives each of them every
+    published frame.
+    """
+    def __init__(self):
+        self._subscriptions = []
+        self._lock = Lock()
+
+    def subscribe(self, maximum_size=1, drop_policy="oldest",
+                  callback=None):
+        """
+        Adds a subscription, see Subscription for the parameters.
+
+        :return: the new Subscription
+        :raise Exception: ValueError
+        """
+        subscription = Subscription(maximum_size, drop_policy, callback)
+        with self._lock:
+            self._subscriptions = self._subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Removes and closes a subscription.
+
+        :raise Exception: ValueError, if the subscription is not
+            registered
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+            subscriptions.remove(subscription)
+            self._subscriptions = subscriptions
+        subscription.close()
+
+    def has_subscribers(self):
+        """
+        Returns True if there are any subscriptions.
+        """
+        return bool(self._subscriptions)
+
+    def publish(self, frame):
+        """
+        Gives a frame to every subscription, without blocking.
+
+        :param frame: the frame, which is shared between subscribers
+            and should not be modified by them
+        """
+        for subscription in self._subscriptions:
+            subscription.put(frame)
+
+    def close(self):
+        """
+        Removes and closes all subscriptions.
+        """
+        with self._lock:
+            subscriptions = self._subscriptions
+            self._subscriptions = []
+        for subscription in subscriptions:
+            subscription.close()
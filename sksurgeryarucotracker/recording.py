@@ -0,0 +1,205 @@
+#  -*- coding: utf-8 -*-
+
+"""Recording of tracking frames to an append only binary log, and
+reading logs back through a memory map.
+
+A log starts with a 64 byte header: magic (8 bytes, b"SKATLOG1"),
+record size (uint64) and record count (uint64), padded with zeros. It
+is followed by one 160 byte record per tool per frame: port handle
+(int64), frame number (int64), timestamp (float64), tracking quality
+(float64) and the 4x4 tracking matrix (16 float64, row major). All
+values are little endian.
+
+The recorder preallocates space for records and writes into it through
+a memory map, so appending a frame is a copy into memory. The record
+count is written after the records, so a reader never sees a partly
+written record.
+"""
+import os
+from numpy import memmap, dtype, zeros
+
+MAGIC = b"SKATLOG1"
+HEADER_DTYPE = dtype([('magic', 'S8'),
+                      ('record_size', '<u8'),
+                      ('count', '<u8')])
+HEADER_SIZE = 64
+RECORD_DTYPE = dtype([('port_handle', '<i8'),
+                      ('frame_number', '<i8'),
+                      ('time_stamp', '<f8'),
+                      ('tracking_quality', '<f8'),
+                      ('tracking', '<f8', (4, 4))])
+
+
+class TrackingRecorder:
+    """
+    Appends tracking frames to a log file.
+    """
+    def __init__(self, path, capacity=65536):
+        """
+        :param path: the file to write, any existing file is replaced
+        :param capacity: the number of records to preallocate space
+            for. The file grows by the same number of records again
+            whenever it is full.
+        :raise Exception: ValueError, OSError
+        """
+        if not path:
+            raise ValueError('Recording needs a path to write to')
+        if capacity < 1:
+            raise ValueError('Recording capacity must be at least 1',
+                             capacity)
+        self.path = path
+        self.count = 0
+        self._growth = capacity
+        self._capacity = 0
+        self._header = None
+        self._records = None
+
+        with open(path, 'wb') as log:
+            header = zeros(1, dtype=HEADER_DTYPE)
+            header['magic'] = MAGIC
+            header['record_size'] = RECORD_DTYPE.itemsize
+            log.write(header.tobytes().ljust(HEADER_SIZE, b'\0'))
+        self._header = memmap(path, dtype=HEADER_DTYPE, mode='r+', shape=(1,))
+        self._grow()
+
+    def _grow(self):
+        """
+        Extends the file by the growth size and maps the records again
+        """
+        self._capacity += self._growth
+        if self._records is not None:
+            self._records.flush()
+        self._records = None
+        os.truncate(self.path,
+                    HEADER_SIZE + self._capacity * RECORD_DTYPE.itemsize)
+        self._records = memmap(self.path, dtype=RECORD_DTYPE, mode='r+',
+                               offset=HEADER_SIZE, shape=(self._capacity,))
+
+    def append(self, port_handles, timestamp, frame_number, tracking,
+               tracking_quality):
+        """
+        Appends a record for each tool in a frame.
+
+        :param port_handles: N port handles
+        :param timestamp: the time of the frame
+        :param frame_number: the number of the frame
+        :param tracking: N x 4 x 4 tracking matrices
+        :param tracking_quality: N tracking qualities
+        :raise Exception: ValueError, if the recorder is closed
+        """
+        if self._records is None:
+            raise ValueError('Attempted to append to a closed recording')
+        count = len(port_handles)
+        while self.count + count > self._capacity:
+            self._grow()
+
+        records = self._records[self.count:self.count + count]
+        records['port_handle'] = port_handles
+        records['frame_number'] = frame_number
+        records['time_stamp'] = timestamp
+        records['tracking_quality'] = tracking_quality
+        if count > 0:
+            records['tracking'] = tracking
+        self.count += count
+        self._header['count'] = self.count
+
+    def flush(self):
+        """
+        Writes the records appended so far to disk.
+        """
+        if self._records is not None:
+            self._records.flush()
+            self._header.flush()
+
+    def close(self):
+        """
+        Flushes the log and trims the unused preallocated space.
+        Closing more than once has no effect.
+        """
+        if self._records is None:
+            return
+        self.flush()
+        self._records = None
+        self._header = None
+        os.truncate(self.path,
+                    HEADER_SIZE + self.count * RECORD_DTYPE.itemsize)
+
+
+class TrackingLogReader:
+    """
+    Memory maps a log written by TrackingRecorder, which may still be
+    recording, and exposes its records as NumPy arrays without loading
+    the file.
+    """
+    def __init__(self, path):
+        """
+        :param path: the log file to read
+        :raise Exception: ValueError, OSError
+        """
+        self.path = path
+        self.records = None
+        self.refresh()
+
+    def refresh(self):
+        """
+        Maps the log again, to include records appended since the
+        reader was opened.
+
+        :raise Exception: ValueError
+        """
+        header = memmap(self.path, dtype=HEADER_DTYPE, mode='r', shape=(1,))
+        if header['magic'][0] != MAGIC:
+            raise ValueError('File is not a tracking log', self.path)
+        if header['record_size'][0] != RECORD_DTYPE.itemsize:
+            raise ValueError('Tracking log has an unsupported record size',
+                             int(header['record_size'][0]))
+        count = int(header['count'][0])
+        if count == 0:
+            self.records = zeros(0, dtype=RECORD_DTYPE)
+        else:
+            self.records = memmap(self.path, dtype=RECORD_DTYPE, mode='r',
+                                  offset=HEADER_SIZE, shape=(count,))
+
+    def __len__(self):
+        return self.records.shape[0]
+
+    @property
+    def port_handles(self):
+        """The port handle of each record"""
+        return self.records['port_handle']
+
+    @property
+    def frame_numbers(self):
+        """The frame number of each record"""
+        return self.records['frame_number']
+
+    @property
+    def time_stamps(self):
+        """The timestamp of each record"""
+        return self.records['time_stamp']
+
+    @property
+    def tracking(self):
+        """The N x 4 x 4 tracking matrices of the records"""
+        return self.records['tracking']
+
+    @property
+    def tracking_quality(self):
+        """The tracking quality of each record"""
+        return self.records['tracking_quality']
+
+    def get_tool(self, port_handle):
+        """
+        Returns the records of a single tool.
+
+        :param port_handle: the port handle of the tool
+        :return: a structured array of the tool's records, in the order
+            they were recorded
+        """
+        return self.records[self.records['port_handle'] == port_handle]
+
+    def close(self):
+        """
+        Releases the memory map.
+        """
+        self.records = None
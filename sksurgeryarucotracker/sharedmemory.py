@@ -0,0 +1,167 @@
+#  -*- coding: utf-8 -*-
+
+"""Publication of the latest tracking frame to other processes through
+shared memory, guarded by a sequence lock.
+
+The shared block holds a header of five 8 byte fields, padded to 64
+bytes: sequence (uint64), capacity (uint64), tool count (uint64),
+frame number (int64) and timestamp (float64). It is followed by
+capacity records of 144 bytes: port handle (int64), tracking quality
+(float64) and the 4x4 tracking matrix (16 float64, row major). All
+values are little endian.
+
+The writer makes the sequence odd before it changes the frame, and
+even again afterwards, so a reader knows its copy is consistent when
+it sees the same even sequence before and after copying.
+"""
+from multiprocessing import shared_memory, resource_tracker
+from numpy import ndarray, dtype, int64, float64
+
+HEADER_DTYPE = dtype([('sequence', '<u8'),
+                      ('capacity', '<u8'),
+                      ('count', '<u8'),
+                      ('frame_number', '<i8'),
+                      ('time_stamp', '<f8')])
+HEADER_SIZE = 64
+RECORD_DTYPE = dtype([('port_handle', '<i8'),
+                      ('tracking_quality', '<f8'),
+                      ('tracking', '<f8', (4, 4))])
+
+
+def _block_size(capacity):
+    """
+    Returns the size in bytes of a block holding capacity tools
+    """
+    return HEADER_SIZE + capacity * RECORD_DTYPE.itemsize
+
+
+def _views(shared):
+    """
+    Returns the header and records of a shared block as NumPy arrays
+    """
+    header = ndarray((1,), dtype=HEADER_DTYPE, buffer=shared.buf)
+    capacity = int(header['capacity'][0])
+    records = ndarray((capacity,), dtype=RECORD_DTYPE, buffer=shared.buf,
+                      offset=HEADER_SIZE)
+    return header, records
+
+
+class SharedMemoryPublisher:
+    """
+    Creates a shared memory block and writes tracking frames into it.
+    """
+    def __init__(self, name=None, capacity=64):
+        """
+        :param name: the name of the shared memory block, or None to
+            have one chosen, see the name attribute
+        :param capacity: the largest number of tools in a frame, any
+            further tools are not published
+        :raise Exception: ValueError, FileExistsError
+        """
+        if capacity < 1:
+            raise ValueError('Shared memory capacity must be at least 1',
+                             capacity)
+        self._shared = shared_memory.SharedMemory(
+            name=name, create=True, size=_block_size(capacity))
+        self.name = self._shared.name
+        self.dropped_tools = 0
+
+        header = ndarray((1,), dtype=HEADER_DTYPE, buffer=self._shared.buf)
+        header[0] = (0, capacity, 0, -1, 0.0)
+        self._header, self._records = _views(self._shared)
+
+    def publish(self, port_handles, timestamp, frame_number, tracking,
+                tracking_quality):
+        """
+        Writes a frame into the shared block.
+
+        :param port_handles: N port handles
+        :param timestamp: the time of the frame
+        :param frame_number: the number of the frame
+        :param tracking: N x 4 x 4 tracking matrices
+        :param tracking_quality: N tracking qualities
+        """
+        count = min(len(port_handles), self._records.shape[0])
+        self.dropped_tools += len(port_handles) - count
+
+        header = self._header
+        header['sequence'] += 1
+        self._records['port_handle'][:count] = port_handles[:count]
+        self._records['tracking_quality'][:count] = tracking_quality[:count]
+        self._records['tracking'][:count] = tracking[:count]
+        header['count'] = count
+        header['frame_number'] = frame_number
+        header['time_stamp'] = timestamp
+        header['sequence'] += 1
+
+    def close(self):
+        """
+        Closes and removes the shared block.
+        """
+        if self._shared is None:
+            return
+        self._header, self._records = None, None
+        self._shared.close()
+        self._shared.unlink()
+        self._shared = None
+
+
+class SharedMemoryReader:
+    """
+    Attaches to a shared memory block written by a
+    SharedMemoryPublisher, usually in another process, and reads
+    consistent snapshots of the latest frame.
+    """
+    def __init__(self, name):
+        """
+        :param name: the name of the shared memory block
+        :raise Exception: FileNotFoundError
+        """
+        try:
+            self._shared = shared_memory.SharedMemory( # pylint: disable=unexpected-keyword-arg
+                name=name, track=False)
+        except TypeError:
+            # before Python 3.13 attaching registers the block with the
+            # resource tracker, which would remove it when we exit
+            self._shared = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(
+                self._shared._name, "shared_memory") # pylint: disable=protected-access
+        self._header, self._records = _views(self._shared)
+
+    def read(self, retries=100000):
+        """
+        Returns a consistent copy of the latest frame.
+
+        :param retries: how many times to try before giving up, if the
+            frame keeps changing while it is copied
+        :return: an array of port handles, the timestamp, the frame
+            number (-1 if nothing has been published), an N x 4 x 4
+            array of tracking matrices and an array of tracking
+            qualities
+        :raise Exception: TimeoutError
+        """
+        header = self._header
+        for _ in range(retries):
+            before = int(header['sequence'][0])
+            if before % 2 == 1:
+                continue
+            count = int(header['count'][0])
+            frame_number = int(header['frame_number'][0])
+            timestamp = float(header['time_stamp'][0])
+            records = self._records[:count].copy()
+            if int(header['sequence'][0]) == before:
+                return (records['port_handle'].astype(int64), timestamp,
+                        frame_number, records['tracking'].astype(float64),
+                        records['tracking_quality'].astype(float64))
+        raise TimeoutError('Failed to read a consistent frame from shared '
+                           'memory')
+
+    def close(self):
+        """
+        Detaches from the shared block, without removing it.
+        """
+        if self._shared is None:
+            return
+        self._header, self._records = None, None
+        self._shared.close()
+        self._shared = None
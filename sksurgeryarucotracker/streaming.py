@@ -0,0 +1,114 @@
+#  -*- coding: utf-8 -*-
+
+"""Composable stages for streaming frames from an ArUcoTracker,
+each takes an iterable and lazily yields from it.
+"""
+from itertools import islice
+from sksurgeryarucotracker.timing import CAPTURE
+
+
+def capture_images(capture, decimation=1, timer=None, on_failure=None):
+    """
+    Yields images from an OpenCV video capture until it fails to read.
+
+    :param capture: an opened cv2.VideoCapture
+    :param decimation: yield every decimation-th image, the images
+        in between are grabbed but not decoded
+    :param timer: a StageTimer to start a frame with, and mark its
+        capture, for each image, or None. Grabbing the images skipped
+        before an image counts towards its capture.
+    :param on_failure: a function to call, with no arguments, when a
+        read fails and the images end, or None
+    :raise Exception: ValueError
+    """
+    _check_decimation(decimation)
+    skip = 0
+    while True:
+        if timer is not None:
+            timer.start()
+        for _ in range(skip):
+            if not capture.grab():
+                _failed(timer, on_failure)
+                return
+        success, image = capture.read()
+        if not success or image is None:
+            _failed(timer, on_failure)
+            return
+        if timer is not None:
+            timer.mark(CAPTURE)
+        yield image
+        skip = decimation - 1
+
+
+def _failed(timer, on_failure):
+    """
+    Forgets the frame started on the timer, and reports a failed read,
+    if there are a timer and a failure function
+    """
+    if timer is not None:
+        timer.cancel()
+    if on_failure is not None:
+        on_failure()
+
+
+def decimate(items, decimation):
+    """
+    Yields every decimation-th item, starting with the first.
+
+    :param items: an iterable of images or frames
+    :param decimation: the step between the items kept
+    :raise Exception: ValueError
+    """
+    _check_decimation(decimation)
+    return islice(items, 0, None, decimation)
+
+
+def limit(items, count):
+    """
+    Yields at most count items, and stops pulling from items after that.
+
+    :param items: an iterable of images or frames
+    :param count: the largest number of items to yield
+    """
+    return islice(items, count)
+
+
+def select_port_handles(frames, port_handles):
+    """
+    Removes the tools that are not wanted from each frame.
+
+    :param frames: an iterable of frames, as returned by
+        ArUcoTracker.get_frame
+    :param port_handles: the port handles to keep
+    """
+    wanted = set(port_handles)
+    for frame in frames:
+        yield _select_tools(frame, wanted)
+
+
+def _select_tools(frame, wanted):
+    """
+    Returns a frame with only the wanted port handles
+    """
+    port_handles, time_stamps, frame_numbers, tracking, quality = frame
+    keep = [index for index, port_handle in enumerate(port_handles)
+            if port_handle in wanted]
+    if not keep:
+        return ([], [], [], None, [])
+    if isinstance(tracking, list):
+        tracking = [tracking[index] for index in keep]
+    else:
+        tracking = tracking[keep]
+    return ([port_handles[index] for index in keep],
+            [time_stamps[index] for index in keep],
+            [frame_numbers[index] for index in keep],
+            tracking,
+            [quality[index] for index in keep])
+
+
+def _check_decimation(decimation):
+    """
+    Raises a ValueError if decimation is not a positive integer
+    """
+    if int(decimation) != decimation or decimation < 1:
+        raise ValueError('Decimation must be a positive integer', decimation)
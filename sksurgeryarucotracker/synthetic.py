@@ -0,0 +1,276 @@
+#  -*- coding: utf-8 -*-
+
+"""Rendering of synthetic images of ArUco markers at known poses, for
+repeatable benchmarks at any marker count and resolution.
+"""
+from math import ceil, sqrt, pi, sin, radians
+from numpy import (array, asarray, float32, eye, zeros, full, ones,
+                   uint8, pad, tile, arange, stack, clip, mgrid, empty)
+from numpy.linalg import norm
+from numpy.random import default_rng
+import cv2.aruco as aruco # pylint: disable=import-error
+from cv2 import (warpPerspective, getPerspectiveTransform, undistortPoints,
+                 remap, GaussianBlur, INTER_LINEAR, INTER_NEAREST,
+                 BORDER_CONSTANT, BORDER_REPLICATE)
+
+from sksurgeryarucotracker.algorithms.geometry import (
+    rodrigues_to_matrices, project_points)
+
+_MARGIN = 2.0
+"""The white margin drawn around each marker, in marker cells. One cell
+is not always enough for detection against the grey background."""
+
+
+def _marker_images(dictionary, count, cell_pixels):
+    """
+    Draws markers 0 to count - 1, each with a white margin
+    """
+    size = (dictionary.markerSize + 2) * cell_pixels
+    margin = int(_MARGIN * cell_pixels)
+    images = []
+    for marker_id in range(count):
+        # OpenCV 4.7 renamed drawMarker
+        if hasattr(aruco, 'generateImageMarker'):
+            image = aruco.generateImageMarker(dictionary, marker_id, size)
+        else:
+            image = aruco.drawMarker(dictionary, marker_id, size)
+        images.append(pad(image, margin, constant_values=255))
+    return images
+
+
+class SyntheticScene:
+    # pylint: disable=too-many-instance-attributes
+    """
+    Renders frames of many ArUco markers, laid out on a grid facing the
+    camera with random tilts, and moving together from frame to frame.
+    The marker ids are 0 to marker_count - 1, and the ground truth
+    poses use the same convention as a calibrated ArUcoTracker.
+    """
+    def __init__(self, configuration):
+        """
+        :param configuration: A dictionary describing the scene, using
+            the same names as ArUcoTracker where they overlap.
+
+            marker count: the number of markers, defaults to 1
+
+            aruco dictionary: defaults to DICT_4X4_1000
+
+            resolution: the width and height of the frames, in pixels,
+            defaults to (640, 480)
+
+            marker size: the side of each marker, defaults to 50 mm
+
+            camera projection: the 3x3 camera matrix, defaults to a
+            focal length of the frame width, centred
+
+            camera distortion: defaults to no distortion
+
+            maximum tilt: the largest tilt of a marker away from facing
+            the camera, in degrees, defaults to 30
+
+            motion: the amplitude of the movement of the markers, as a
+            fraction of the grid spacing. The markers move in a circle,
+            once every 100 frames, defaults to 0
+
+            blur: the standard deviation of a Gaussian blur, in pixels,
+            defaults to 0
+
+            noise: the standard deviation of Gaussian noise added to
+            each pixel, in grey levels, defaults to 0
+
+            seed: the seed for the tilts and the noise, defaults to 0
+
+        :raise Exception: ValueError, ImportError
+        """
+        self.dictionary = configuration.get("aruco dictionary",
+                                            "DICT_4X4_1000")
+        try:
+            self._dictionary = aruco.getPredefinedDictionary(
+                getattr(aruco, self.dictionary))
+        except AttributeError:
+            raise ImportError(('Failed when trying to import {} from cv2.'
+                               'aruco. Check dictionary exists.')
+                              .format(self.dictionary)) from AttributeError
+        marker_count = configuration.get("marker count", 1)
+        if not 0 < marker_count <= self._dictionary.bytesList.shape[0]:
+            raise ValueError('Marker count must be between 1 and the '
+                             'dictionary size', marker_count)
+
+        resolution = configuration.get("resolution", (640, 480))
+        self.resolution = (int(resolution[0]), int(resolution[1]))
+        self.marker_size = configuration.get("marker size", 50.0)
+        camera_projection = configuration.get("camera projection", None)
+        if camera_projection is None:
+            camera_projection = array(
+                [[self.resolution[0], 0.0, self.resolution[0] / 2.0],
+                 [0.0, self.resolution[0], self.resolution[1] / 2.0],
+                 [0.0, 0.0, 1.0]])
+        self.camera_projection = asarray(camera_projection, dtype=float32)
+        self.camera_distortion = asarray(
+            configuration.get("camera distortion", zeros(5)),
+            dtype=float32).ravel()
+        self.port_handles = arange(marker_count)
+
+        self._motion = configuration.get("motion", 0.0)
+        self._blur = configuration.get("blur", 0.0)
+        self._noise = configuration.get("noise", 0.0)
+        self._rng = default_rng(configuration.get("seed", 0))
+        self._layout(marker_count, configuration.get("maximum tilt", 30.0))
+
+        focal = float(self.camera_projection[0, 0])
+        cell_pixels = max(2, int(ceil(
+            focal * self.marker_size / self._depth /
+            (self._dictionary.markerSize + 2))))
+        self._images = _marker_images(self._dictionary, marker_count,
+                                      cell_pixels)
+        self._distortion_maps = self._make_distortion_maps()
+
+    def _layout(self, marker_count, maximum_tilt):
+        """
+        Places the markers on a grid that fills most of the frame
+        """
+        width, height = self.resolution
+        columns = int(ceil(sqrt(marker_count * width / height)))
+        rows = int(ceil(marker_count / columns))
+        self._spacing = 2.0 * self.marker_size
+        focal = float(self.camera_projection[0, 0])
+        self._depth = max(focal * columns * self._spacing / (0.8 * width),
+                          focal * rows * self._spacing / (0.8 * height))
+
+        centre = self.camera_projection[0:2, 2]
+        offset = (centre - array([width, height]) / 2.0) * \
+                self._depth / focal
+        grid = mgrid[0:rows, 0:columns].reshape(2, -1).T[0:marker_count]
+        self._positions = empty((marker_count, 3))
+        self._positions[:, 0] = (grid[:, 1] - (columns - 1) / 2.0) * \
+                self._spacing - offset[0]
+        self._positions[:, 1] = (grid[:, 0] - (rows - 1) / 2.0) * \
+                self._spacing - offset[1]
+        self._positions[:, 2] = self._depth
+
+        axes = self._rng.normal(size=(marker_count, 3))
+        axes[:, 2] = 0.0
+        axes /= clip(norm(axes, axis=1), 1e-9, None)[:, None]
+        angles = self._rng.uniform(0.0, radians(maximum_tilt),
+                                   size=(marker_count, 1))
+        # turn the markers to face the camera, then tilt them
+        facing = array([[1.0, 0.0, 0.0], [0.0, -1.0, 0.0], [0.0, 0.0, -1.0]])
+        self._rotations = facing @ rodrigues_to_matrices(axes * angles)
+
+    def _make_distortion_maps(self):
+        """
+        Returns maps from distorted to undistorted pixels, or None if
+        there is no distortion
+        """
+        if not self.camera_distortion.any():
+            return None
+        width, height = self.resolution
+        pixels = mgrid[0:height, 0:width][::-1].reshape(2, -1).T
+        undistorted = undistortPoints(
+            pixels.astype(float32).reshape(-1, 1, 2), self.camera_projection,
+            self.camera_distortion, P=self.camera_projection)
+        maps = undistorted.reshape(height, width, 2)
+        return maps[:, :, 0].copy(), maps[:, :, 1].copy()
+
+    def poses(self, frame_number):
+        """
+        Returns the ground truth poses of the markers in a frame.
+
+        :param frame_number: the number of the frame
+        :return: an N x 4 x 4 array of marker to camera transforms, in
+            the order of port_handles
+        """
+        phase = 2.0 * pi * frame_number / 100.0
+        shift = self._motion * self._spacing * array(
+            [sin(phase), sin(phase + pi / 2.0), 0.0])
+        poses = tile(eye(4), (self.port_handles.shape[0], 1, 1))
+        poses[:, 0:3, 0:3] = self._rotations
+        poses[:, 0:3, 3] = self._positions + shift
+        return poses
+
+    def render(self, frame_number):
+        """
+        Renders a frame.
+
+        :param frame_number: the number of the frame
+        :return: a height x width x 3 BGR image
+        """
+        width, height = self.resolution
+        frame = full((height, width), 128, dtype=uint8)
+        poses = self.poses(frame_number)
+
+        half = self.marker_size / 2.0
+        patch_half = half * (1.0 + 2.0 * _MARGIN /
+                             (self._dictionary.markerSize + 2))
+        corners = array([[-patch_half, patch_half, 0.0],
+                         [patch_half, patch_half, 0.0],
+                         [patch_half, -patch_half, 0.0],
+                         [-patch_half, -patch_half, 0.0]])
+        projected = project_points(corners, poses[:, 0:3, 0:3],
+                                   poses[:, 0:3, 3], self.camera_projection,
+                                   zeros(5))
+        for image, points in zip(self._images, projected):
+            self._draw_marker(frame, image, points.astype(float32))
+
+        if self._distortion_maps is not None:
+            frame = remap(frame, self._distortion_maps[0],
+                          self._distortion_maps[1], INTER_LINEAR,
+                          borderMode=BORDER_REPLICATE)
+        if self._blur > 0.0:
+            frame = GaussianBlur(frame, (0, 0), self._blur)
+        if self._noise > 0.0:
+            noisy = frame + self._rng.normal(0.0, self._noise, frame.shape)
+            frame = clip(noisy, 0, 255).astype(uint8)
+        return stack([frame, frame, frame], axis=2)
+
+    @staticmethod
+    def _draw_marker(frame, image, points):
+        """
+        Warps a marker image onto the part of a frame its projected
+        corners cover
+        """
+        height, width = frame.shape
+        left, top = clip(points.min(axis=0).astype(int), 0, None)
+        right = min(int(ceil(points[:, 0].max())) + 1, width)
+        bottom = min(int(ceil(points[:, 1].max())) + 1, height)
+        if right <= left or bottom <= top:
+            return
+        # pixel centres are at integer coordinates, so the edges of the
+        # image are half a pixel outside them
+        side = image.shape[0] - 0.5
+        source = array([[-0.5, -0.5], [side, -0.5], [side, side],
+                        [-0.5, side]], dtype=float32)
+        homography = getPerspectiveTransform(source,
+                                             points - array([left, top],
+                                                            dtype=float32))
+        size = (right - left, bottom - top)
+        warped = warpPerspective(image, homography, size, flags=INTER_LINEAR,
+                                 borderMode=BORDER_CONSTANT)
+        mask = warpPerspective(ones(image.shape, dtype=uint8), homography,
+                               size, flags=INTER_NEAREST,
+                               borderMode=BORDER_CONSTANT)
+        region = frame[top:bottom, left:right]
+        region[mask > 0] = warped[mask > 0]
+
+    def frames(self, frame_count=None):
+        """
+        Yields rendered frames, with their ground truth.
+
+        :param frame_count: the number of frames, or None for no limit
+        :return: a generator of (image, poses) pairs, see render and
+            poses
+        """
+        frame_number = 0
+        while frame_count is None or frame_number < frame_count:
+            yield self.render(frame_number), self.poses(frame_number)
+            frame_number += 1
+
+    def images(self, frame_count=None):
+        """
+        Yields rendered frames, for ArUcoTracker.iter_frames.
+
+        :param frame_count: the number of frames, or None for no limit
+        :return: a generator of images
+        """
+        for image, _ in self.frames(frame_count):
+            yield image
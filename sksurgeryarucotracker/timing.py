@@ -0,0 +1,118 @@
+#  -*- coding: utf-8 -*-
+
+"""Timing of the stages of tracking a frame.
+"""
+from time import perf_counter_ns
+from numpy import zeros, full, int64, arange, diff, array
+
+STAGES = ("capture", "detection", "pose estimation", "publication",
+          "display")
+"""The stages of a frame, in the order they run, and the columns of
+StageTimer durations"""
+CAPTURE, DETECTION, POSE_ESTIMATION, PUBLICATION, DISPLAY = range(5)
+
+
+class StageTimer:
+    """
+    Times the stages of each frame with perf_counter_ns, and keeps the
+    durations of recent frames in a ring buffer.
+    """
+    def __init__(self, length=1024):
+        """
+        :param length: the number of frames to keep the durations of
+        :raise Exception: ValueError
+        """
+        if length < 1:
+            raise ValueError('Stage timing length must be at least 1',
+                             length)
+        self._length = length
+        self._marks = [0] * (len(STAGES) + 1)
+        self._started = False
+        self._head = 0
+        self.count = 0
+        self.frame_numbers = full(length, -1, dtype=int64)
+        self.durations = zeros((length, len(STAGES)), dtype=int64)
+
+    def start(self):
+        """
+        Marks the start of a frame, before it is captured.
+        """
+        self._marks[0] = perf_counter_ns()
+        self._started = True
+
+    def begin(self):
+        """
+        Marks the start of a frame that was not captured, so has no
+        capture time. Does nothing if start was called for this frame.
+        """
+        if not self._started:
+            self._marks[0] = self._marks[1] = perf_counter_ns()
+            self._started = True
+
+    def cancel(self):
+        """
+        Forgets a frame that was started but will not be stopped, for
+        example because it could not be captured.
+        """
+        self._started = False
+
+    def mark(self, stage):
+        """
+        Marks the end of a stage.
+
+        :param stage: the index of the stage in STAGES
+        """
+        self._marks[stage + 1] = perf_counter_ns()
+
+    def stop(self, frame_number):
+        """
+        Marks the end of a frame, and stores the durations of its
+        stages.
+
+        :param frame_number: the number of the frame
+        :return: the durations of the frame's stages, in nanoseconds
+        """
+        self._marks[-1] = perf_counter_ns()
+        durations = self.durations[self._head]
+        durations[:] = diff(self._marks)
+        self.frame_numbers[self._head] = frame_number
+        self._head = (self._head + 1) % self._length
+        self.count = min(self.count + 1, self._length)
+        self._started = False
+        return durations
+
+    def latest(self):
+        """
+        Returns the durations of the stages of the latest frame.
+
+        :return: a dictionary of the duration of each stage, and of
+            "total", in nanoseconds, empty if no frame has been timed
+        """
+        if self.count == 0:
+            return {}
+        row = self.durations[(self._head - 1) % self._length]
+        timings = dict(zip(STAGES, row.tolist()))
+        timings["total"] = int(row.sum())
+        return timings
+
+    def get_timings(self):
+        """
+        Returns the durations of the stages of the frames held.
+
+        :return: an array of frame numbers, oldest first, and a
+            matching N x 5 array of the durations of each stage in
+            STAGES, in nanoseconds
+        """
+        order = (self._head - self.count + arange(self.count)) % self._length
+        return (array(self.frame_numbers[order]),
+                array(self.durations[order]))
+
+    def reset(self):
+        """
+        Forgets the durations of all frames.
+        """
+        self._head = 0
+        self.count = 0
+        self._started = False
+        self.frame_numbers[:] = -1
+        self.durations[:] = 0
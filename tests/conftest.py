@@ -0,0 +1,56 @@
+# coding=utf-8
+
+"""Options and fixtures for the performance regression benchmarks"""
+
+import os
+import pytest
+from sksurgeryarucotracker.benchmarks.regression import (load_baseline,
+                                                         save_baseline)
+
+
+def pytest_addoption(parser):
+    """
+    Adds options to run the benchmarks, and to update their baseline
+    """
+    group = parser.getgroup("benchmark")
+    group.addoption("--benchmark", action="store_true",
+                    help="run the performance regression benchmarks")
+    group.addoption("--update-baseline", action="store_true",
+                    help="run the benchmarks and record the results as the "
+                         "new baseline")
+
+
+def pytest_configure(config):
+    """
+    Registers the benchmark marker
+    """
+    config.addinivalue_line(
+        "markers", "benchmark: a performance regression benchmark, "
+                   "run with --benchmark or --update-baseline")
+
+
+def pytest_collection_modifyitems(config, items):
+    """
+    Skips benchmarks unless they were asked for, as the baseline
+    depends on the machine
+    """
+    if config.getoption("--benchmark") or \
+            config.getoption("--update-baseline"):
+        return
+    skip = pytest.mark.skip(reason="run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope="session")
+def performance_baseline(request):
+    """
+    The stored baseline, saved again at the end of the session when
+    updating
+    """
+    path = os.path.join(os.path.dirname(__file__), 'benchmark_baseline.json')
+    baseline = load_baseline(path)
+    yield baseline
+    if request.config.getoption("--update-baseline"):
+        save_baseline(baseline, path)
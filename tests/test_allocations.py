@@ -0,0 +1,72 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for allocation tracing"""
+
+import tracemalloc
+import pytest
+from sksurgeryarucotracker.allocations import (AllocationTracer,
+                                               TRACING_SUPPORTED)
+
+pytestmark = pytest.mark.skipif(not TRACING_SUPPORTED,
+                                reason="Allocation tracing needs Python 3.9")
+
+
+def test_allocation_tracer():
+    """
+    Tests measuring transient and retained allocations
+    """
+    with pytest.raises(ValueError):
+        AllocationTracer(top=0)
+    with pytest.raises(ValueError):
+        AllocationTracer(interval=0)
+
+    assert not tracemalloc.is_tracing()
+    tracer = AllocationTracer(top=3, interval=1)
+    assert tracemalloc.is_tracing()
+    kept = []
+    for _ in range(4):
+        assert tracer.run(lambda: len(bytearray(100000))) == 100000
+        assert tracer.latest['peak bytes'] >= 100000
+        assert tracer.latest['net bytes'] < 100000
+        tracer.run(kept.append, bytearray(100000))
+        tracer.run(lambda: kept.append(bytearray(50000)))
+        assert tracer.latest['net bytes'] >= 50000
+
+    with pytest.raises(ZeroDivisionError):
+        tracer.run(lambda: 1 / 0)
+    assert tracer.calls == 13
+
+    report = tracer.report()
+    assert report['calls'] == 13
+    assert report['peak bytes per call'] > 40000
+    assert report['retained bytes per call'] > 40000
+    assert report['retained blocks per call'] > 0
+    assert len(report['largest sites']) <= 3
+    assert report['growth sites'][0]['site'].startswith(__file__)
+    assert report['growth sites'][0]['bytes'] >= 150000
+    tracer.stop()
+    assert not tracemalloc.is_tracing()
+
+
+def test_tracers_share_tracemalloc():
+    """
+    Tests that tracemalloc keeps tracing until the last tracer stops
+    """
+    first = AllocationTracer(interval=1)
+    second = AllocationTracer(interval=1)
+    first.stop()
+    first.stop()
+    assert tracemalloc.is_tracing()
+    assert second.run(lambda: len(bytearray(1000))) == 1000
+    assert second.report()['calls'] == 1
+    second.stop()
+    assert not tracemalloc.is_tracing()
+
+    tracemalloc.start()
+    tracer = AllocationTracer()
+    tracer.stop()
+    assert tracemalloc.is_tracing()
+    tracemalloc.stop()
+    assert tracer.run(lambda: 1) == 1
+    assert tracer.calls == 0
+    assert not tracer.report()['largest sites']
@@ -0,0 +1,80 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for the benchmarks"""
+
+import json
+import pytest
+import numpy as np
+from sksurgeryarucotracker.benchmarks import tracking, accuracy
+from sksurgeryarucotracker.algorithms.geometry import rodrigues_to_matrices
+
+
+def test_tracking_benchmark(tmp_path):
+    """
+    Tests the benchmark runs over every bundled configuration and
+    writes JSON.
+    """
+    output = tmp_path / 'results.json'
+    tracking.main(['--frames', '3', '--warm-up', '1',
+                   '--output', str(output)])
+    results = json.loads(output.read_text())
+
+    assert len(results['results']) == 4
+    assert {(result['video'], result['calibrated'])
+            for result in results['results']} == {
+                ('output.avi', False), ('output.avi', True),
+                ('12markers.avi', False), ('12markers.avi', True)}
+    for result in results['results']:
+        assert result['frame count'] == 3
+        assert result['frames per second'] > 0.0
+        assert result['markers per frame'] >= 1.0
+        assert set(result['stages']) == set(tracking.STAGES) | {'total'}
+
+    with pytest.raises(OSError):
+        tracking.read_video(str(tmp_path / 'missing.avi'))
+
+
+def test_pose_errors_and_pareto():
+    """
+    Tests pose error measures and the Pareto front
+    """
+    truth = np.tile(np.eye(4), (2, 1, 1))
+    estimate = truth.copy()
+    estimate[0, 0:3, 3] = [3.0, 4.0, 0.0]
+    estimate[1, 0:3, 0:3] = rodrigues_to_matrices([0.0, 0.0, np.pi / 2])[0]
+    translations, rotations = accuracy.pose_errors(estimate, truth)
+    assert np.allclose(translations, [5.0, 0.0])
+    assert np.allclose(rotations, [0.0, 90.0])
+
+    results = [{"frames per second": 10.0,
+                "translation error mm": {"mean": 1.0}},
+               {"frames per second": 20.0,
+                "translation error mm": {"mean": 2.0}},
+               {"frames per second": 5.0,
+                "translation error mm": {"mean": 3.0}},
+               {"frames per second": 50.0, "translation error mm": None}]
+    assert accuracy.pareto_front(results) == [True, True, False, True]
+
+
+def test_accuracy_benchmark(tmp_path, monkeypatch):
+    """
+    Tests the accuracy benchmark over a small scene.
+    """
+    configurations = tmp_path / 'configurations.json'
+    configurations.write_text(json.dumps(
+        {"default": {}, "pose cache": {"pose cache tolerance": 0.5}}))
+    output = tmp_path / 'results.json'
+    monkeypatch.setattr(accuracy, 'SCENES',
+                        {"2 markers": {"marker count": 2}})
+    accuracy.main(['--frames', '3', '--configurations',
+                   str(configurations), '--output', str(output)])
+    results = json.loads(output.read_text())
+
+    assert [result['configuration'] for result in results] == \
+            ['default', 'pose cache']
+    for result in results:
+        assert result['scene'] == '2 markers'
+        assert result['detection rate'] == 1.0
+        assert result['translation error mm']['mean'] < 10.0
+        assert result['rotation error deg']['max'] < 10.0
+    assert any(result['pareto'] for result in results)
@@ -0,0 +1,40 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for the pose cache"""
+
+import pytest
+import numpy as np
+from sksurgeryarucotracker.algorithms.cache import PoseCache
+
+def test_pose_cache():
+    """
+    Tests cache hits and misses for several markers
+    """
+    with pytest.raises(ValueError):
+        PoseCache(tolerance=-1.0)
+
+    cache = PoseCache(tolerance=0.1)
+    corners = np.arange(24, dtype=np.float64).reshape(3, 4, 2)
+    tracking = np.tile(np.eye(4), (3, 1, 1))
+    tracking[:, 0, 3] = [1.0, 2.0, 3.0]
+
+    hit, _, _ = cache.lookup([4, 2, 8], corners)
+    assert not hit.any()
+    cache.store([4, 2, 8], corners, tracking, [0.1, 0.2, 0.3])
+
+    moved = corners.copy()
+    moved[1, 2, 0] += 0.5
+    moved[2, 0, 1] += 0.05
+    hit, cached, errors = cache.lookup([8, 2, 4, 6], moved[[2, 1, 0, 0]])
+    assert np.array_equal(hit, [True, False, True, False])
+    assert np.allclose(cached[0], tracking[2])
+    assert np.allclose(cached[2], tracking[0])
+    assert np.isnan(cached[1]).all()
+    assert np.allclose(errors[[0, 2]], [0.3, 0.1])
+    assert (cache.hits, cache.misses) == (2, 5)
+
+    cache.clear()
+    hit, _, _ = cache.lookup([4], corners[0:1])
+    assert not hit.any()
+    cache.reset_counts()
+    assert (cache.hits, cache.misses) == (0, 0)
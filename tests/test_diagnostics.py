@@ -0,0 +1,44 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for tracker diagnostics"""
+
+import pytest
+from sksurgeryarucotracker.diagnostics import TrackerDiagnostics
+
+
+def test_without_diagnostics():
+    """
+    Tests that unconfigured diagnostics just run tracking, and raise
+    ValueError when asked for
+    """
+    diagnostics = TrackerDiagnostics({})
+    diagnostics.open({}, dict)
+    assert diagnostics.run(lambda frame: frame + 1, 1) == 2
+    assert diagnostics.stage_timer is None
+    diagnostics.reset()
+    for getter in (diagnostics.get_stage_timings,
+                   diagnostics.get_frame_timing,
+                   diagnostics.get_latency_statistics,
+                   diagnostics.reset_latency_statistics,
+                   diagnostics.get_metrics_port,
+                   diagnostics.get_allocation_report):
+        with pytest.raises(ValueError):
+            getter()
+    diagnostics.close()
+
+
+def test_record_and_reset():
+    """
+    Tests recording stage timings into the latency statistics
+    """
+    diagnostics = TrackerDiagnostics({'latency statistics' : {}})
+    diagnostics.open({}, dict)
+    for frame_number in range(3):
+        diagnostics.stage_timer.begin()
+        diagnostics.record(frame_number, float(frame_number))
+    assert len(diagnostics.get_stage_timings()[0]) == 3
+    assert diagnostics.get_latency_statistics()['frames'] == 3
+    diagnostics.reset()
+    assert len(diagnostics.get_stage_timings()[0]) == 0
+    assert diagnostics.get_latency_statistics()['frames'] == 0
+    diagnostics.close()
@@ -0,0 +1,76 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for the pose filters"""
+
+import pytest
+import numpy as np
+from sksurgeryarucotracker.algorithms.filters import OneEuroFilterBank
+from sksurgeryarucotracker.algorithms.handles import (find_handles,
+                                                      add_handles,
+                                                      first_handles)
+
+def test_find_and_add_handles():
+    """
+    Tests keeping state in sorted per port handle arrays
+    """
+    handles = np.empty(0, dtype=np.int64)
+    slots, found = find_handles(handles, [3, 1])
+    assert not found.any()
+
+    handles, state = add_handles(handles, [3, 1], np.empty((0, 2)))
+    assert np.array_equal(handles, [1, 3])
+    assert np.isnan(state).all()
+    state[1] = [3.0, 3.0]
+
+    handles, state = add_handles(handles, [2, 3], state)
+    assert np.array_equal(handles, [1, 2, 3])
+    assert np.array_equal(state[2], [3.0, 3.0])
+
+    slots, found = find_handles(handles, [3, 7, 1])
+    assert np.array_equal(found, [True, False, True])
+    assert np.array_equal(slots[found], [2, 0])
+
+    assert first_handles(np.array([4, 2, 7])) is None
+    assert np.array_equal(first_handles(np.array([4, 2, 4, 7, 2])),
+                          [0, 1, 3])
+    with pytest.raises(ValueError):
+        add_handles(handles, [5, 5], state)
+    with pytest.raises(ValueError):
+        OneEuroFilterBank().update([5, 5], np.tile(np.eye(4), (2, 1, 1)),
+                                   0.0)
+
+
+def test_one_euro_filter_bank():
+    """
+    Tests that the filter bank reduces noise for many tools at once,
+    whatever order they arrive in.
+    """
+    with pytest.raises(ValueError):
+        OneEuroFilterBank(min_cutoff=0.0)
+
+    filter_bank = OneEuroFilterBank(min_cutoff=1.0)
+    rng = np.random.default_rng(0)
+    truth = np.tile(np.eye(4), (3, 1, 1))
+    truth[:, 0:3, 3] = [[0.0, 0.0, 100.0], [10.0, 0.0, 100.0],
+                        [0.0, 10.0, 100.0]]
+    port_handles = np.array([5, 2, 9])
+
+    errors = []
+    for frame in range(60):
+        order = rng.permutation(3)
+        noisy = truth[order].copy()
+        noisy[:, 0:3, 3] += rng.normal(size=(3, 3))
+        smoothed = filter_bank.update(port_handles[order], noisy,
+                                      frame / 30.0)
+        assert smoothed.shape == (3, 4, 4)
+        if frame == 0:
+            assert np.allclose(smoothed, noisy)
+        errors.append(np.linalg.norm(smoothed[:, 0:3, 3] -
+                                     truth[order, 0:3, 3], axis=1))
+        assert np.allclose(smoothed[:, 0:3, 0:3], np.eye(3))
+
+    assert np.mean(errors[30:]) < 0.6 * np.sqrt(3.0)
+
+    filter_bank.reset()
+    smoothed = filter_bank.update([5], noisy[0:1], 3.0)
+    assert np.allclose(smoothed, noisy[0:1])
@@ -0,0 +1,157 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for the batch geometry functions"""
+
+import numpy as np
+import cv2
+from sksurgeryarucotracker.algorithms.geometry import (
+    rodrigues_to_matrices, project_points, marker_areas,
+    reprojection_errors, reprojection_quality, ippe_square_poses,
+    select_pose_candidates, matrices_to_quaternions, quaternions_to_matrices,
+    slerp_quaternions)
+
+def test_rodrigues_to_matrices():
+    """
+    Tests that the batch conversion matches cv2.Rodrigues
+    """
+    rvecs = np.array([[0.0, 0.0, 0.0],
+                      [0.1, -0.2, 0.3],
+                      [-3.05676553, 0.04505341, -0.07842232]])
+    rotations = rodrigues_to_matrices(rvecs)
+    assert rotations.shape == (3, 3, 3)
+    for rvec, rotation in zip(rvecs, rotations):
+        expected, _ = cv2.Rodrigues(rvec)
+        assert np.allclose(rotation, expected)
+
+
+def test_project_points():
+    """
+    Tests that the batch projection matches cv2.projectPoints
+    """
+    projection = np.array([[560.0, 0.0, 320.0],
+                           [0.0, 560.0, 240.0],
+                           [0.0, 0.0, 1.0]])
+    distortion = np.array([0.1, -0.05, 0.001, 0.002, 0.01])
+    points = np.array([[-25.0, 25.0, 0.0], [25.0, 25.0, 0.0],
+                       [25.0, -25.0, 0.0], [-25.0, -25.0, 0.0]])
+    rvecs = np.array([[-3.0, 0.05, -0.08], [0.2, 0.1, 0.0]])
+    tvecs = np.array([[16.0, 26.0, 206.0], [-40.0, 10.0, 300.0]])
+
+    projected = project_points(points, rodrigues_to_matrices(rvecs),
+                               tvecs, projection, distortion)
+    assert projected.shape == (2, 4, 2)
+    for index in range(2):
+        expected, _ = cv2.projectPoints(points, rvecs[index], tvecs[index],
+                                        projection, distortion)
+        assert np.allclose(projected[index], expected.reshape(4, 2))
+
+
+def test_areas_errors_and_quality():
+    """
+    Tests marker areas, reprojection errors and quality
+    """
+    corners = np.array([[[0.0, 0.0], [10.0, 0.0],
+                         [10.0, 10.0], [0.0, 10.0]],
+                        [[0.0, 0.0], [30.0, 0.0],
+                         [30.0, 30.0], [0.0, 30.0]]])
+    assert np.allclose(marker_areas(corners), [100.0, 900.0])
+
+    errors = reprojection_errors(corners, corners + [3.0, 4.0])
+    assert np.allclose(errors, [5.0, 5.0])
+
+    quality = reprojection_quality([0.0, 1.0, 0.0], [900.0, 900.0, 100.0])
+    assert np.allclose(quality, [1.0, 0.5, 0.25])
+
+
+def test_ippe_square_poses():
+    """
+    Tests that both batch IPPE candidates match cv2.solvePnPGeneric
+    """
+    projection = np.array([[560.0, 0.0, 320.0],
+                           [0.0, 560.0, 240.0],
+                           [0.0, 0.0, 1.0]])
+    distortion = np.array([0.1, 0.0, 0.0, 0.0, 0.0])
+    points = np.array([[-25.0, 25.0, 0.0], [25.0, 25.0, 0.0],
+                       [25.0, -25.0, 0.0], [-25.0, -25.0, 0.0]])
+    rvecs = np.array([[0.3, -0.4, 0.2], [-0.2, 0.1, 1.5], [0.0, 0.0, 0.0]])
+    tvecs = np.array([[10.0, -20.0, 300.0], [-30.0, 5.0, 250.0],
+                      [0.0, 0.0, 200.0]])
+    noise = np.random.default_rng(1).normal(scale=0.3, size=(3, 4, 2))
+
+    image_points = np.empty((3, 4, 2))
+    for index in range(3):
+        projected, _ = cv2.projectPoints(points, rvecs[index], tvecs[index],
+                                         projection, distortion)
+        image_points[index] = projected.reshape(4, 2) + noise[index]
+    normalised = cv2.undistortPoints(image_points.reshape(-1, 1, 2),
+                                     projection, distortion)
+
+    rotations, translations = ippe_square_poses(normalised, 50.0)
+    assert rotations.shape == (3, 2, 3, 3)
+    assert translations.shape == (3, 2, 3)
+
+    for index in range(3):
+        _, cv_rvecs, cv_tvecs, _ = cv2.solvePnPGeneric(
+            points, image_points[index], projection, distortion,
+            flags=cv2.SOLVEPNP_IPPE_SQUARE)
+        for cv_rvec, cv_tvec in zip(cv_rvecs, cv_tvecs):
+            expected, _ = cv2.Rodrigues(cv_rvec)
+            matches = [np.allclose(rotations[index, k], expected,
+                                   atol=1e-6) and
+                       np.allclose(translations[index, k], cv_tvec.ravel(),
+                                   atol=1e-4)
+                       for k in range(2)]
+            assert any(matches)
+
+
+def test_select_pose_candidates():
+    """
+    Tests that ambiguous candidates are chosen using the previous pose
+    """
+    flipped = np.diag([1.0, -1.0, -1.0])
+    rotations = np.array([[np.eye(3), flipped]] * 3)
+    errors = np.array([[0.5, 0.6], [0.5, 0.6], [0.5, 5.0]])
+
+    assert np.array_equal(select_pose_candidates(errors, rotations),
+                          [0, 0, 0])
+
+    previous = np.array([flipped, np.full((3, 3), np.nan), flipped])
+    assert np.array_equal(select_pose_candidates(errors, rotations,
+                                                 previous),
+                          [1, 0, 0])
+
+
+def test_quaternions():
+    """
+    Tests conversion between rotation matrices and quaternions
+    """
+    rvecs = np.array([[0.0, 0.0, 0.0], [np.pi, 0.0, 0.0],
+                      [0.0, np.pi, 0.0], [0.0, 0.0, np.pi],
+                      [0.1, -0.2, 0.3], [-2.0, 1.0, 0.5]])
+    rotations = rodrigues_to_matrices(rvecs)
+    quaternions = matrices_to_quaternions(rotations)
+    assert np.allclose(np.linalg.norm(quaternions, axis=1), 1.0)
+    assert np.all(quaternions[:, 0] >= 0.0)
+    assert np.allclose(quaternions[0], [1.0, 0.0, 0.0, 0.0])
+    assert np.allclose(quaternions[1], [0.0, 1.0, 0.0, 0.0])
+    assert np.allclose(quaternions_to_matrices(quaternions), rotations)
+
+
+def test_slerp_quaternions():
+    """
+    Tests spherical interpolation of quaternions
+    """
+    first = matrices_to_quaternions(rodrigues_to_matrices([[0.0, 0.0, 0.0],
+                                                           [0.0, 0.0, 0.0],
+                                                           [0.1, 0.2, 0.3]]))
+    second = matrices_to_quaternions(rodrigues_to_matrices([[0.0, 0.0, 1.0],
+                                                            [0.0, 3.0, 0.0],
+                                                            [0.1, 0.2, 0.3]]))
+    # the shorter arc is taken when the quaternions differ in sign
+    second[1] *= -1.0
+    halfway = slerp_quaternions(first, second, [0.5, 0.25, 0.5])
+    expected = rodrigues_to_matrices([[0.0, 0.0, 0.5], [0.0, 0.75, 0.0],
+                                      [0.1, 0.2, 0.3]])
+    assert np.allclose(quaternions_to_matrices(halfway), expected)
+    assert np.allclose(slerp_quaternions(first, second, [0.0, 0.0, 1.0])[0],
+                       first[0])
@@ -0,0 +1,38 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for the log bucket histogram"""
+
+import pytest
+import numpy as np
+from sksurgeryarucotracker.algorithms.histogram import LogHistogram
+
+
+def test_percentiles():
+    """
+    Tests percentiles are within the histogram's precision
+    """
+    with pytest.raises(ValueError):
+        LogHistogram(lowest=10.0, highest=1.0)
+    with pytest.raises(ValueError):
+        LogHistogram(precision=0.0)
+
+    histogram = LogHistogram(rows=2, lowest=1.0, highest=1e6, precision=0.01)
+    assert np.isnan(histogram.percentiles([50.0])).all()
+
+    values = np.random.default_rng(0).lognormal(5.0, 1.0, 10000)
+    for value in values:
+        histogram.record([value, 0.5])
+    histogram.record([1e9, 0.5])
+
+    result = histogram.percentiles([0.0, 50.0, 99.0, 100.0])
+    expected = np.percentile(np.append(values, 1e9), [50.0, 99.0])
+    assert np.allclose(result[0, 1:3], expected, rtol=0.011)
+    assert result[0, 0] >= values.min()
+    assert result[0, 3] >= 1e6
+    assert result[1].tolist() == [0.0, 0.0, 0.0, 0.0]
+
+    other = LogHistogram(rows=2, lowest=1.0, highest=1e6, precision=0.01)
+    other.add(histogram)
+    assert other.counts.sum() == 2 * 10001
+    histogram.reset()
+    assert np.isnan(histogram.percentiles([50.0])).all()
@@ -0,0 +1,52 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for the pose history"""
+
+import pytest
+import numpy as np
+from sksurgeryarucotracker.algorithms.history import PoseHistory
+from sksurgeryarucotracker.algorithms.geometry import rodrigues_to_matrices
+
+def _moving_pose(timestamp):
+    """
+    A tool moving along x and spinning about z.
+    """
+    tracking = np.eye(4)
+    tracking[0:3, 0:3] = rodrigues_to_matrices([0.0, 0.0, timestamp])[0]
+    tracking[0:3, 3] = [10.0 * timestamp, 0.0, 100.0]
+    return tracking[None]
+
+
+def test_interpolate():
+    """
+    Tests looking up poses between and outside the held frames
+    """
+    with pytest.raises(ValueError):
+        PoseHistory(length=1)
+
+    history = PoseHistory(length=4)
+    assert np.isnan(history.interpolate(3, [0.0])).all()
+    assert history.get_times(3).shape == (0,)
+
+    history.update([3], _moving_pose(0.0), 0.0)
+    poses = history.interpolate(3, [0.0, 0.1])
+    assert np.allclose(poses[0], _moving_pose(0.0)[0])
+    assert np.isnan(poses[1]).all()
+
+    for frame in range(1, 7):
+        history.update([3, 5], np.concatenate([_moving_pose(frame / 10.0),
+                                               np.eye(4)[None]]),
+                       frame / 10.0)
+    assert np.allclose(history.get_times(3), [0.3, 0.4, 0.5, 0.6])
+    assert np.allclose(history.get_times(5), [0.3, 0.4, 0.5, 0.6])
+
+    times = [0.2, 0.3, 0.35, 0.48, 0.6, 0.7]
+    poses = history.interpolate(3, times)
+    assert poses.shape == (6, 4, 4)
+    assert np.isnan(poses[[0, 5]]).all()
+    for index in range(1, 5):
+        assert np.allclose(poses[index], _moving_pose(times[index])[0])
+    assert np.allclose(history.interpolate(5, [0.45])[0], np.eye(4))
+
+    history.reset()
+    assert np.isnan(history.interpolate(3, [0.5])).all()
@@ -0,0 +1,47 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for latency statistics"""
+
+import pytest
+import numpy as np
+from sksurgeryarucotracker.latency import LatencyStatistics
+
+
+def test_rolling_statistics():
+    """
+    Tests percentiles, frame rate and dropped frames over rolling
+    windows
+    """
+    with pytest.raises(ValueError):
+        LatencyStatistics(window=0.0)
+    with pytest.raises(ValueError):
+        LatencyStatistics(expected_frame_rate=0.0)
+
+    statistics = LatencyStatistics(window=1.0, expected_frame_rate=10.0)
+    report = statistics.report()
+    assert report['frames'] == 0
+    assert report['frame rate'] == 0.0
+    assert np.isnan(report['detection']['p50'])
+
+    durations = np.array([1000000, 2000000, 0, 0, 0])
+    for frame in range(10):
+        statistics.record(durations, frame / 10.0)
+    statistics.record(durations * 3, 1.2)
+
+    report = statistics.report()
+    assert report['frames'] == 11
+    assert report['dropped frames'] == 2
+    assert report['frame rate'] == pytest.approx(10.0 / 1.2)
+    assert report['detection']['p50'] == pytest.approx(2e6, rel=0.011)
+    assert report['detection']['p99'] == pytest.approx(6e6, rel=0.011)
+    assert report['total']['p50'] == pytest.approx(3e6, rel=0.011)
+    assert report['display']['p95'] == 0.0
+
+    # the first window is forgotten once two more have started
+    statistics.record(durations, 2.3)
+    assert statistics.report()['frames'] == 2
+    statistics.record(durations, 10.0)
+    assert statistics.report()['frames'] == 1
+
+    statistics.reset()
+    assert statistics.report()['frames'] == 0
@@ -0,0 +1,54 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for the metrics exporter"""
+
+from urllib.request import urlopen
+from urllib.error import HTTPError
+import pytest
+import numpy as np
+from sksurgeryarucotracker.metrics import (format_metrics, MetricsExporter,
+                                           PREFIX)
+from sksurgeryarucotracker.latency import LatencyStatistics
+
+
+def test_format_metrics():
+    """
+    Tests counters and histograms in the Prometheus text format
+    """
+    text = format_metrics({"frames": 3, "markers visible": 2,
+                           "capture failures": 1})
+    assert "# TYPE {}frames_total counter\n".format(PREFIX) in text
+    assert "{}markers_visible 2\n".format(PREFIX) in text
+    assert "{}capture_failures_total 1\n".format(PREFIX) in text
+    assert "pose_cache" not in text
+    assert "stage_duration" not in text
+
+    statistics = LatencyStatistics(window=1.0)
+    for frame in range(30):
+        statistics.record(np.array([0, 3000000, 0, 0, 0]), frame / 10.0)
+    text = format_metrics({"frames": 30}, statistics)
+    name = PREFIX + "stage_duration_seconds"
+    assert '{}_bucket{{stage="detection",le="0.002"}} 0\n'.format(
+        name) in text
+    assert '{}_bucket{{stage="detection",le="0.005"}} 30\n'.format(
+        name) in text
+    assert '{}_bucket{{stage="capture",le="0.0005"}} 30\n'.format(
+        name) in text
+    assert '{}_count{{stage="total"}} 30\n'.format(name) in text
+    assert '{}_sum{{stage="detection"}} 0.09'.format(name) in text
+    assert "{}dropped_frames_total 0\n".format(PREFIX) in text
+
+
+def test_exporter():
+    """
+    Tests serving metrics over HTTP
+    """
+    exporter = MetricsExporter(lambda: "metric 1\n", port=0)
+    address = "http://127.0.0.1:{}".format(exporter.port)
+    with urlopen(address + "/metrics") as response:
+        assert response.read() == b"metric 1\n"
+        assert response.headers['Content-Type'].startswith('text/plain')
+    with pytest.raises(HTTPError):
+        with urlopen(address + "/other"):
+            pass
+    exporter.close()
@@ -0,0 +1,95 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for UDP pose streaming"""
+
+import pytest
+import numpy as np
+from sksurgeryarucotracker.network import (encode_frame, decode_frame,
+                                           PoseStreamServer,
+                                           PoseStreamClient, MAXIMUM_TOOLS,
+                                           HEADER_DTYPE, RECORD_DTYPE)
+from sksurgeryarucotracker.benchmarks.network import run_stream_benchmark
+
+
+def test_encode_and_decode():
+    """
+    Tests that frames survive packing into datagrams.
+    """
+    tracking = np.tile(np.eye(4), (3, 1, 1))
+    tracking[:, 0:3, 3] = [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0], [7.0, 8.0, 9.0]]
+    datagram = encode_frame(np.array([3, 1, 7]), 12.5, 42, tracking,
+                            np.array([1.0, 0.5, 0.25]))
+    assert len(datagram) == 32 + 3 * 56
+
+    port_handles, timestamp, frame_number, decoded, quality = \
+            decode_frame(datagram)
+    assert port_handles.tolist() == [3, 1, 7]
+    assert timestamp == 12.5
+    assert frame_number == 42
+    assert np.allclose(decoded, tracking)
+    assert quality.tolist() == [1.0, 0.5, 0.25]
+
+    port_handles, _, _, decoded, _ = decode_frame(
+        encode_frame([], 0.0, 0, np.empty((0, 4, 4)), []))
+    assert port_handles.shape == (0,)
+    assert decoded.shape == (0, 4, 4)
+
+    with pytest.raises(ValueError):
+        decode_frame(datagram[:10])
+    with pytest.raises(ValueError):
+        decode_frame(b'XXXX' + datagram[4:])
+    with pytest.raises(ValueError):
+        decode_frame(datagram[:-1])
+    with pytest.raises(ValueError):
+        count = MAXIMUM_TOOLS + 1
+        encode_frame(np.arange(count), 0.0, 0, np.zeros((count, 4, 4)),
+                     np.ones(count))
+
+
+def test_send_and_receive():
+    """
+    Tests sending frames to a client on localhost.
+    """
+    with pytest.raises(ValueError):
+        PoseStreamServer([])
+
+    client = PoseStreamClient(0, host='127.0.0.1', timeout=5.0)
+    server = PoseStreamServer([('127.0.0.1', client.port)])
+    for frame_number in range(3):
+        server.send([5], 1.0, frame_number, np.eye(4)[None], [1.0])
+        assert client.receive()[2] == frame_number
+    assert server.frames_sent == 3
+    assert server.send_failures == 0
+    server.close()
+    client.close()
+
+
+def test_send_failures():
+    """
+    Tests that bad destinations fail when the server is created, and
+    that failed sends are counted rather than raised.
+    """
+    with pytest.raises(OSError):
+        PoseStreamServer([('no-such-host.invalid', 9999)])
+
+    client = PoseStreamClient(0, host='127.0.0.1', timeout=5.0)
+    server = PoseStreamServer([('255.255.255.255', client.port),
+                               ('localhost', client.port)])
+    server.send([5], 1.0, 7, np.eye(4)[None], [1.0])
+    assert client.receive()[2] == 7
+    assert server.frames_sent == 1
+    assert server.send_failures == 1
+    server.close()
+    client.close()
+
+
+def test_stream_benchmark():
+    """
+    Tests the pose stream benchmark runs.
+    """
+    results = run_stream_benchmark(tool_count=4, frame_count=20)
+    assert results['frame count'] == 20
+    assert results['bytes per frame'] == (HEADER_DTYPE.itemsize +
+                                          4 * RECORD_DTYPE.itemsize)
+    assert results['frames per second'] > 0.0
+    assert results['latency p50 us'] <= results['latency p99 us']
@@ -0,0 +1,52 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for pose prediction"""
+
+import pytest
+import numpy as np
+from sksurgeryarucotracker.algorithms.prediction import \
+        ConstantVelocityPredictor
+from sksurgeryarucotracker.algorithms.geometry import rodrigues_to_matrices
+
+def _moving_poses(timestamp):
+    """
+    Two tools, one moving along x and spinning about z, one still.
+    """
+    tracking = np.tile(np.eye(4), (2, 1, 1))
+    tracking[0, 0:3, 0:3] = rodrigues_to_matrices([0.0, 0.0, timestamp])[0]
+    tracking[0, 0:3, 3] = [10.0 * timestamp, 0.0, 100.0]
+    tracking[1, 0:3, 3] = [0.0, 0.0, 50.0]
+    return tracking
+
+
+def test_constant_velocity():
+    """
+    Tests extrapolation of moving and still tools
+    """
+    with pytest.raises(ValueError):
+        ConstantVelocityPredictor(velocity_weight=0.0)
+    with pytest.raises(ValueError):
+        ConstantVelocityPredictor(maximum_interval=0.0)
+
+    predictor = ConstantVelocityPredictor(maximum_interval=0.1)
+    for frame in range(5):
+        predictor.update([7, 3], _moving_poses(frame / 30.0), frame / 30.0)
+
+    latest = 4.0 / 30.0
+    predicted = predictor.predict([3, 7, 11], latest + 0.04)
+    assert np.allclose(predicted[0], _moving_poses(0.0)[1])
+    assert np.allclose(predicted[1], _moving_poses(latest + 0.04)[0])
+    assert np.isnan(predicted[2]).all()
+
+    predicted = predictor.predict([7], latest + 10.0)
+    assert np.allclose(predicted[0], _moving_poses(latest + 0.1)[0])
+
+    predicted = predictor.predict([7], latest - 1.0)
+    assert np.allclose(predicted[0], _moving_poses(latest)[0])
+
+    predictor.update([7], _moving_poses(10.0)[0:1], 10.0)
+    predicted = predictor.predict([7], 10.05)
+    assert np.allclose(predicted[0], _moving_poses(10.0)[0])
+
+    predictor.reset()
+    assert np.isnan(predictor.predict([7], 10.05)).all()
@@ -0,0 +1,37 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for the frame profiler"""
+
+import pstats
+import pytest
+from sksurgeryarucotracker.profiling import FrameProfiler
+
+
+def _work(count):
+    """
+    Something to profile
+    """
+    return sum(range(count))
+
+
+def test_frame_profiler(tmp_path):
+    """
+    Tests profiling a number of calls into one file
+    """
+    path = str(tmp_path / 'frames.prof')
+    with pytest.raises(ValueError):
+        FrameProfiler(0, path)
+    with pytest.raises(ValueError):
+        FrameProfiler(1, None)
+
+    profiler = FrameProfiler(2, path)
+    assert profiler.run(_work, 10) == 45
+    assert not (tmp_path / 'frames.prof').exists()
+    with pytest.raises(ZeroDivisionError):
+        profiler.run(lambda: 1 / 0)
+    assert profiler.remaining == 0
+    with pytest.raises(ValueError):
+        profiler.run(_work, 10)
+
+    stats = pstats.Stats(path)
+    assert any(function[2] == '_work' for function in stats.stats)
@@ -0,0 +1,66 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for publishing frames"""
+
+from queue import Empty
+import threading
+import pytest
+from sksurgeryarucotracker.publish import Subscription, FramePublisher
+
+def test_subscription_drop_policy():
+    """
+    Tests the bounded queue drops the right frames
+    """
+    with pytest.raises(ValueError):
+        Subscription(maximum_size=0)
+    with pytest.raises(ValueError):
+        Subscription(drop_policy="random")
+
+    oldest = Subscription(maximum_size=2)
+    newest = Subscription(maximum_size=2, drop_policy="newest")
+    for frame in range(5):
+        oldest.put(frame)
+        newest.put(frame)
+    assert [oldest.get_nowait(), oldest.get_nowait()] == [3, 4]
+    assert [newest.get_nowait(), newest.get_nowait()] == [0, 1]
+    assert oldest.dropped == newest.dropped == 3
+    assert oldest.delivered == 2
+
+    with pytest.raises(Empty):
+        oldest.get(timeout=0.01)
+    oldest.close()
+    oldest.put(5)
+    with pytest.raises(Empty):
+        oldest.get()
+
+
+def test_slow_callback():
+    """
+    Tests that a slow callback does not block publishing, and that
+    failing callbacks are counted.
+    """
+    release = threading.Event()
+    received = []
+
+    def _slow(frame):
+        release.wait()
+        received.append(frame)
+
+    def _failing(_frame):
+        raise RuntimeError('callback failed')
+
+    publisher = FramePublisher()
+    assert not publisher.has_subscribers()
+    slow = publisher.subscribe(maximum_size=3, callback=_slow)
+    failing = publisher.subscribe(maximum_size=10, callback=_failing)
+    assert publisher.has_subscribers()
+
+    for frame in range(10):
+        publisher.publish(frame)
+    release.set()
+    publisher.close()
+
+    assert received[-3:] == [7, 8, 9]
+    assert slow.dropped + len(received) == 10
+    assert failing.callback_errors == 10
+    assert not publisher.has_subscribers()
@@ -0,0 +1,54 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for the binary tracking log"""
+
+import pytest
+import numpy as np
+from sksurgeryarucotracker.recording import (TrackingRecorder,
+                                             TrackingLogReader,
+                                             HEADER_SIZE, RECORD_DTYPE)
+
+
+def test_record_and_read(tmp_path):
+    """
+    Tests appending frames, growing the file and reading it back.
+    """
+    path = str(tmp_path / 'tracking.log')
+    with pytest.raises(ValueError):
+        TrackingRecorder(path, capacity=0)
+    with pytest.raises(ValueError):
+        TrackingRecorder(None)
+
+    recorder = TrackingRecorder(path, capacity=2)
+    reader = TrackingLogReader(path)
+    assert len(reader) == 0
+
+    for frame_number in range(3):
+        tracking = np.tile(np.eye(4), (2, 1, 1))
+        tracking[:, 0, 3] = frame_number
+        recorder.append([1, 4], 0.5 * frame_number, frame_number, tracking,
+                        [1.0, 0.5])
+    recorder.append([], 2.0, 3, np.empty((0, 4, 4)), [])
+    assert recorder.count == 6
+
+    reader.refresh()
+    assert len(reader) == 6
+    assert reader.port_handles.tolist() == [1, 4, 1, 4, 1, 4]
+    assert reader.frame_numbers.tolist() == [0, 0, 1, 1, 2, 2]
+    assert reader.time_stamps.tolist() == [0.0, 0.0, 0.5, 0.5, 1.0, 1.0]
+    assert reader.tracking_quality.tolist() == [1.0, 0.5] * 3
+    assert reader.tracking.shape == (6, 4, 4)
+    assert reader.get_tool(4)['tracking'][:, 0, 3].tolist() == [0, 1, 2]
+    reader.close()
+
+    recorder.close()
+    recorder.close()
+    with pytest.raises(ValueError):
+        recorder.append([1], 0.0, 0, np.eye(4)[None], [1.0])
+    assert (tmp_path / 'tracking.log').stat().st_size == \
+            HEADER_SIZE + 6 * RECORD_DTYPE.itemsize
+    assert len(TrackingLogReader(path)) == 6
+
+    (tmp_path / 'other.log').write_bytes(bytes(HEADER_SIZE))
+    with pytest.raises(ValueError):
+        TrackingLogReader(str(tmp_path / 'other.log'))
@@ -0,0 +1,75 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker performance regression gate"""
+
+import pytest
+from sksurgeryarucotracker.allocations import TRACING_SUPPORTED
+from sksurgeryarucotracker.benchmarks.regression import (
+    CASES, TOLERANCES, measure_case, compare, load_baseline, save_baseline)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_performance(name, performance_baseline, request):
+    """
+    Fails if throughput has dropped, or allocations per frame have
+    risen, beyond the tolerances in the baseline.
+    """
+    measured = measure_case(CASES[name])
+    if request.config.getoption("--update-baseline"):
+        performance_baseline["cases"][name] = measured
+        return
+    if name not in performance_baseline["cases"]:
+        pytest.skip("No baseline for {}, run with --update-baseline"
+                    .format(name))
+    failures = compare(name, performance_baseline["cases"][name], measured,
+                       performance_baseline["tolerances"])
+    assert not failures, "\n".join(failures)
+
+
+def test_compare_and_baselines(tmp_path):
+    """
+    Tests comparison against, and storage of, baselines
+    """
+    baseline = {"frames per second": 100.0,
+                "peak bytes per frame": 100000.0,
+                "retained blocks per frame": 0.0}
+    assert not compare("case", baseline, dict(baseline))
+    assert not compare("case", baseline,
+                       {"frames per second": 80.0,
+                        "peak bytes per frame": 120000.0,
+                        "retained blocks per frame": 0.5})
+    failures = compare("case", baseline,
+                       {"frames per second": 50.0,
+                        "peak bytes per frame": 200000.0,
+                        "retained blocks per frame": 2.0})
+    assert len(failures) == 3
+    assert failures[0].startswith("case: 50.0 frames per second")
+    assert not compare("case", baseline, {"frames per second": 100.0})
+    assert len(compare("case", baseline, dict(baseline),
+                       {"frames per second": 0.0,
+                        "peak bytes per frame": 0.0,
+                        "retained blocks per frame": 0.0})) == 0
+
+    path = str(tmp_path / 'baseline.json')
+    stored = load_baseline(path)
+    assert stored == {"tolerances": TOLERANCES, "cases": {}}
+    stored["cases"]["case"] = baseline
+    stored["tolerances"]["frames per second"] = 0.1
+    save_baseline(stored, path)
+    loaded = load_baseline(path)
+    assert loaded["cases"]["case"] == baseline
+    assert loaded["tolerances"]["frames per second"] == 0.1
+
+
+def test_measure_case():
+    """
+    Tests measuring a case
+    """
+    measured = measure_case(CASES["output.avi"], frame_count=3, warm_up=1)
+    assert measured["frames per second"] > 0.0
+    if not TRACING_SUPPORTED:
+        assert set(measured) == {"frames per second"}
+        return
+    assert measured["peak bytes per frame"] > 0.0
+    assert set(measured) == set(TOLERANCES)
@@ -0,0 +1,69 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for shared memory publication"""
+
+import multiprocessing
+import pytest
+import numpy as np
+
+pytest.importorskip('multiprocessing.shared_memory')
+
+# pylint: disable=wrong-import-position
+from sksurgeryarucotracker.sharedmemory import (SharedMemoryPublisher,
+                                                SharedMemoryReader)
+
+def _read_in_process(name, results):
+    """
+    Reads a frame from shared memory in another process
+    """
+    reader = SharedMemoryReader(name)
+    port_handles, timestamp, frame_number, _tracking, _quality = \
+            reader.read()
+    reader.close()
+    results.put((port_handles.tolist(), timestamp, frame_number))
+
+
+def test_publish_and_read():
+    """
+    Tests writing and reading frames, including from another process
+    """
+    with pytest.raises(ValueError):
+        SharedMemoryPublisher(capacity=0)
+
+    publisher = SharedMemoryPublisher(capacity=2)
+    reader = SharedMemoryReader(publisher.name)
+
+    port_handles, _, frame_number, tracking, _ = reader.read()
+    assert port_handles.shape == (0,)
+    assert tracking.shape == (0, 4, 4)
+    assert frame_number == -1
+
+    matrices = np.tile(np.eye(4), (3, 1, 1))
+    matrices[:, 0, 3] = [1.0, 2.0, 3.0]
+    publisher.publish(np.array([5, 7, 9]), 12.5, 3, matrices,
+                      np.array([0.1, 0.2, 0.3]))
+    assert publisher.dropped_tools == 1
+
+    port_handles, timestamp, frame_number, tracking, quality = reader.read()
+    assert port_handles.tolist() == [5, 7]
+    assert timestamp == 12.5
+    assert frame_number == 3
+    assert np.allclose(tracking, matrices[0:2])
+    assert np.allclose(quality, [0.1, 0.2])
+
+    with pytest.raises(TimeoutError):
+        publisher._header['sequence'] += 1 # pylint: disable=protected-access
+        reader.read(retries=10)
+    publisher._header['sequence'] += 1 # pylint: disable=protected-access
+
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_read_in_process,
+                                      args=(publisher.name, results))
+    process.start()
+    assert results.get(timeout=30) == ([5, 7], 12.5, 3)
+    process.join()
+
+    reader.close()
+    publisher.close()
+    with pytest.raises(FileNotFoundError):
+        SharedMemoryReader(publisher.name)
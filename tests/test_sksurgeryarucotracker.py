@@ -2,9 +2,23 @@
 
 """scikit-surgeryarucotracker tests"""
 
+import asyncio
+import os
+import pstats
+import tracemalloc
+from urllib.request import urlopen
+from queue import Empty
 import pytest
+import numpy as np
 from cv2 import VideoCapture
-from sksurgeryarucotracker.arucotracker import ArUcoTracker
+from cv2 import aruco
+from sksurgeryarucotracker.arucotracker import (
+    ArUcoTracker, FRAME_DTYPE, QUATERNION_FRAME_DTYPE,
+    _get_poses_without_calibration)
+from sksurgeryarucotracker.algorithms.geometry import quaternions_to_matrices
+from sksurgeryarucotracker.allocations import TRACING_SUPPORTED
+from sksurgeryarucotracker.network import PoseStreamClient
+from sksurgeryarucotracker.recording import TrackingLogReader
 
 def test_on_video_with_single_tag():
     """
@@ -215,3 +229,739 @@ def test_stop_tracking_throws():
         tracker.stop_tracking()
 
     tracker.close()
+
+
+def test_poses_without_calibration():
+    """
+    Tests that the uncalibrated poses are the marker centroids and
+    sizes, for all markers at once and into a provided buffer.
+    """
+    corners = (np.array([[[10.0, 20.0], [30.0, 20.0],
+                          [30.0, 40.0], [10.0, 40.0]]], dtype=np.float32),
+               np.array([[[0.0, 0.0], [3.0, 0.0],
+                          [3.0, 4.0], [0.0, 4.0]]], dtype=np.float32))
+
+    tracking = _get_poses_without_calibration(corners)
+    assert tracking.shape == (2, 4, 4)
+    assert np.allclose(tracking[0][0:3, 3], [20.0, 30.0, -np.sqrt(800.0)])
+    assert np.allclose(tracking[1][0:3, 3], [1.5, 2.0, -5.0])
+    assert np.allclose(tracking[1][0:3, 0:3], np.eye(3))
+
+    buffer = np.zeros((2, 4, 4), dtype=np.float32)
+    result = _get_poses_without_calibration(corners, out=buffer)
+    assert result is buffer
+    assert np.array_equal(buffer, tracking)
+
+    with pytest.raises(ValueError):
+        _get_poses_without_calibration(corners,
+                                       out=np.zeros((3, 4, 4),
+                                                    dtype=np.float32))
+
+
+def test_quality_with_calib():
+    """
+    Tests that the tracking quality is computed from the reprojection
+    error when the camera is calibrated.
+    """
+    config = {'video source' : 'data/output.avi',
+              'calibration' : 'data/calibration.txt',
+             }
+
+    tracker = ArUcoTracker(config)
+    tracker.start_tracking()
+    (port_handles, _timestamps, _framenumbers,
+     tracking, quality) = tracker.get_frame()
+
+    assert len(quality) == len(port_handles) == len(tracking) == 1
+    assert 0.0 < quality[0] <= 1.0
+    assert np.allclose(tracking[0][0:3, 0:3] @ tracking[0][0:3, 0:3].T,
+                       np.eye(3))
+
+    tracker.stop_tracking()
+    tracker.close()
+
+
+def test_pose_ambiguity_with_calib():
+    """
+    Tests that the rotation of a single marker does not flip between
+    the two planar pose candidates from frame to frame.
+    """
+    config = {'video source' : 'data/output.avi',
+              'calibration' : 'data/calibration.txt',
+              'ambiguity ratio' : 1e6,
+             }
+
+    tracker = ArUcoTracker(config)
+    tracker.start_tracking()
+    previous = None
+    for _ in range(10):
+        (_port_handles, _timestamps, _framenumbers,
+         tracking, _quality) = tracker.get_frame()
+        if previous is not None:
+            difference = previous[0:3, 0:3].T @ tracking[0][0:3, 0:3]
+            assert np.trace(difference) > 2.5
+        previous = tracking[0]
+
+    tracker.stop_tracking()
+    tracker.close()
+
+
+def test_smoothing_with_calib():
+    """
+    Tests that smoothing runs, and that a low cutoff frequency reduces
+    the frame to frame movement of the marker.
+    """
+    movements = []
+    for smoothing in [None, {'min cutoff' : 0.1}]:
+        config = {'video source' : 'data/output.avi',
+                  'calibration' : 'data/calibration.txt',
+                  'smoothing' : smoothing,
+                 }
+        tracker = ArUcoTracker(config)
+        tracker.start_tracking()
+        positions = []
+        for _ in range(10):
+            (_port_handles, _timestamps, _framenumbers,
+             tracking, _quality) = tracker.get_frame()
+            positions.append(tracking[0][0:3, 3])
+            assert np.allclose(tracking[0][0:3, 0:3] @
+                               tracking[0][0:3, 0:3].T, np.eye(3))
+        movements.append(np.sum(np.linalg.norm(np.diff(positions, axis=0),
+                                               axis=1)))
+        tracker.stop_tracking()
+        tracker.close()
+
+    assert movements[1] < movements[0]
+
+
+def test_predicted_frame_with_calib():
+    """
+    Tests that poses can be predicted ahead of the latest frame.
+    """
+    config = {'video source' : 'data/output.avi',
+              'calibration' : 'data/calibration.txt',
+             }
+    tracker = ArUcoTracker(config)
+    tracker.start_tracking()
+    with pytest.raises(ValueError):
+        tracker.get_predicted_frame(0.0)
+    tracker.stop_tracking()
+    tracker.close()
+
+    config['prediction'] = {'maximum interval' : 0.5}
+    tracker = ArUcoTracker(config)
+    tracker.start_tracking()
+    (port_handles, _timestamps, _framenumbers,
+     tracking, _quality) = tracker.get_predicted_frame(0.0)
+    assert not port_handles
+    assert tracking is None
+
+    for _ in range(3):
+        (port_handles, timestamps, framenumbers,
+         tracking, quality) = tracker.get_frame()
+
+    predicted = tracker.get_predicted_frame(timestamps[0])
+    assert predicted[0] == port_handles
+    assert predicted[2] == framenumbers
+    assert predicted[4] == quality
+    assert np.allclose(predicted[3][0], tracking[0])
+
+    predicted = tracker.get_predicted_frame(timestamps[0] + 0.04)
+    assert predicted[1] == [timestamps[0] + 0.04]
+    assert not np.allclose(predicted[3][0], tracking[0])
+
+    tracker.stop_tracking()
+    tracker.close()
+
+
+def test_quaternions_with_calib():
+    """
+    Tests that tracking can be returned as positions and quaternions
+    """
+    config = {'video source' : 'data/output.avi',
+              'calibration' : 'data/calibration.txt',
+             }
+    tracker = ArUcoTracker(config)
+    tracker.start_tracking()
+    (_port_handles, _timestamps, _framenumbers,
+     matrices, _quality) = tracker.get_frame()
+    tracker.stop_tracking()
+    tracker.close()
+
+    config['use quaternions'] = True
+    tracker = ArUcoTracker(config)
+    tracker.start_tracking()
+    (_port_handles, _timestamps, _framenumbers,
+     tracking, _quality) = tracker.get_frame()
+    tracker.stop_tracking()
+    tracker.close()
+
+    assert tracking.shape == (1, 7)
+    assert np.allclose(tracking[0, 0:3], matrices[0][0:3, 3])
+    assert np.isclose(np.linalg.norm(tracking[0, 3:7]), 1.0)
+    assert np.allclose(quaternions_to_matrices(tracking[:, 3:7])[0],
+                       matrices[0][0:3, 0:3])
+
+
+def test_pose_cache_with_calib():
+    """
+    Tests that poses are reused when the marker corners do not move.
+    """
+    config = {'video source' : 'none',
+              'calibration' : 'data/calibration.txt',
+             }
+    tracker = ArUcoTracker(config)
+    with pytest.raises(ValueError):
+        tracker.get_pose_cache_statistics()
+    tracker.close()
+
+    config['pose cache tolerance'] = 0.01
+    tracker = ArUcoTracker(config)
+    tracker.start_tracking()
+    capture = VideoCapture('data/output.avi')
+    _, first = capture.read()
+    _, second = capture.read()
+
+    first_frame = tracker.get_frame(first)
+    assert tracker.get_pose_cache_statistics() == {'hits' : 0, 'misses' : 1}
+    repeated_frame = tracker.get_frame(first)
+    assert tracker.get_pose_cache_statistics() == {'hits' : 1, 'misses' : 1}
+    assert np.array_equal(first_frame[3][0], repeated_frame[3][0])
+    assert first_frame[4] == repeated_frame[4]
+
+    tracker.get_frame(second)
+    assert tracker.get_pose_cache_statistics() == {'hits' : 1, 'misses' : 2}
+
+    tracker.stop_tracking()
+    tracker.close()
+
+
+def test_get_frame_array():
+    """
+    Tests that a frame can be returned as a structured array, matching
+    the lists returned by get_frame.
+    """
+    capture = VideoCapture('data/12markers.avi')
+    _, frame = capture.read()
+    blank = np.zeros_like(frame)
+
+    for use_quaternions in [False, True]:
+        config = {'video source' : 'none',
+                  'aruco dictionary' : 'DICT_6X6_250',
+                  'calibration' : 'data/calibration.txt',
+                  'use quaternions' : use_quaternions,
+                 }
+        tracker = ArUcoTracker(config)
+        tracker.start_tracking()
+
+        (port_handles, timestamps, framenumbers,
+         tracking, quality) = tracker.get_frame(frame)
+        result = tracker.get_frame_array(frame)
+
+        if use_quaternions:
+            assert result.dtype == QUATERNION_FRAME_DTYPE
+        else:
+            assert result.dtype == FRAME_DTYPE
+        assert result.shape == (12,)
+        assert result['port_handle'].tolist() == port_handles
+        assert np.all(result['time_stamp'] >= timestamps[0])
+        assert np.all(result['frame_number'] == framenumbers[0] + 1)
+        assert np.allclose(result['tracking'], np.array(tracking))
+        assert np.allclose(result['tracking_quality'], quality)
+
+        assert tracker.get_frame_array(blank).shape == (0,)
+        tracker.stop_tracking()
+        tracker.close()
+
+
+def test_get_frame_slots():
+    """
+    Tests that frames are written into fixed slots for registered
+    port handles, with missing tools marked as not visible.
+    """
+    capture = VideoCapture('data/12markers.avi')
+    _, frame = capture.read()
+    blank = np.zeros_like(frame)
+
+    config = {'video source' : 'none',
+              'aruco dictionary' : 'DICT_6X6_250',
+             }
+    tracker = ArUcoTracker(config)
+    tracker.start_tracking()
+    with pytest.raises(ValueError):
+        tracker.get_frame_slots(frame)
+    with pytest.raises(ValueError):
+        tracker.register_port_handles([1, 1])
+
+    (port_handles, _timestamps, _framenumbers,
+     tracking, quality) = tracker.get_frame(frame)
+    expected = [port_handles[3], 249, port_handles[0]]
+    tracker.register_port_handles(expected)
+
+    slots = tracker.get_frame_slots(frame)
+    assert slots.port_handles.tolist() == expected
+    assert slots.visible.tolist() == [True, False, True]
+    assert np.allclose(slots.tracking[0], tracking[3])
+    assert np.allclose(slots.tracking[2], tracking[0])
+    assert np.isnan(slots.tracking[1]).all()
+    assert np.allclose(slots.tracking_quality, [quality[3], 0.0, quality[0]])
+    assert np.all(slots.frame_numbers == 1)
+
+    tracking_buffer = slots.tracking
+    slots = tracker.get_frame_slots(blank)
+    assert slots.tracking is tracking_buffer
+    assert not slots.visible.any()
+    assert np.all(slots.frame_numbers == 2)
+
+    tracker.stop_tracking()
+    tracker.close()
+
+    config['port handles'] = expected
+    config['use quaternions'] = True
+    tracker = ArUcoTracker(config)
+    tracker.start_tracking()
+    slots = tracker.get_frame_slots(frame)
+    assert slots.tracking.shape == (3, 7)
+    assert slots.visible.tolist() == [True, False, True]
+    tracker.stop_tracking()
+    tracker.close()
+
+
+def test_iter_frames():
+    """
+    Tests lazy iteration over frames, with the tracker as a context
+    manager.
+    """
+    config = {'video source' : 'data/output.avi'}
+    with ArUcoTracker(config) as tracker:
+        frames = list(tracker.iter_frames())
+        assert len(frames) == 10
+        assert [frame[2][0] for frame in frames] == list(range(10))
+        assert tracker.get_counters()['capture failures'] == 1
+    with pytest.raises(ValueError):
+        tracker.start_tracking()
+
+    with ArUcoTracker(config) as tracker:
+        frames = list(tracker.iter_frames(decimation=3, limit=2))
+        assert len(frames) == 2
+        assert [frame[2][0] for frame in frames] == [0, 1]
+        frame = tracker.get_frame()
+        assert frame[2][0] == 2
+
+    with ArUcoTracker(config) as tracker:
+        frames = list(tracker.iter_frames(port_handles=[7], limit=3))
+        assert len(frames) == 3
+        assert all(frame == ([], [], [], None, []) for frame in frames)
+        tracker.stop_tracking()
+        with pytest.raises(ValueError):
+            next(tracker.iter_frames())
+
+    config = {'video source' : 'none'}
+    capture = VideoCapture('data/output.avi')
+    images = [capture.read()[1] for _ in range(4)]
+    with ArUcoTracker(config) as tracker:
+        with pytest.raises(ValueError):
+            tracker.iter_frames()
+        frames = list(tracker.iter_frames(images, decimation=2))
+        assert len(frames) == 2
+        assert frames[0][0] == [0]
+
+
+def test_async_frames():
+    """
+    Tests getting frames from asyncio without blocking other coroutines.
+    """
+    ticks = []
+
+    async def _ticker():
+        for _ in range(5):
+            ticks.append(len(ticks))
+            await asyncio.sleep(0)
+
+    async def _track():
+        config = {'video source' : 'data/output.avi'}
+        with ArUcoTracker(config) as tracker:
+            first, _ = await asyncio.gather(tracker.get_frame_async(),
+                                            _ticker())
+            frames = [frame async for frame in tracker.aiter_frames()]
+        return first, frames
+
+    first, frames = asyncio.run(_track())
+    assert first[0] == [0]
+    assert first[2] == [0]
+    assert len(frames) == 9
+    assert frames[-1][2] == [9]
+    assert len(ticks) == 5
+
+    async def _not_tracking():
+        config = {'video source' : 'data/output.avi'}
+        tracker = ArUcoTracker(config)
+        try:
+            await tracker.get_frame_async()
+        finally:
+            tracker.close()
+
+    with pytest.raises(ValueError):
+        asyncio.run(_not_tracking())
+
+
+def test_subscribers():
+    """
+    Tests that every frame is given to each subscriber, with slow
+    subscribers dropping frames rather than slowing the tracker.
+    """
+    received = []
+    config = {'video source' : 'data/output.avi'}
+    with ArUcoTracker(config) as tracker:
+        latest = tracker.subscribe()
+        everything = tracker.subscribe(maximum_size=20)
+        first_only = tracker.subscribe(maximum_size=1, drop_policy="newest")
+        callback = tracker.subscribe(maximum_size=20,
+                                     callback=received.append)
+        unsubscribed = tracker.subscribe(maximum_size=20)
+        tracker.unsubscribe(unsubscribed)
+
+        frames = list(tracker.iter_frames())
+
+        assert latest.get_nowait()[2] == [9]
+        assert latest.dropped == 9
+        assert ([everything.get(timeout=1.0)[2] for _ in range(10)] ==
+                [frame[2] for frame in frames])
+        assert first_only.get_nowait()[2] == [0]
+        assert unsubscribed.qsize() == 0
+        with pytest.raises(Empty):
+            latest.get_nowait()
+
+    assert [frame[2] for frame in received] == [frame[2] for frame in frames]
+    assert callback.callback_errors == 0
+    with pytest.raises(ValueError):
+        tracker.unsubscribe(unsubscribed)
+
+
+def test_shared_memory():
+    """
+    Tests that frames are published to shared memory.
+    """
+    sharedmemory = pytest.importorskip('sksurgeryarucotracker.sharedmemory')
+    config = {'video source' : 'data/12markers.avi',
+              'aruco dictionary' : 'DICT_6X6_250'}
+    with ArUcoTracker(config) as tracker:
+        with pytest.raises(ValueError):
+            tracker.get_shared_memory_name()
+
+    config['shared memory'] = {'capacity' : 16}
+    with ArUcoTracker(config) as tracker:
+        reader_name = tracker.get_shared_memory_name()
+        reader = sharedmemory.SharedMemoryReader(reader_name)
+        assert reader.read()[2] == -1
+
+        frame = tracker.get_frame_array()
+        (port_handles, timestamp, frame_number,
+         tracking, quality) = reader.read()
+        reader.close()
+
+    assert np.array_equal(port_handles, frame['port_handle'])
+    assert timestamp == frame['time_stamp'][0]
+    assert frame_number == 0
+    assert np.allclose(tracking, frame['tracking'])
+    assert np.allclose(quality, frame['tracking_quality'])
+
+    config['shared memory'] = {'name' : reader_name}
+    config['video source'] = 'data/missing.avi'
+    with pytest.raises(OSError):
+        ArUcoTracker(config)
+    with pytest.raises(FileNotFoundError):
+        sharedmemory.SharedMemoryReader(reader_name)
+
+    config['video source'] = 'data/12markers.avi'
+    config['pose stream'] = {}
+    with pytest.raises(ValueError):
+        ArUcoTracker(config)
+    with pytest.raises(FileNotFoundError):
+        sharedmemory.SharedMemoryReader(reader_name)
+
+
+def test_pose_stream():
+    """
+    Tests that frames are streamed over UDP.
+    """
+    client = PoseStreamClient(0, host='127.0.0.1', timeout=5.0)
+    config = {'video source' : 'data/12markers.avi',
+              'aruco dictionary' : 'DICT_6X6_250',
+              'pose stream' : {'destinations' : [('127.0.0.1',
+                                                  client.port)]}}
+    with ArUcoTracker(config) as tracker:
+        frame = tracker.get_frame_array()
+        (port_handles, timestamp, frame_number,
+         tracking, quality) = client.receive()
+        assert tracker.get_counters()['pose stream failures'] == 0
+    client.close()
+
+    assert np.array_equal(port_handles, frame['port_handle'])
+    assert timestamp == frame['time_stamp'][0]
+    assert frame_number == 0
+    assert np.allclose(tracking, frame['tracking'], atol=1e-3)
+    assert np.allclose(quality, frame['tracking_quality'])
+
+    with pytest.raises(ValueError):
+        config['pose stream'] = {}
+        ArUcoTracker(config)
+
+
+def test_recording(tmp_path):
+    """
+    Tests that frames are appended to a tracking log.
+    """
+    path = str(tmp_path / 'tracking.log')
+    config = {'video source' : 'data/output.avi',
+              'recording' : {'path' : path, 'capacity' : 4}}
+    frames = []
+    with ArUcoTracker(config) as tracker:
+        for _ in range(5):
+            frames.append(tracker.get_frame_array())
+
+    frames = np.concatenate(frames)
+    reader = TrackingLogReader(path)
+    assert np.array_equal(reader.port_handles, frames['port_handle'])
+    assert np.array_equal(reader.frame_numbers, frames['frame_number'])
+    assert np.array_equal(reader.time_stamps, frames['time_stamp'])
+    assert np.allclose(reader.tracking, frames['tracking'])
+    assert np.allclose(reader.tracking_quality, frames['tracking_quality'])
+    reader.close()
+
+    size = os.path.getsize(path)
+    config['pose stream'] = {}
+    with pytest.raises(ValueError):
+        ArUcoTracker(config)
+    config['video source'] = 'data/missing.avi'
+    with pytest.raises(OSError):
+        ArUcoTracker(config)
+    assert os.path.getsize(path) == size
+
+
+def test_interpolated_poses():
+    """
+    Tests getting poses at times between frames.
+    """
+    config = {'video source' : 'data/output.avi'}
+    with ArUcoTracker(config) as tracker:
+        with pytest.raises(ValueError):
+            tracker.get_interpolated_poses(0, [0.0])
+
+    config['pose history'] = {'length' : 8}
+    with ArUcoTracker(config) as tracker:
+        first = tracker.get_frame()
+        second = tracker.get_frame()
+        times = [first[1][0], second[1][0], second[1][0] + 1.0]
+        tracking = tracker.get_interpolated_poses(first[0][0], times)
+
+    assert len(tracking) == 3
+    assert np.allclose(tracking[0], first[3][0])
+    assert np.allclose(tracking[1], second[3][0])
+    assert np.isnan(tracking[2]).all()
+
+
+def test_stage_timing():
+    """
+    Tests timing the stages of each frame.
+    """
+    config = {'video source' : 'data/output.avi'}
+    with ArUcoTracker(config) as tracker:
+        with pytest.raises(ValueError):
+            tracker.diagnostics.get_stage_timings()
+        with pytest.raises(ValueError):
+            tracker.diagnostics.get_frame_timing()
+
+    config['stage timing'] = {'length' : 4}
+    with ArUcoTracker(config) as tracker:
+        assert not tracker.diagnostics.get_frame_timing()
+        for _ in range(6):
+            tracker.get_frame()
+        timings = tracker.diagnostics.get_frame_timing()
+        frame_numbers, durations = tracker.diagnostics.get_stage_timings()
+
+    assert timings['capture'] > 0
+    assert timings['detection'] > 0
+    assert frame_numbers.tolist() == [2, 3, 4, 5]
+    assert durations.shape == (4, 5)
+    assert (durations >= 0).all()
+
+    with ArUcoTracker(config) as tracker:
+        frames = list(tracker.iter_frames(decimation=2))
+        frame_numbers, durations = tracker.diagnostics.get_stage_timings()
+    assert len(frames) == 5
+    assert frame_numbers.tolist() == [1, 2, 3, 4]
+    assert (durations[:, 0] > 0).all()
+
+
+def test_latency_statistics():
+    """
+    Tests rolling latency statistics.
+    """
+    config = {'video source' : 'data/output.avi'}
+    with ArUcoTracker(config) as tracker:
+        with pytest.raises(ValueError):
+            tracker.diagnostics.get_latency_statistics()
+        with pytest.raises(ValueError):
+            tracker.diagnostics.reset_latency_statistics()
+
+    config['latency statistics'] = {'window' : 60.0}
+    with ArUcoTracker(config) as tracker:
+        for _ in range(5):
+            tracker.get_frame()
+        report = tracker.diagnostics.get_latency_statistics()
+        assert len(tracker.diagnostics.get_stage_timings()[0]) == 5
+        tracker.diagnostics.reset_latency_statistics()
+        assert tracker.diagnostics.get_latency_statistics()['frames'] == 0
+
+    assert report['frames'] == 5
+    assert report['frame rate'] > 0.0
+    assert report['dropped frames'] == 0
+    assert report['detection']['p50'] > 0.0
+    assert report['total']['p99'] >= report['total']['p50']
+
+
+def test_metrics():
+    """
+    Tests the tracker's counters and metrics endpoint.
+    """
+    config = {'video source' : 'data/output.avi'}
+    with ArUcoTracker(config) as tracker:
+        with pytest.raises(ValueError):
+            tracker.diagnostics.get_metrics_port()
+
+    config['metrics'] = {'port' : 0}
+    config['latency statistics'] = {}
+    config['pose cache tolerance'] = 0.5
+    with ArUcoTracker(config) as tracker:
+        for _ in range(10):
+            tracker.get_frame()
+        with pytest.raises(ValueError):
+            tracker.get_frame()
+        counters = tracker.get_counters()
+        with urlopen('http://127.0.0.1:{}/metrics'.format(
+                tracker.diagnostics.get_metrics_port())) as response:
+            text = response.read().decode('utf-8')
+
+    assert counters['frames'] == 10
+    assert counters['markers visible'] == 1
+    assert counters['capture failures'] == 1
+    assert 'pose cache misses' in counters
+    assert 'sksurgeryarucotracker_frames_total 10\n' in text
+    assert 'sksurgeryarucotracker_capture_failures_total 1\n' in text
+    assert 'stage_duration_seconds_count{stage="detection"} 10\n' in text
+
+
+def test_profile_frames(tmp_path):
+    """
+    Tests profiling frames of a running tracker.
+    """
+    path = str(tmp_path / 'frames.prof')
+    config = {'video source' : 'data/output.avi'}
+    with ArUcoTracker(config) as tracker:
+        tracker.get_frame()
+        with pytest.raises(ValueError):
+            tracker.diagnostics.profile_frames(0, path)
+        tracker.diagnostics.profile_frames(2, path)
+        tracker.get_frame_array()
+        assert not (tmp_path / 'frames.prof').exists()
+        tracker.get_frame()
+        stats = pstats.Stats(path)
+        tracker.get_frame()
+
+    functions = [function[2] for function in stats.stats]
+    assert '_track_image' in functions
+    assert stats.total_calls > 0
+
+    config['profile'] = {'frames' : 100,
+                         'path' : str(tmp_path / 'start.prof')}
+    with ArUcoTracker(config) as tracker:
+        tracker.get_frame()
+    stats = pstats.Stats(str(tmp_path / 'start.prof'))
+    assert '_track_image' in [function[2] for function in stats.stats]
+
+    path = str(tmp_path / 'streamed.prof')
+    del config['profile']
+    with ArUcoTracker(config) as tracker:
+        tracker.diagnostics.profile_frames(3, path)
+        frames = list(tracker.iter_frames(limit=3))
+        stats = pstats.Stats(path)
+    assert len(frames) == 3
+    assert '_track_image' in [function[2] for function in stats.stats]
+
+
+def test_allocation_tracing():
+    """
+    Tests measuring the memory allocated by each frame.
+    """
+    config = {'video source' : 'data/output.avi'}
+    with ArUcoTracker(config) as tracker:
+        tracker.get_frame()
+        with pytest.raises(ValueError):
+            tracker.diagnostics.get_allocation_report()
+
+    config['allocation tracing'] = {'top' : 5, 'interval' : 2}
+    if not TRACING_SUPPORTED:
+        with pytest.raises(ImportError):
+            ArUcoTracker(config)
+        return
+
+    with ArUcoTracker(config) as tracker:
+        for _ in range(5):
+            tracker.get_frame()
+        report = tracker.diagnostics.get_allocation_report()
+        with ArUcoTracker(config) as other:
+            other.get_frame()
+        tracker.get_frame()
+        assert tracker.diagnostics.get_allocation_report()['calls'] == 6
+    assert not tracemalloc.is_tracing()
+
+    assert report['calls'] == 5
+    assert report['peak bytes per call'] > 0
+    assert report['latest']['peak bytes'] > 0
+    assert 'net blocks' in report['latest']
+    assert 0 < len(report['largest sites']) <= 5
+    assert len(report['growth sites']) <= 5
+
+    async def _stream(tracker):
+        return [frame async for frame in tracker.aiter_frames(limit=3)]
+
+    with ArUcoTracker(config) as tracker:
+        frames = list(tracker.iter_frames(limit=4))
+        assert tracker.diagnostics.get_allocation_report()['calls'] == 4
+        frames += asyncio.run(_stream(tracker))
+        assert tracker.diagnostics.get_allocation_report()['calls'] == 7
+    assert len(frames) == 7
+
+    config['video source'] = 'data/missing.avi'
+    with pytest.raises(OSError):
+        ArUcoTracker(config)
+    assert not tracemalloc.is_tracing()
+
+
+def test_repeated_marker_id():
+    """
+    Tests that only the first detection of a repeated marker id is
+    tracked, and given to the filters, predictor, history and cache.
+    """
+    marker = aruco.drawMarker(aruco.getPredefinedDictionary(
+        aruco.DICT_4X4_50), 5, 120)
+    image = np.full((480, 640), 255, dtype=np.uint8)
+    image[100:220, 100:220] = marker
+    image[250:370, 400:520] = marker
+    image = np.dstack([image] * 3)
+
+    config = {'video source' : 'none',
+              'calibration' : 'data/calibration.txt',
+              'smoothing' : {},
+              'prediction' : {},
+              'pose history' : {},
+              'pose cache tolerance' : 0.5}
+    with ArUcoTracker(config) as tracker:
+        for _ in range(2):
+            frame = tracker.get_frame_array(image)
+            assert frame['port_handle'].tolist() == [5]
+        times = [frame['time_stamp'][0]]
+        assert np.allclose(tracker.get_interpolated_poses(5, times)[0],
+                           frame['tracking'][0])
+        assert tracker.get_pose_cache_statistics()['hits'] == 1
@@ -0,0 +1,68 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for the soak test"""
+
+import json
+import sys
+import pytest
+from sksurgeryarucotracker.allocations import TRACING_SUPPORTED
+from sksurgeryarucotracker.benchmarks import soak
+from sksurgeryarucotracker.benchmarks.soak import (
+    resident_bytes, growth_per_hour, run_soak, main)
+
+
+def test_resident_bytes():
+    """
+    Tests measuring resident memory
+    """
+    resident = resident_bytes()
+    if resident is None:
+        pytest.skip("No way to measure resident memory here")
+    assert resident > 0
+
+
+def test_without_resident_bytes(monkeypatch):
+    """
+    Tests that without /proc, psutil or resource, resident memory is
+    reported as unavailable and the soak test still passes
+    """
+    monkeypatch.setattr(soak, '_STATM', 'no/such/statm')
+    monkeypatch.setitem(sys.modules, 'psutil', None)
+    monkeypatch.setitem(sys.modules, 'resource', None)
+    assert resident_bytes() is None
+    assert main(['--duration', '0.1', '--interval', '0.05']) == 0
+
+
+def test_growth_per_hour():
+    """
+    Tests fitting memory growth after the first quarter of a run
+    """
+    assert growth_per_hour([]) is None
+    assert growth_per_hour([{"seconds": 0.0, "resident bytes": None}]) is None
+    assert growth_per_hour([{"seconds": 0.0, "resident bytes": 10}]) == 0.0
+    samples = [{"seconds": 0.0, "resident bytes": 0},
+               {"seconds": 1.0, "resident bytes": 5000}]
+    samples += [{"seconds": float(second), "resident bytes": 5000 + second}
+                for second in range(2, 9)]
+    assert growth_per_hour(samples) == pytest.approx(3600.0)
+
+
+def test_run_soak(tmp_path):
+    """
+    Tests a short soak run, looping a short video
+    """
+    with pytest.raises(OSError):
+        run_soak('data/missing.avi', 'DICT_4X4_50', 0.1)
+
+    result = run_soak('data/output.avi', 'DICT_4X4_50', 0.5, 0.1,
+                      allocation_tracing=TRACING_SUPPORTED)
+    assert result["frames"] > 10
+    assert len(result["samples"]) >= 2
+    if TRACING_SUPPORTED:
+        assert result["allocation report"]["calls"] == result["frames"]
+
+    output = tmp_path / 'soak.json'
+    assert main(['--duration', '0.2', '--interval', '0.05',
+                 '--limit', '1e9', '--output', str(output)]) == 0
+    with open(output, 'r', encoding='utf-8') as source:
+        assert json.load(source)["frames"] > 0
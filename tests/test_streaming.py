@@ -0,0 +1,71 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for the streaming stages"""
+
+import pytest
+import numpy as np
+from cv2 import VideoCapture
+from sksurgeryarucotracker import streaming, timing
+
+def test_capture_images():
+    """
+    Tests reading and decimating images from a video
+    """
+    capture = VideoCapture('data/output.avi')
+    assert len(list(streaming.capture_images(capture))) == 10
+    capture = VideoCapture('data/output.avi')
+    assert len(list(streaming.capture_images(capture, 4))) == 3
+
+    capture = VideoCapture('data/output.avi')
+    timer = timing.StageTimer()
+    for _ in streaming.capture_images(capture, 4, timer):
+        timer.stop(0)
+    assert timer.count == 3
+    failures = []
+    capture = VideoCapture('data/output.avi')
+    assert len(list(streaming.capture_images(
+        capture, 3, on_failure=lambda: failures.append(1)))) == 4
+    assert failures == [1]
+    assert (timer.get_timings()[1][:, timing.CAPTURE] > 0).all()
+
+    with pytest.raises(ValueError):
+        list(streaming.capture_images(capture, 0))
+
+
+def test_decimate_and_limit():
+    """
+    Tests the decimation and limit stages are lazy
+    """
+    pulled = []
+    def _source():
+        for item in range(100):
+            pulled.append(item)
+            yield item
+
+    items = list(streaming.limit(streaming.decimate(_source(), 10), 3))
+    assert items == [0, 10, 20]
+    assert len(pulled) == 21
+
+    with pytest.raises(ValueError):
+        streaming.decimate([], 1.5)
+
+
+def test_select_port_handles():
+    """
+    Tests removing unwanted tools from frames
+    """
+    matrices = [np.eye(4) * index for index in range(3)]
+    frames = [([4, 2, 9], [1.0, 1.0, 1.0], [5, 5, 5], matrices,
+               [0.1, 0.2, 0.3]),
+              ([4, 2], [2.0, 2.0], [6, 6], np.arange(14).reshape(2, 7),
+               [0.4, 0.5]),
+              ([1], [3.0], [7], [np.eye(4)], [0.6])]
+
+    selected = list(streaming.select_port_handles(frames, [9, 4]))
+    assert selected[0][0] == [4, 9]
+    assert selected[0][1] == [1.0, 1.0]
+    assert selected[0][2] == [5, 5]
+    assert np.array_equal(selected[0][3][1], matrices[2])
+    assert selected[0][4] == [0.1, 0.3]
+    assert np.array_equal(selected[1][3], np.arange(7).reshape(1, 7))
+    assert selected[2] == ([], [], [], None, [])
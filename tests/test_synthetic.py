@@ -0,0 +1,79 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for synthetic marker scenes"""
+
+import pytest
+import numpy as np
+from sksurgeryarucotracker.synthetic import SyntheticScene
+from sksurgeryarucotracker.arucotracker import ArUcoTracker
+
+
+def _tracker(scene):
+    """
+    A calibrated tracker matching a scene
+    """
+    tracker = ArUcoTracker({'video source' : 'none',
+                            'aruco dictionary' : 'DICT_4X4_1000',
+                            'camera projection' : scene.camera_projection,
+                            'camera distortion' : scene.camera_distortion,
+                            'marker size' : scene.marker_size})
+    tracker.start_tracking()
+    return tracker
+
+
+def test_ground_truth():
+    """
+    Tests that markers are detected near their ground truth poses,
+    with and without distortion
+    """
+    for distortion in (None, [0.1, 0.0, 0.0, 0.0, 0.0]):
+        config = {'marker count' : 12, 'motion' : 0.2}
+        if distortion is not None:
+            config['camera distortion'] = distortion
+        scene = SyntheticScene(config)
+        tracker = _tracker(scene)
+        for image, poses in scene.frames(3):
+            assert image.shape == (480, 640, 3)
+            frame = tracker.get_frame_array(image)
+            assert sorted(frame['port_handle']) == list(range(12))
+            expected = poses[frame['port_handle']]
+            depth = expected[:, 2, 3]
+            errors = np.linalg.norm(frame['tracking'][:, 0:3, 3] -
+                                    expected[:, 0:3, 3], axis=1)
+            assert (errors < 0.05 * depth).all()
+            assert np.allclose(frame['tracking'][:, 0:3, 2],
+                               expected[:, 0:3, 2], atol=0.2)
+        tracker.close()
+
+    assert not np.allclose(scene.poses(0), scene.poses(10))
+    assert np.allclose(scene.poses(0), scene.poses(100))
+
+
+def test_many_markers_and_noise():
+    """
+    Tests hundreds of markers at a high resolution, and blur and noise
+    """
+    scene = SyntheticScene({'marker count' : 200,
+                            'resolution' : (1920, 1080),
+                            'maximum tilt' : 10.0})
+    tracker = _tracker(scene)
+    frame = tracker.get_frame_array(scene.render(0))
+    assert len(frame) > 190
+    tracker.close()
+
+    scene = SyntheticScene({'marker count' : 2, 'blur' : 1.0, 'noise' : 5.0,
+                            'aruco dictionary' : 'DICT_6X6_250'})
+    first, second = list(scene.images(2))
+    assert not np.array_equal(first, second)
+    with ArUcoTracker({'video source' : 'none',
+                       'aruco dictionary' : 'DICT_6X6_250'}) as tracker:
+        frames = list(tracker.iter_frames(images=scene.images(2)))
+    assert [len(frame[0]) for frame in frames] == [2, 2]
+
+    with pytest.raises(ValueError):
+        SyntheticScene({'marker count' : 0})
+    with pytest.raises(ValueError):
+        SyntheticScene({'marker count' : 51,
+                        'aruco dictionary' : 'DICT_4X4_50'})
+    with pytest.raises(ImportError):
+        SyntheticScene({'aruco dictionary' : 'DICT_NONE'})
@@ -0,0 +1,49 @@
+# coding=utf-8
+
+"""scikit-surgeryarucotracker tests for stage timing"""
+
+import pytest
+from sksurgeryarucotracker import timing
+
+
+def test_stage_timer():
+    """
+    Tests timing frames, with and without a capture stage, and the
+    ring buffer of durations
+    """
+    with pytest.raises(ValueError):
+        timing.StageTimer(length=0)
+
+    timer = timing.StageTimer(length=2)
+    assert not timer.latest()
+    assert timer.get_timings()[1].shape == (0, 5)
+
+    for frame_number in range(3):
+        timer.start()
+        for stage in range(timing.DISPLAY):
+            timer.mark(stage)
+        timer.stop(frame_number)
+    latest = timer.latest()
+    assert set(latest) == set(timing.STAGES) | {"total"}
+    assert all(duration >= 0 for duration in latest.values())
+    assert latest["total"] == sum(latest[stage] for stage in timing.STAGES)
+
+    timer.begin()
+    timer.mark(timing.DETECTION)
+    timer.begin()
+    timer.mark(timing.POSE_ESTIMATION)
+    timer.mark(timing.PUBLICATION)
+    timer.stop(3)
+    assert timer.latest()["capture"] == 0
+
+    timer.start()
+    timer.cancel()
+    timer.begin()
+    assert timer.count == 2
+
+    frame_numbers, durations = timer.get_timings()
+    assert frame_numbers.tolist() == [2, 3]
+    assert durations.shape == (2, 5)
+
+    timer.reset()
+    assert timer.get_timings()[0].shape == (0,)